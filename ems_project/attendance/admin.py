@@ -1,18 +1,26 @@
 from django.contrib import admin
-from .models import Attendance, LeaveRequest
+from .models import Attendance, LeaveRequest, MonthlyAttendanceSummary
+from employees.search import EmployeeSearchAdminMixin
 
 # Register your models here.
 
 @admin.register(Attendance)
-class AttendanceAdmin(admin.ModelAdmin):
+class AttendanceAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('employee', 'date', 'status', 'check_in_time', 'check_out_time')
     list_filter = ('date', 'status')
     search_fields = ('employee__first_name', 'employee__last_name')
     ordering = ('-date',)
 
 @admin.register(LeaveRequest)
-class LeaveRequestAdmin(admin.ModelAdmin):
+class LeaveRequestAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('employee', 'leave_type', 'start_date', 'end_date', 'status')
     list_filter = ('leave_type', 'status', 'start_date')
     search_fields = ('employee__first_name', 'employee__last_name')
     ordering = ('-start_date',)
+
+@admin.register(MonthlyAttendanceSummary)
+class MonthlyAttendanceSummaryAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
+    list_display = ('employee', 'month', 'present', 'absent', 'late', 'work_from_home', 'worked_minutes')
+    list_filter = ('month',)
+    search_fields = ('employee__first_name', 'employee__last_name')
+    ordering = ('-month',)
@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AttendanceConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "attendance"
+
+    def ready(self):
+        from ems_project import response_cache
+        from .models import Attendance
+
+        # Rendered by cached responses; see ems_project.response_cache
+        response_cache.watch(Attendance)
@@ -0,0 +1,179 @@
+"""
+Bulk attendance ingestion.
+
+Input is streamed as CSV or JSON Lines (or passed as an iterable of dicts),
+validated chunk by chunk and upserted on the ``(employee, date)`` unique key
+with batched ``INSERT ... ON CONFLICT DO UPDATE`` statements. Invalid rows
+are reported with their row number and never abort the rest of the batch.
+"""
+import csv
+import io
+import json
+from datetime import date, time
+from itertools import islice
+
+from django.db import DatabaseError, transaction
+
+from employees.models import Employee
+from ems_project import response_cache
+from .models import Attendance, MonthlyAttendanceSummary
+
+UPDATE_FIELDS = ['status', 'check_in_time', 'check_out_time', 'notes', 'updated_at']
+STATUSES = {code for code, _ in Attendance.ATTENDANCE_STATUS}
+
+
+def read_records(stream, fmt):
+    """
+    Yield one dict per input row from a text stream in 'csv' or 'jsonl'
+    format
+    """
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'jsonl':
+        for line in stream:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    yield {'_invalid': 'Line is not valid JSON.'}
+    else:
+        raise ValueError(f"Unsupported format: {fmt}")
+
+
+def detect_format(name, default='csv'):
+    name = (name or '').lower()
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+def _parse_time(value):
+    return time.fromisoformat(value) if value not in (None, '') else None
+
+
+def _clean(record, employee_ids):
+    """
+    Validate one input row, returning (Attendance, None) or (None, errors)
+    """
+    if not isinstance(record, dict):
+        return None, {'non_field_errors': 'Expected an object.'}
+    if '_invalid' in record:
+        return None, {'non_field_errors': record['_invalid']}
+
+    errors = {}
+    try:
+        employee_id = int(record.get('employee'))
+        if employee_id not in employee_ids:
+            errors['employee'] = 'Employee does not exist.'
+    except (TypeError, ValueError):
+        errors['employee'] = 'A valid employee id is required.'
+
+    try:
+        day = date.fromisoformat(record.get('date') or '')
+    except (TypeError, ValueError):
+        errors['date'] = 'A valid date (YYYY-MM-DD) is required.'
+
+    status = record.get('status') or 'A'
+    if status not in STATUSES:
+        errors['status'] = f'"{status}" is not a valid status.'
+
+    times = {}
+    for field in ('check_in_time', 'check_out_time'):
+        try:
+            times[field] = _parse_time(record.get(field))
+        except (TypeError, ValueError):
+            errors[field] = 'A valid time (HH:MM[:SS]) is required.'
+
+    if errors:
+        return None, errors
+    return Attendance(
+        employee_id=employee_id,
+        date=day,
+        status=status,
+        notes=record.get('notes') or '',
+        **times
+    ), None
+
+
+def _existing_employee_ids(records):
+    ids = set()
+    for record in records:
+        try:
+            ids.add(int(record.get('employee')))
+        except (AttributeError, TypeError, ValueError):
+            pass
+    return set(Employee.objects.filter(pk__in=ids).values_list('pk', flat=True))
+
+
+def import_chunk(records, first_row=1):
+    """
+    Validate and upsert one chunk of records. Returns (saved, errors), where
+    errors is a list of {'row': n, 'errors': {...}} dicts.
+    """
+    employee_ids = _existing_employee_ids(records)
+    rows = {}
+    errors = []
+    for row, record in enumerate(records, start=first_row):
+        instance, row_errors = _clean(record, employee_ids)
+        if row_errors:
+            errors.append({'row': row, 'errors': row_errors})
+        else:
+            # The last occurrence of an (employee, date) pair in a chunk wins
+            rows[(instance.employee_id, instance.date)] = (row, instance)
+
+    if not rows:
+        return 0, errors
+
+    instances = [instance for _, instance in rows.values()]
+    try:
+        with transaction.atomic():
+            Attendance.objects.bulk_create(
+                instances,
+                update_conflicts=True,
+                unique_fields=['employee', 'date'],
+                update_fields=UPDATE_FIELDS,
+            )
+            # bulk_create bypasses the signals that maintain the rollup
+            MonthlyAttendanceSummary.objects.refresh(instance.rollup_key() for instance in instances)
+            response_cache.invalidate(Attendance)
+    except DatabaseError as exc:
+        errors.extend({'row': row, 'errors': {'non_field_errors': str(exc)}} for row, _ in rows.values())
+        return 0, errors
+
+    return len(instances), errors
+
+
+def import_attendance(records, chunk_size=1000):
+    """
+    Import an iterable of attendance records in chunks of ``chunk_size``.
+
+    Returns a summary with the number of rows read and saved and the list of
+    per-row errors.
+    """
+    records = iter(records)
+    total = saved = 0
+    errors = []
+    while True:
+        chunk = list(islice(records, chunk_size))
+        if not chunk:
+            break
+        chunk_saved, chunk_errors = import_chunk(chunk, first_row=total + 1)
+        total += len(chunk)
+        saved += chunk_saved
+        errors.extend(chunk_errors)
+    return {'rows': total, 'saved': saved, 'failed': len(errors), 'errors': errors}
+
+
+def import_attendance_file(uploaded_file, fmt=None, chunk_size=1000):
+    """
+    Import an uploaded (binary) file, streaming it line by line
+    """
+    fmt = fmt or detect_format(uploaded_file.name)
+    stream = io.TextIOWrapper(uploaded_file.file, encoding='utf-8-sig', newline='')
+    try:
+        return import_attendance(read_records(stream, fmt), chunk_size=chunk_size)
+    finally:
+        stream.detach()
@@ -0,0 +1,53 @@
+import io
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+
+from attendance import importers
+from employees.models import Employee
+from ems_project.benchmarking import rolled_back, measure, seed_employees
+
+
+class Command(BaseCommand):
+    help = "Benchmark bulk attendance ingestion in rows/second (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=20000)
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--format', choices=['csv', 'jsonl'], default='csv')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['employees']} employees...")
+            seed_employees(options['employees'])
+            employee_ids = list(Employee.objects.values_list('pk', flat=True))
+
+            day = date(2024, 1, 15)
+            self.run("insert", self.build_input(employee_ids, day, '09:05', options['format']), options)
+            self.run("upsert", self.build_input(employee_ids, day, '09:45', options['format']), options)
+            self.run("insert next day", self.build_input(employee_ids, day + timedelta(days=1), '09:00', options['format']), options)
+
+    def build_input(self, employee_ids, day, check_in, fmt):
+        lines = []
+        if fmt == 'csv':
+            lines.append('employee,date,status,check_in_time,check_out_time')
+            lines.extend(f'{pk},{day},P,{check_in},18:00' for pk in employee_ids)
+        else:
+            lines.extend(
+                f'{{"employee": {pk}, "date": "{day}", "status": "P", '
+                f'"check_in_time": "{check_in}", "check_out_time": "18:00"}}'
+                for pk in employee_ids
+            )
+        return '\n'.join(lines) + '\n'
+
+    def run(self, label, payload, options):
+        records = importers.read_records(io.StringIO(payload), options['format'])
+        with measure() as result:
+            summary = importers.import_attendance(records, chunk_size=options['chunk_size'])
+        self.stdout.write(
+            f"{label}: {summary['saved']} rows in {result['seconds']:.3f}s "
+            f"({summary['saved'] / result['seconds']:.0f} rows/s, {result['queries']} queries, "
+            f"{summary['failed']} failed)"
+        )
+        if summary['errors']:
+            self.stdout.write(f"  first error: {summary['errors'][0]}")
@@ -0,0 +1,118 @@
+import time
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from attendance.models import Attendance, LeaveRequest
+from authentication.models import LoginAttempt
+from employees.models import Employee
+from ems_project.benchmarking import rolled_back, seed_employees
+from payroll.models import PayrollPeriod, Payslip
+from payroll import services
+
+INDEXED_MODELS = [Attendance, LeaveRequest, Payslip, LoginAttempt]
+
+
+class Command(BaseCommand):
+    help = "Compare query plans and latency with and without the query indexes (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=2000)
+        parser.add_argument('--days', type=int, default=60)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.seed(options['employees'], options['days'])
+            queries = self.get_queries(options['days'])
+
+            after = self.run_queries(queries, options['repeat'], label='after')
+            self.drop_indexes()
+            before = self.run_queries(queries, options['repeat'], label='before')
+
+        for name in queries:
+            self.stdout.write(self.style.MIGRATE_HEADING(name))
+            self.stdout.write(f"  before: {before[name]['ms']:.2f} ms")
+            for line in before[name]['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+            self.stdout.write(f"  after:  {after[name]['ms']:.2f} ms")
+            for line in after[name]['plan'].splitlines():
+                self.stdout.write(f"    {line}")
+
+    def seed(self, employees, days):
+        self.stdout.write(f"Seeding {employees} employees x {days} days...")
+        seed_employees(employees)
+        employee_ids = list(Employee.objects.values_list('pk', flat=True))
+        self.start = date(2024, 1, 1)
+
+        statuses = ['P', 'P', 'P', 'L', 'A', 'WFH']
+        Attendance.objects.bulk_create([
+            Attendance(employee_id=pk, date=self.start + timedelta(days=day), status=statuses[(pk + day) % 6])
+            for day in range(days) for pk in employee_ids
+        ], batch_size=2000)
+
+        LeaveRequest.objects.bulk_create([
+            LeaveRequest(
+                employee_id=pk, leave_type='CL', reason='Benchmark', status='PAR'[i % 3],
+                start_date=self.start + timedelta(days=i % days), end_date=self.start + timedelta(days=i % days + 1),
+                total_days=2,
+            )
+            for i, pk in enumerate(employee_ids * 3)
+        ], batch_size=2000)
+
+        for month in range(1, 4):
+            period = PayrollPeriod.objects.create(start_date=date(2024, month, 1), end_date=date(2024, month, 28))
+            services.process_payroll(period)
+        Payslip.objects.filter(payroll_period__start_date__lt=date(2024, 3, 1)).update(is_paid=True)
+
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(username=f'bench_user_{i % employees}', ip_address='10.0.0.1', is_successful=i % 4 != 0)
+            for i in range(employees * 10)
+        ], batch_size=2000)
+
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def get_queries(self, days):
+        middle = self.start + timedelta(days=days // 2)
+        latest_period = PayrollPeriod.objects.order_by('-start_date').first()
+        return {
+            'attendance on a day': Attendance.objects.filter(date=middle),
+            'attendance in a week': Attendance.objects.filter(date__range=(middle, middle + timedelta(days=6))),
+            'late arrivals on a day': Attendance.objects.filter(date=middle, status='L'),
+            'attendance keyset page': Attendance.objects.filter(date__lt=middle).order_by('-date', '-id')[:50],
+            'pending leave requests': LeaveRequest.objects.filter(status='P').order_by('-start_date')[:50],
+            'approved leave in period': LeaveRequest.objects.filter(
+                status='A', start_date__lte=middle, end_date__gte=middle - timedelta(days=30),
+            ),
+            'unpaid payslips': Payslip.objects.filter(is_paid=False, payroll_period=latest_period),
+            'top net salaries': Payslip.objects.order_by('-net_salary')[:10],
+            'recent login attempts': LoginAttempt.objects.order_by('-timestamp')[:50],
+        }
+
+    def run_queries(self, queries, repeat, label):
+        results = {}
+        for name, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all().values_list('pk', flat=True))
+                timings.append(time.perf_counter() - started)
+            results[name] = {'ms': min(timings) * 1000, 'plan': self.explain(queryset, label)}
+        return results
+
+    def explain(self, queryset, label):
+        # QuerySet.explain() would reuse a statement prepared before the
+        # indexes were dropped, so tag the statement to force a fresh plan
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f"{connection.ops.explain_query_prefix()} {sql} /* {label} */", params)
+            return '\n'.join(' '.join(str(column) for column in row) for row in cursor.fetchall())
+
+    def drop_indexes(self):
+        editor = connection.schema_editor(collect_sql=True)
+        with connection.cursor() as cursor:
+            for model in INDEXED_MODELS:
+                for index in model._meta.indexes:
+                    cursor.execute(str(index.remove_sql(model, editor)))
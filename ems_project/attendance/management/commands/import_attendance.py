@@ -0,0 +1,37 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from attendance import importers
+
+
+class Command(BaseCommand):
+    help = "Import attendance from a CSV or JSON Lines file, upserting on (employee, date)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import, or '-' for standard input")
+        parser.add_argument('--format', choices=['csv', 'jsonl'], help="Defaults to the file extension, else csv")
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--show-errors', type=int, default=20, help="Number of row errors to print")
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or importers.detect_format(path)
+
+        if path == '-':
+            summary = self.import_stream(sys.stdin, fmt, options['chunk_size'])
+        else:
+            try:
+                with open(path, encoding='utf-8-sig', newline='') as stream:
+                    summary = self.import_stream(stream, fmt, options['chunk_size'])
+            except OSError as exc:
+                raise CommandError(exc)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Read {summary['rows']} rows: {summary['saved']} saved, {summary['failed']} failed."
+        ))
+        for error in summary['errors'][:options['show_errors']]:
+            self.stdout.write(f"  row {error['row']}: {error['errors']}")
+
+    def import_stream(self, stream, fmt, chunk_size):
+        return importers.import_attendance(importers.read_records(stream, fmt), chunk_size=chunk_size)
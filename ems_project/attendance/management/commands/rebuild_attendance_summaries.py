@@ -0,0 +1,32 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Min
+
+from attendance.models import Attendance, MonthlyAttendanceSummary
+
+
+class Command(BaseCommand):
+    help = "Rebuild the monthly attendance summaries for a date range (defaults to all attendance)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=date.fromisoformat, help="First day to rebuild (YYYY-MM-DD)")
+        parser.add_argument('--end', type=date.fromisoformat, help="Last day to rebuild (YYYY-MM-DD)")
+
+    def handle(self, *args, **options):
+        bounds = Attendance.objects.aggregate(first=Min('date'), last=Max('date'))
+        start = options['start'] or bounds['first']
+        end = options['end'] or bounds['last']
+        if start is None or end is None:
+            self.stdout.write("No attendance to summarize.")
+            return
+        if start > end:
+            raise CommandError("--start must not be after --end")
+
+        with transaction.atomic():
+            count = MonthlyAttendanceSummary.objects.rebuild(start, end)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Rebuilt {count} monthly summaries from {start:%Y-%m} to {end:%Y-%m}."
+        ))
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.9 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("attendance", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(
+                fields=["date", "status"], name="attendance_date_status_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="attendance",
+            index=models.Index(fields=["-date", "-id"], name="attendance_date_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="leaverequest",
+            index=models.Index(
+                fields=["employee", "start_date"], name="leave_employee_start_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaverequest",
+            index=models.Index(
+                condition=models.Q(("status", "P")),
+                fields=["-start_date"],
+                name="leave_pending_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="leaverequest",
+            index=models.Index(
+                condition=models.Q(("status", "A")),
+                fields=["end_date", "start_date"],
+                name="leave_approved_window_idx",
+            ),
+        ),
+    ]
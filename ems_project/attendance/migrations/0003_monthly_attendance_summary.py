@@ -0,0 +1,61 @@
+# Generated by Django 4.2.9 on 2026-10-18 18:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0001_initial"),
+        ("attendance", "0002_add_query_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="MonthlyAttendanceSummary",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("month", models.DateField(help_text="First day of the month")),
+                ("present", models.PositiveSmallIntegerField(default=0)),
+                ("absent", models.PositiveSmallIntegerField(default=0)),
+                ("late", models.PositiveSmallIntegerField(default=0)),
+                ("work_from_home", models.PositiveSmallIntegerField(default=0)),
+                (
+                    "late_minutes",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Minutes checked in after the shift start"
+                    ),
+                ),
+                (
+                    "worked_minutes",
+                    models.PositiveIntegerField(
+                        default=0, help_text="Minutes between check-in and check-out"
+                    ),
+                ),
+                (
+                    "employee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="attendance_summaries",
+                        to="employees.employee",
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["-month"],
+                "indexes": [
+                    models.Index(fields=["month"], name="attendance_summary_month_idx")
+                ],
+                "unique_together": {("employee", "month")},
+            },
+        ),
+    ]
@@ -1,4 +1,12 @@
-from django.db import models
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta
+
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Count, DurationField, F, Q, Sum, Value
+from django.db.models.functions import Greatest, Least
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
 from django.core.validators import MinValueValidator, MaxValueValidator
 from employees.models import Employee
 
@@ -21,13 +29,242 @@ class Attendance(models.Model):
     # Optional notes or reason for absence/late
     notes = models.TextField(blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         unique_together = ('employee', 'date')
         ordering = ['-date']
+        indexes = [
+            # Day and date range reports, optionally narrowed by status
+            models.Index(fields=['date', 'status'], name='attendance_date_status_idx'),
+            # Keyset pagination on (-date, -id)
+            models.Index(fields=['-date', '-id'], name='attendance_date_id_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.full_name} - {self.date} - {self.get_status_display()}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded (employee, date) so moving a record to another
+        # month also refreshes the rollup it was moved out of
+        loaded = {'employee_id', 'date'} <= set(field_names)
+        instance._loaded_rollup_key = instance.rollup_key() if loaded else None
+        return instance
+
+    def rollup_key(self):
+        return (self.employee_id, month_start(self.date))
+
+def month_start(day):
+    return day.replace(day=1)
+
+def next_month(day):
+    return date(day.year + 1, 1, 1) if day.month == 12 else date(day.year, day.month + 1, 1)
+
+def _minutes_between(start, end):
+    return int((datetime.combine(date.min, end) - datetime.combine(date.min, start)).total_seconds() // 60)
+
+class MonthlyAttendanceSummaryManager(models.Manager):
+    def _summarize(self, rows):
+        """
+        Fold (employee_id, date, status, check_in_time, check_out_time) rows
+        into unsaved summaries keyed on (employee_id, month)
+        """
+        shift_start = time.fromisoformat(getattr(settings, 'ATTENDANCE_SHIFT_START', '09:30'))
+        columns = dict(self.model.STATUS_COLUMNS)
+        summaries = {}
+        for employee_id, day, status, check_in, check_out in rows:
+            key = (employee_id, month_start(day))
+            summary = summaries.get(key)
+            if summary is None:
+                summary = summaries[key] = self.model(employee_id=employee_id, month=key[1])
+            setattr(summary, columns[status], getattr(summary, columns[status]) + 1)
+            if check_in and check_in > shift_start:
+                summary.late_minutes += _minutes_between(shift_start, check_in)
+            if check_in and check_out and check_out > check_in:
+                summary.worked_minutes += _minutes_between(check_in, check_out)
+        return summaries
+
+    def refresh(self, keys):
+        """
+        Recompute the summaries for the given (employee_id, month) pairs from
+        their raw attendance, deleting those left without attendance.
+
+        The employees' rows are locked (select_for_update) before their
+        attendance is read, so concurrent refreshes of the same employee run
+        one after the other, each seeing the attendance the previous one
+        committed, and the last to commit writes the current summary.
+        Summaries are upserted on the unique (employee, month) pair.
+        """
+        keys = set(keys)
+        if not keys:
+            return
+        by_month = defaultdict(set)
+        for employee_id, month in keys:
+            by_month[month].add(employee_id)
+
+        condition = Q()
+        for month, employee_ids in by_month.items():
+            condition |= Q(employee_id__in=employee_ids, date__gte=month, date__lt=next_month(month))
+
+        with transaction.atomic():
+            # In id order, so refreshes of overlapping employees cannot deadlock
+            list(Employee.objects.select_for_update().filter(
+                pk__in={employee_id for employee_id, _ in keys},
+            ).order_by('pk').values_list('pk', flat=True))
+            rows = Attendance.objects.filter(condition).order_by().values_list(
+                'employee_id', 'date', 'status', 'check_in_time', 'check_out_time'
+            )
+            summaries = self._summarize(rows)
+
+            emptied = keys - set(summaries)
+            if emptied:
+                stale = Q()
+                for employee_id, month in emptied:
+                    stale |= Q(employee_id=employee_id, month=month)
+                self.filter(stale).delete()
+            self.bulk_create(
+                summaries.values(),
+                update_conflicts=True,
+                unique_fields=['employee', 'month'],
+                update_fields=[column for _, column in self.model.STATUS_COLUMNS] + ['late_minutes', 'worked_minutes'],
+            )
+
+    def rebuild(self, start, end, batch_size=2000):
+        """
+        Rebuild every summary for the months touching [start, end]
+        """
+        first, last = month_start(start), next_month(end)
+        self.filter(month__gte=first, month__lt=last).delete()
+        rows = Attendance.objects.filter(date__gte=first, date__lt=last).order_by().values_list(
+            'employee_id', 'date', 'status', 'check_in_time', 'check_out_time'
+        ).iterator(chunk_size=batch_size)
+        summaries = self._summarize(rows)
+        self.bulk_create(summaries.values(), batch_size=batch_size)
+        return len(summaries)
+
+    def absent_days_by_employee(self, start_date, end_date):
+        """
+        Absent days per employee within [start_date, end_date]. Whole months
+        are read from the summaries; partial months at either edge from raw
+        attendance.
+        """
+        first_full = start_date if start_date.day == 1 else next_month(start_date)
+        after_full = month_start(end_date + timedelta(days=1))
+
+        days = defaultdict(int)
+        if first_full < after_full:
+            rows = self.filter(month__gte=first_full, month__lt=after_full, absent__gt=0).order_by().values(
+                'employee'
+            ).annotate(days=Sum('absent')).values_list('employee', 'days')
+            for employee_id, count in rows:
+                days[employee_id] += count
+            edges = Q(date__gte=start_date, date__lt=first_full) | Q(date__gte=after_full, date__lte=end_date)
+        else:
+            edges = Q(date__gte=start_date, date__lte=end_date)
+
+        rows = Attendance.objects.filter(edges, status='A').order_by().values('employee').annotate(
+            days=Count('id')
+        ).values_list('employee', 'days')
+        for employee_id, count in rows:
+            days[employee_id] += count
+        return dict(days)
+
+class MonthlyAttendanceSummary(models.Model):
+    """
+    Per employee and month rollup of attendance, kept up to date as
+    attendance records change so reports do not scan the raw history
+    """
+    STATUS_COLUMNS = [
+        ('P', 'present'),
+        ('A', 'absent'),
+        ('L', 'late'),
+        ('WFH', 'work_from_home'),
+    ]
+
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='attendance_summaries')
+    month = models.DateField(help_text="First day of the month")
+    present = models.PositiveSmallIntegerField(default=0)
+    absent = models.PositiveSmallIntegerField(default=0)
+    late = models.PositiveSmallIntegerField(default=0)
+    work_from_home = models.PositiveSmallIntegerField(default=0)
+    late_minutes = models.PositiveIntegerField(default=0, help_text="Minutes checked in after the shift start")
+    worked_minutes = models.PositiveIntegerField(default=0, help_text="Minutes between check-in and check-out")
+
+    objects = MonthlyAttendanceSummaryManager()
+
+    class Meta:
+        unique_together = ('employee', 'month')
+        ordering = ['-month']
+        indexes = [
+            models.Index(fields=['month'], name='attendance_summary_month_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.employee.full_name} - {self.month:%Y-%m}"
+
+    @property
+    def total(self):
+        return self.present + self.absent + self.late + self.work_from_home
+
+    @property
+    def worked_hours(self):
+        return round(self.worked_minutes / 60, 2)
+
+@receiver(post_save, sender=Attendance)
+def refresh_summary_on_save(sender, instance, raw=False, **kwargs):
+    """
+    Keep the monthly summaries of the saved record's month (and the month
+    it was moved from) up to date
+    """
+    if raw:
+        return
+    keys = {instance.rollup_key()}
+    loaded_key = getattr(instance, '_loaded_rollup_key', None)
+    if loaded_key is not None:
+        keys.add(loaded_key)
+    instance._loaded_rollup_key = instance.rollup_key()
+    MonthlyAttendanceSummary.objects.refresh(keys)
+
+@receiver(post_delete, sender=Attendance)
+def refresh_summary_on_delete(sender, instance, **kwargs):
+    MonthlyAttendanceSummary.objects.refresh([instance.rollup_key()])
+
+class LeaveRequestManager(models.Manager):
+    def unpaid_days_by_employee(self, start_date, end_date, employee_ids=None):
+        """
+        Approved leave days per employee falling within [start_date, end_date],
+        computed in a single grouped aggregate.
+
+        Leaves straddling either boundary are clipped to the window, so only
+        the days inside it are counted. Returns a {employee_id: days} mapping.
+        """
+        window_start = Value(start_date, output_field=models.DateField())
+        window_end = Value(end_date, output_field=models.DateField())
+
+        queryset = self.filter(
+            status='A',  # Only approved leaves
+            start_date__lte=end_date,
+            end_date__gte=start_date,
+        )
+        if employee_ids is not None:
+            queryset = queryset.filter(employee_id__in=employee_ids)
+
+        rows = queryset.order_by().values('employee').annotate(
+            span=Sum(
+                Least(F('end_date'), window_end) - Greatest(F('start_date'), window_start),
+                output_field=DurationField(),
+            ),
+            leaves=Count('id'),
+        ).values_list('employee', 'span', 'leaves')
+
+        # Each leave covers its end date too, hence one extra day per leave
+        return {
+            employee_id: (span or timedelta()).days + leaves
+            for employee_id, span, leaves in rows
+        }
+
 class LeaveRequest(models.Model):
     LEAVE_TYPES = [
         ('CL', 'Casual Leave'),
@@ -61,8 +298,19 @@ class LeaveRequest(models.Model):
                                     blank=True)
     approved_on = models.DateTimeField(null=True, blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LeaveRequestManager()
+
     class Meta:
         ordering = ['-start_date']
+        indexes = [
+            models.Index(fields=['employee', 'start_date'], name='leave_employee_start_idx'),
+            # Approval queue
+            models.Index(fields=['-start_date'], condition=Q(status='P'), name='leave_pending_idx'),
+            # Approved leave overlapping a payroll period
+            models.Index(fields=['end_date', 'start_date'], condition=Q(status='A'), name='leave_approved_window_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.full_name} - {self.leave_type} ({self.start_date} to {self.end_date})"
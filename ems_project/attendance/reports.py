@@ -0,0 +1,45 @@
+"""
+Attendance reports.
+
+Reports read the per employee and month rollup (MonthlyAttendanceSummary)
+instead of re-aggregating raw attendance, so their cost depends on headcount
+and the number of months reported rather than on the length of history.
+Ranges are half-open ``[start, end)`` and always cover whole months.
+"""
+from datetime import date
+
+from django.db.models import F, Sum
+
+from .models import MonthlyAttendanceSummary
+
+SUMMARY_COLUMNS = [column for _, column in MonthlyAttendanceSummary.STATUS_COLUMNS] + [
+    'late_minutes',
+    'worked_minutes',
+]
+
+
+def report_date_range(year, month=None):
+    """
+    Half-open date range covering a month, or the whole year when month is
+    None
+    """
+    if month is None:
+        return date(year, 1, 1), date(year + 1, 1, 1)
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def attendance_summary(start, end):
+    """
+    One row per employee with the number of days in each status, late
+    minutes and worked minutes within the months of [start, end)
+    """
+    # The total is annotated first, while the status names still refer to
+    # the model fields rather than to the per-status sums
+    return MonthlyAttendanceSummary.objects.filter(
+        month__gte=start,
+        month__lt=end,
+    ).order_by('employee').values('employee').annotate(
+        total=Sum(F('present') + F('absent') + F('late') + F('work_from_home')),
+    ).annotate(**{column: Sum(column) for column in SUMMARY_COLUMNS})
@@ -1,8 +1,9 @@
 from rest_framework import serializers
 from .models import Attendance, LeaveRequest
 from employees.serializers import EmployeeSerializer
+from ems_project.sparse_fieldsets import SparseFieldsetSerializerMixin
 
-class AttendanceSerializer(serializers.ModelSerializer):
+class AttendanceSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
 
     class Meta:
@@ -12,7 +13,7 @@ class AttendanceSerializer(serializers.ModelSerializer):
     def get_employee_name(self, obj):
         return f"{obj.employee.first_name} {obj.employee.last_name}"
 
-class LeaveRequestSerializer(serializers.ModelSerializer):
+class LeaveRequestSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
     approved_by_name = serializers.SerializerMethodField()
 
@@ -1,3 +1,366 @@
+import csv
+import os
+import tempfile
+from datetime import date, time, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from employees.test_utils import create_employee
+from .models import Attendance, LeaveRequest, MonthlyAttendanceSummary
+
+
+def create_leave(employee, start_date, end_date, status='A'):
+    return LeaveRequest.objects.create(
+        employee=employee, leave_type='CL', reason='Personal', status=status,
+        start_date=start_date, end_date=end_date,
+        total_days=(end_date - start_date).days + 1,
+    )
+
+
+class UnpaidLeaveDaysTests(TestCase):
+    def test_days_are_clipped_to_the_window(self):
+        first = create_employee(1)
+        second = create_employee(2)
+        create_leave(first, date(2024, 1, 10), date(2024, 1, 12))
+        create_leave(first, date(2023, 12, 30), date(2024, 1, 2))
+        create_leave(first, date(2024, 1, 30), date(2024, 2, 3))
+        create_leave(first, date(2024, 1, 20), date(2024, 1, 21), status='P')
+        create_leave(second, date(2023, 12, 20), date(2024, 2, 5))
+        create_leave(second, date(2024, 2, 10), date(2024, 2, 12))
+
+        with self.assertNumQueries(1):
+            days = LeaveRequest.objects.unpaid_days_by_employee(date(2024, 1, 1), date(2024, 1, 31))
+
+        self.assertEqual(days, {first.pk: 3 + 2 + 2, second.pk: 31})
+
+    def test_filter_by_employee(self):
+        first = create_employee(1)
+        second = create_employee(2)
+        create_leave(first, date(2024, 1, 10), date(2024, 1, 12))
+        create_leave(second, date(2024, 1, 10), date(2024, 1, 12))
+
+        days = LeaveRequest.objects.unpaid_days_by_employee(
+            date(2024, 1, 1), date(2024, 1, 31), employee_ids=[second.pk]
+        )
+
+        self.assertEqual(days, {second.pk: 3})
+
+
+class AttendancePaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        employees = [create_employee(index) for index in range(3)]
+        for day in range(9):
+            for employee in employees:
+                Attendance.objects.create(employee=employee, date=date(2024, 1, 1) + timedelta(days=day), status='P')
+
+    def walk(self, url):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            url = response.data['next']
+        return pages
+
+    def test_walks_every_row_once_in_order(self):
+        pages = self.walk('/api/v1/attendance/?page_size=4')
+
+        rows = [(row['date'], row['id']) for page in pages for row in page['results']]
+        self.assertEqual(len(pages), 7)
+        self.assertEqual(len(rows), 27)
+        self.assertEqual(rows, sorted(rows, reverse=True))
+        self.assertNotIn('count', pages[0])
+
+    def test_previous_link_returns_the_previous_page(self):
+        first = self.client.get('/api/v1/attendance/?page_size=5').data
+        second = self.client.get(first['next']).data
+
+        previous = self.client.get(second['previous']).data
+
+        self.assertIsNone(first['previous'])
+        self.assertEqual(previous['results'], first['results'])
+
+    def test_deep_pages_run_a_single_query_without_count(self):
+        pages = self.walk('/api/v1/attendance/?page_size=4')
+        url = pages[3]['next']
+
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_count_is_opt_in(self):
+        response = self.client.get('/api/v1/attendance/?count=true')
+
+        self.assertEqual(response.data['count'], 27)
+        self.assertEqual(len(response.data['results']), 10)
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/v1/attendance/?cursor=garbage')
+
+        self.assertEqual(response.status_code, 404)
+
+
+class AttendanceExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.employee = create_employee(1)
+        for day in range(10):
+            Attendance.objects.create(
+                employee=self.employee, date=date(2024, 1, 1) + timedelta(days=day), status='P',
+                notes='=HYPERLINK("http://example.com")' if day == 0 else '',
+            )
+
+    def test_date_range_export(self):
+        response = self.client.get('/api/v1/attendance/export/', {
+            'start_date': '2024-01-03', 'end_date': '2024-01-05', 'fields': 'date,status,notes',
+        })
+        self.assertEqual(response.status_code, 200)
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows, [
+            ['date', 'status', 'notes'],
+            ['2024-01-05', 'P', ''],
+            ['2024-01-04', 'P', ''],
+            ['2024-01-03', 'P', ''],
+        ])
+
+    def test_formulas_are_not_exported_as_formulas(self):
+        response = self.client.get('/api/v1/attendance/export/', {'date': '2024-01-01', 'fields': 'notes'})
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[1], ['\'=HYPERLINK("http://example.com")'])
+
+
+class MonthlySummaryTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.employee = create_employee(1)
+        for day, code in [(date(2024, 1, 31), 'P'), (date(2024, 2, 1), 'P'), (date(2024, 2, 2), 'L'),
+                          (date(2024, 2, 29), 'WFH'), (date(2024, 3, 1), 'A'), (date(2025, 1, 1), 'P')]:
+            Attendance.objects.create(employee=self.employee, date=day, status=code)
+
+    def test_month_is_pivoted_per_employee(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/attendance/monthly_summary/?year=2024&month=2')
+
+        self.assertEqual(list(response.data), [{
+            'employee': self.employee.pk,
+            'present': 1, 'absent': 0, 'late': 1, 'work_from_home': 1,
+            'late_minutes': 0, 'worked_minutes': 0, 'total': 3,
+        }])
+        sql = queries[-1]['sql']
+        self.assertIn('attendance_monthlyattendancesummary', sql)
+        self.assertNotIn('"attendance_attendance"', sql)
+        self.assertNotIn('django_date_extract', sql)
+
+    def test_whole_year(self):
+        response = self.client.get('/api/v1/attendance/monthly_summary/?year=2024&scope=year')
+
+        self.assertEqual(response.data[0]['total'], 5)
+        self.assertEqual(response.data[0]['absent'], 1)
+
+    def test_december_and_invalid_month(self):
+        response = self.client.get('/api/v1/attendance/monthly_summary/?year=2024&month=12')
+        self.assertEqual(list(response.data), [])
+
+        response = self.client.get('/api/v1/attendance/monthly_summary/?year=2024&month=13')
+        self.assertEqual(response.status_code, 400)
+
+
+class MonthlyAttendanceSummaryTests(TestCase):
+    def setUp(self):
+        self.employee = create_employee(1)
+
+    def summary(self, month):
+        return MonthlyAttendanceSummary.objects.get(employee=self.employee, month=month)
+
+    def test_maintained_on_create_update_and_delete(self):
+        record = Attendance.objects.create(
+            employee=self.employee, date=date(2024, 2, 5), status='L',
+            check_in_time=time(10, 0), check_out_time=time(18, 30),
+        )
+        Attendance.objects.create(employee=self.employee, date=date(2024, 2, 6), status='P')
+
+        summary = self.summary(date(2024, 2, 1))
+        self.assertEqual((summary.present, summary.late, summary.total), (1, 1, 2))
+        self.assertEqual(summary.late_minutes, 30)
+        self.assertEqual(summary.worked_hours, 8.5)
+
+        record = Attendance.objects.get(pk=record.pk)
+        record.date = date(2024, 3, 1)
+        record.status = 'A'
+        record.save()
+
+        self.assertEqual(self.summary(date(2024, 2, 1)).total, 1)
+        self.assertEqual(self.summary(date(2024, 3, 1)).absent, 1)
+
+        record.delete()
+        self.assertFalse(MonthlyAttendanceSummary.objects.filter(month=date(2024, 3, 1)).exists())
+
+    def test_refresh_upserts_a_summary_written_concurrently(self):
+        Attendance.objects.create(employee=self.employee, date=date(2024, 2, 5), status='P')
+        # The row a concurrent refresh of the same month committed first
+        MonthlyAttendanceSummary.objects.filter(employee=self.employee).update(present=7)
+        existing = self.summary(date(2024, 2, 1))
+
+        MonthlyAttendanceSummary.objects.refresh([(self.employee.pk, date(2024, 2, 1))])
+
+        summary = self.summary(date(2024, 2, 1))
+        self.assertEqual((summary.pk, summary.present), (existing.pk, 1))
+
+    def test_refresh_locks_the_employees_before_reading_attendance(self):
+        Attendance.objects.create(employee=self.employee, date=date(2024, 2, 5), status='P')
+
+        with CaptureQueriesContext(connection) as queries:
+            MonthlyAttendanceSummary.objects.refresh([(self.employee.pk, date(2024, 2, 1))])
+
+        tables = [query['sql'].split(' FROM ', 1)[1].split()[0] for query in queries if ' FROM ' in query['sql']]
+        self.assertEqual(tables[:2], ['"employees_employee"', '"attendance_attendance"'])
+
+    def test_rebuild_command(self):
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 2), status='P')
+        Attendance.objects.create(employee=self.employee, date=date(2024, 2, 2), status='WFH')
+        MonthlyAttendanceSummary.objects.all().delete()
+
+        call_command('rebuild_attendance_summaries', start=date(2024, 1, 15), end=date(2024, 2, 1), stdout=StringIO())
+
+        self.assertEqual(self.summary(date(2024, 1, 1)).present, 1)
+        self.assertEqual(self.summary(date(2024, 2, 1)).work_from_home, 1)
+
+    def test_absent_days_mix_summaries_and_raw_edges(self):
+        for day in (date(2024, 1, 31), date(2024, 2, 10), date(2024, 3, 1), date(2024, 3, 20)):
+            Attendance.objects.create(employee=self.employee, date=day, status='A')
+
+        days = MonthlyAttendanceSummary.objects.absent_days_by_employee(date(2024, 1, 15), date(2024, 3, 10))
+
+        self.assertEqual(days, {self.employee.pk: 3})
+
+
+class AttendanceImportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.employee = create_employee(1)
+
+    def test_bulk_json_upserts_and_reports_row_errors(self):
+        Attendance.objects.create(employee=self.employee, date=date(2024, 1, 2), status='A')
+
+        response = self.client.post('/api/v1/attendance/bulk/', [
+            {'employee': self.employee.pk, 'date': '2024-01-02', 'status': 'P', 'check_in_time': '09:00'},
+            {'employee': 999, 'date': '2024-01-02', 'status': 'P'},
+            {'employee': self.employee.pk, 'date': '2024-13-01', 'status': 'X'},
+            {'employee': self.employee.pk, 'date': '2024-01-03', 'status': 'WFH'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['rows'], response.data['saved'], response.data['failed']), (4, 2, 2))
+        self.assertEqual([error['row'] for error in response.data['errors']], [2, 3])
+        self.assertEqual(set(response.data['errors'][1]['errors']), {'date', 'status'})
+        self.assertEqual(Attendance.objects.get(date=date(2024, 1, 2)).status, 'P')
+        summary = MonthlyAttendanceSummary.objects.get(employee=self.employee, month=date(2024, 1, 1))
+        self.assertEqual((summary.present, summary.absent, summary.work_from_home), (1, 0, 1))
+
+    def test_bulk_csv_upload(self):
+        upload = SimpleUploadedFile('badges.csv', (
+            'employee,date,status,check_in_time,check_out_time\n'
+            f'{self.employee.pk},2024-01-02,L,10:15,18:00\n'
+            f'{self.employee.pk},2024-01-03,P,,\n'
+        ).encode())
+
+        response = self.client.post('/api/v1/attendance/bulk/', {'file': upload}, format='multipart')
+
+        self.assertEqual(response.data['saved'], 2)
+        self.assertEqual(Attendance.objects.get(date=date(2024, 1, 2)).check_in_time, time(10, 15))
+
+    def test_import_command_with_jsonl(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.jsonl', delete=False) as handle:
+            handle.write(f'{{"employee": {self.employee.pk}, "date": "2024-01-02", "status": "P"}}\n')
+            handle.write('not json\n')
+        self.addCleanup(os.remove, handle.name)
+
+        out = StringIO()
+        call_command('import_attendance', handle.name, chunk_size=1, stdout=out)
+
+        self.assertIn('Read 2 rows: 1 saved, 1 failed.', out.getvalue())
+        self.assertTrue(Attendance.objects.filter(employee=self.employee, date=date(2024, 1, 2)).exists())
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.employee = create_employee(1)
+        self.record = Attendance.objects.create(employee=self.employee, date=timezone.now().date(), status='P')
+
+    def get(self, url, etag=None):
+        headers = {'HTTP_IF_NONE_MATCH': etag} if etag else {}
+        return self.client.get(url, **headers)
+
+    def test_unchanged_resource_returns_304_with_one_query(self):
+        response = self.get('/api/v1/attendance/today_attendance/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.get('/api/v1/attendance/today_attendance/', response['ETag'])
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_updates_deletes_and_related_changes_change_the_etag(self):
+        url = '/api/v1/attendance/today_attendance/'
+        etags = [self.get(url)['ETag']]
+
+        self.record.status = 'L'
+        self.record.save()
+        response = self.get(url, etags[-1])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['status'], 'L')
+        etags.append(response['ETag'])
+
+        self.employee.first_name = 'Renamed'
+        self.employee.save()
+        response = self.get(url, etags[-1])
+        self.assertEqual(response.data[0]['employee_name'], 'Renamed Last1')
+        etags.append(response['ETag'])
+
+        self.record.delete()
+        response = self.get(url, etags[-1])
+        self.assertEqual(response.data, [])
+        self.assertEqual(len(set(etags + [response['ETag']])), 4)
+
+    def test_if_modified_since_alone_is_not_answered_with_304(self):
+        url = '/api/v1/attendance/today_attendance/'
+        Attendance.objects.create(employee=create_employee(2), date=self.record.date, status='P')
+        last_modified = self.get(url)['Last-Modified']
+
+        # Deleting the older row leaves the newest updated_at unchanged
+        self.record.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 1)
+
+    def test_pending_requests(self):
+        leave = create_leave(self.employee, date(2024, 1, 10), date(2024, 1, 12), status='P')
+        url = '/api/v1/leave-requests/pending_requests/'
+        etag = self.get(url)['ETag']
+
+        self.assertEqual(self.get(url, etag).status_code, 304)
 
-# Create your tests here.
+        leave.status = 'A'
+        leave.save()
+        response = self.get(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, [])
@@ -1,30 +1,58 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Value
+from django.db.models.functions import Concat
 from django.utils import timezone
-from django.db.models import Count
 
+from authentication.access import get_user_access, has_flag
+from authentication.permissions import CanApproveLeaves
+from ems_project.conditional import conditional_response
+from ems_project.exports import ExportMixin
+from ems_project.pagination import AttendancePagination
+from ems_project.response_cache import cache_response
+from ems_project.sparse_fieldsets import SparseFieldsetMixin
+from employees.models import Employee
 from .models import Attendance, LeaveRequest
 from .serializers import AttendanceSerializer, LeaveRequestSerializer
+from . import importers, reports
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Attendance records
+
+    export/ streams the filtered records (e.g. ?start_date=&end_date=) as
+    CSV or XLSX.
     """
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
+    sparse_field_sources = {
+        'employee_name': ['employee__first_name', 'employee__last_name'],
+    }
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['employee', 'date', 'status']
     ordering_fields = ['date']
+    pagination_class = AttendancePagination
+    export_filename = 'attendance'
+    export_columns = {
+        'id': 'id',
+        'employee': 'employee_id',
+        'employee_name': Concat('employee__first_name', Value(' '), 'employee__last_name'),
+        'date': 'date',
+        'status': 'status',
+        'check_in_time': 'check_in_time',
+        'check_out_time': 'check_out_time',
+        'notes': 'notes',
+    }
 
     def get_queryset(self):
         """
         Optionally filter attendance by date range
         """
-        queryset = Attendance.objects.all()
+        queryset = Attendance.objects.select_related('employee')
         start_date = self.request.query_params.get('start_date', None)
         end_date = self.request.query_params.get('end_date', None)
         
@@ -33,37 +61,78 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         
         return queryset
 
+    def get_today_queryset(self):
+        return Attendance.objects.select_related('employee').filter(date=timezone.now().date())
+
     @action(detail=False, methods=['get'])
+    @conditional_response(Employee, queryset=lambda view, request: view.get_today_queryset())
+    @cache_response(Attendance, Employee, vary_on=lambda request: timezone.localdate().isoformat())
     def today_attendance(self, request):
         """
         Retrieve today's attendance records
         """
-        today = timezone.now().date()
-        today_attendance = Attendance.objects.filter(date=today)
+        today_attendance = self.get_today_queryset()
         serializer = self.get_serializer(today_attendance, many=True)
         return Response(serializer.data)
 
     @action(detail=False, methods=['get'])
     def monthly_summary(self, request):
         """
-        Generate monthly attendance summary
+        Generate monthly attendance summary, one row per employee with a
+        count per status. Pass scope=year for the whole year.
         """
-        year = request.query_params.get('year', timezone.now().year)
-        month = request.query_params.get('month', timezone.now().month)
+        try:
+            year = int(request.query_params.get('year', timezone.now().year))
+            month = int(request.query_params.get('month', timezone.now().month))
+            if request.query_params.get('scope') == 'year':
+                month = None
+            start, end = reports.report_date_range(year, month)
+        except ValueError:
+            return Response(
+                {"detail": "year and month must be a valid calendar year and month."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        attendance_summary = Attendance.objects.filter(
-            date__year=year, 
-            date__month=month
-        ).values('employee', 'status').annotate(count=Count('status'))
+        attendance_summary = reports.attendance_summary(start, end)
         
         return Response(attendance_summary)
 
-class LeaveRequestViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['post'], permission_classes=[permissions.IsAdminUser])
+    def bulk(self, request):
+        """
+        Create or update attendance in bulk from a JSON list of records or an
+        uploaded CSV/JSONL file (multipart field 'file'). Invalid rows are
+        reported without aborting the others.
+        """
+        upload = request.FILES.get('file')
+        if upload is not None:
+            fmt = request.data.get('format') or importers.detect_format(upload.name)
+            if fmt not in ('csv', 'jsonl'):
+                return Response(
+                    {"detail": "format must be 'csv' or 'jsonl'."},
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            summary = importers.import_attendance_file(upload, fmt=fmt)
+        elif isinstance(request.data, list):
+            summary = importers.import_attendance(request.data)
+        else:
+            return Response(
+                {"detail": "Send a JSON list of attendance records or a CSV/JSONL file."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        return Response(summary)
+
+class LeaveRequestViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Leave Requests
     """
     queryset = LeaveRequest.objects.all()
     serializer_class = LeaveRequestSerializer
+    sparse_field_sources = {
+        'employee_name': ['employee__first_name', 'employee__last_name'],
+        'approved_by_name': ['approved_by__first_name', 'approved_by__last_name'],
+    }
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['employee', 'leave_type', 'status']
@@ -74,25 +143,29 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         Customize queryset based on user role
         """
         user = self.request.user
-        if user.is_staff or user.is_superuser:
-            return LeaveRequest.objects.all()
-        return LeaveRequest.objects.filter(employee__user=user)
+        queryset = LeaveRequest.objects.select_related('employee', 'approved_by')
+        if has_flag(user, 'can_approve_leaves'):
+            return queryset
+        return queryset.filter(employee_id=get_user_access(user).employee_id)
 
-    @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAdminUser])
+    def get_pending_queryset(self):
+        return LeaveRequest.objects.select_related('employee', 'approved_by').filter(status='P')
+
+    @action(detail=True, methods=['patch'], permission_classes=[CanApproveLeaves])
     def approve_leave(self, request, pk=None):
         """
         Approve a leave request
         """
         leave_request = self.get_object()
         leave_request.status = 'A'  # Approved
-        leave_request.approved_by = request.user.employee_profile
+        leave_request.approved_by_id = get_user_access(request.user).employee_id
         leave_request.approved_on = timezone.now()
         leave_request.save()
         
         serializer = self.get_serializer(leave_request)
         return Response(serializer.data)
 
-    @action(detail=True, methods=['patch'], permission_classes=[permissions.IsAdminUser])
+    @action(detail=True, methods=['patch'], permission_classes=[CanApproveLeaves])
     def reject_leave(self, request, pk=None):
         """
         Reject a leave request
@@ -104,11 +177,12 @@ class LeaveRequestViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(leave_request)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], permission_classes=[CanApproveLeaves])
+    @conditional_response(Employee, queryset=lambda view, request: view.get_pending_queryset())
     def pending_requests(self, request):
         """
         Retrieve all pending leave requests
         """
-        pending_requests = LeaveRequest.objects.filter(status='P')
+        pending_requests = self.get_pending_queryset()
         serializer = self.get_serializer(pending_requests, many=True)
         return Response(serializer.data)
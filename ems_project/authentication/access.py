@@ -0,0 +1,95 @@
+"""
+Per-process cache of what an authenticated user may access.
+
+The role and permission flags of a user's profile and the id of their
+employee record are loaded with one query and kept for ``USER_ACCESS_TTL``
+seconds. Saving or deleting a user, profile or employee drops the affected
+entries in this process; the TTL bounds how long other processes keep
+serving an outdated entry.
+"""
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.contrib.auth.models import User
+
+UserAccess = namedtuple('UserAccess', [
+    'user_id', 'role', 'can_view_payroll', 'can_manage_employees', 'can_approve_leaves', 'employee_id',
+])
+
+_entries = {}
+_lock = threading.Lock()
+
+
+def get_ttl():
+    return getattr(settings, 'USER_ACCESS_TTL', 300)
+
+
+def _load(user):
+    row = User.objects.filter(pk=user.pk).values(
+        'profile__role',
+        'profile__can_view_payroll',
+        'profile__can_manage_employees',
+        'profile__can_approve_leaves',
+        'employee_profile__id',
+    ).first() or {}
+    # Staff users have every permission, whatever their profile says
+    staff = user.is_staff or user.is_superuser
+    return UserAccess(
+        user_id=user.pk,
+        role=row.get('profile__role'),
+        can_view_payroll=staff or bool(row.get('profile__can_view_payroll')),
+        can_manage_employees=staff or bool(row.get('profile__can_manage_employees')),
+        can_approve_leaves=staff or bool(row.get('profile__can_approve_leaves')),
+        employee_id=row.get('employee_profile__id'),
+    )
+
+
+def get_user_access(user):
+    """
+    The UserAccess of ``user``, or None for anonymous users
+    """
+    if user is None or not user.is_authenticated:
+        return None
+    # Users authenticated from token claims carry their access with them
+    token_access = getattr(user, 'token_access', None)
+    if token_access is not None:
+        return token_access
+    now = time.monotonic()
+    entry = _entries.get(user.pk)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+    access = _load(user)
+    with _lock:
+        _entries[user.pk] = (now + get_ttl(), access)
+    return access
+
+
+def has_flag(user, flag):
+    """
+    Whether ``user`` holds the ``flag`` permission; staff users hold every
+    permission without a lookup
+    """
+    if user is None or not user.is_authenticated:
+        return False
+    if user.is_staff or user.is_superuser:
+        return True
+    return getattr(get_user_access(user), flag)
+
+
+def invalidate(user_id=None, employee_id=None):
+    """
+    Drop the entry of a user and any entry pointing at an employee
+    """
+    with _lock:
+        _entries.pop(user_id, None)
+        if employee_id is not None:
+            for key, (_, access) in list(_entries.items()):
+                if access.employee_id == employee_id:
+                    del _entries[key]
+
+
+def clear():
+    with _lock:
+        _entries.clear()
@@ -0,0 +1,141 @@
+"""
+Buffered login attempt auditing.
+
+Login attempts are queued in memory and written with one ``bulk_create``
+when LOGIN_AUDIT_BUFFER_SIZE attempts are waiting or the oldest has waited
+LOGIN_AUDIT_FLUSH_INTERVAL seconds, so a login does not open a write
+transaction of its own. The buffer is flushed when the process exits; if
+the database cannot be written, attempts are appended to the
+LOGIN_AUDIT_SPOOL_PATH file (JSON Lines) and loaded on the next flush.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import LoginAttempt
+
+logger = logging.getLogger(__name__)
+
+SPOOLED_FIELDS = ['user_id', 'username', 'ip_address', 'is_successful']
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LoginAttemptBuffer:
+    def __init__(self):
+        self._attempts = []
+        self._lock = threading.Lock()
+        self._timer = None
+
+    def __len__(self):
+        return len(self._attempts)
+
+    def add(self, attempt):
+        with self._lock:
+            self._attempts.append(attempt)
+            if len(self._attempts) >= get_setting('LOGIN_AUDIT_BUFFER_SIZE', 100):
+                batch = self._take()
+            else:
+                batch = None
+                if self._timer is None:
+                    self._timer = threading.Timer(get_setting('LOGIN_AUDIT_FLUSH_INTERVAL', 5), self._flush_in_thread)
+                    self._timer.daemon = True
+                    self._timer.start()
+        if batch:
+            self.write(batch)
+
+    def _take(self):
+        """
+        Remove and return the buffered attempts; the caller holds the lock
+        """
+        batch, self._attempts = self._attempts, []
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def flush(self):
+        """
+        Write the buffered attempts and any spooled by an earlier failure
+        """
+        with self._lock:
+            batch = self._take()
+        batch = load_spool() + batch
+        if batch:
+            self.write(batch)
+        return len(batch)
+
+    def clear(self):
+        with self._lock:
+            self._take()
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        finally:
+            close_old_connections()
+
+    def write(self, batch):
+        try:
+            LoginAttempt.objects.bulk_create(batch, batch_size=500)
+        except DatabaseError:
+            logger.exception("Could not write %d login attempts, spooling them", len(batch))
+            spool(batch)
+
+
+def spool(batch):
+    with open(get_setting('LOGIN_AUDIT_SPOOL_PATH', 'login_attempts.spool.jsonl'), 'a') as handle:
+        for attempt in batch:
+            record = {field: getattr(attempt, field) for field in SPOOLED_FIELDS}
+            record['timestamp'] = attempt.timestamp.isoformat()
+            handle.write(json.dumps(record) + '\n')
+
+
+def load_spool():
+    """
+    Read and remove the spool file, returning unsaved LoginAttempts
+    """
+    path = get_setting('LOGIN_AUDIT_SPOOL_PATH', 'login_attempts.spool.jsonl')
+    try:
+        with open(path) as handle:
+            lines = handle.readlines()
+    except FileNotFoundError:
+        return []
+    os.remove(path)
+    attempts = []
+    for line in lines:
+        record = json.loads(line)
+        record['timestamp'] = parse_datetime(record['timestamp'])
+        attempts.append(LoginAttempt(**record))
+    return attempts
+
+
+login_attempts = LoginAttemptBuffer()
+atexit.register(login_attempts.flush)
+
+
+def record_login_attempt(username, ip_address, is_successful, user=None):
+    """
+    Queue a login attempt for the audit log
+    """
+    attempt = LoginAttempt(
+        user=user,
+        username=username or '',
+        ip_address=ip_address,
+        is_successful=is_successful,
+        timestamp=timezone.now(),
+    )
+    if get_setting('LOGIN_AUDIT_BUFFER_SIZE', 100) <= 1:
+        login_attempts.write([attempt])
+    else:
+        login_attempts.add(attempt)
+    return attempt
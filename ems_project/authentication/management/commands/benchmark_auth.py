@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from rest_framework import permissions
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from authentication import access
+from authentication.permissions import CanApproveLeaves
+from authentication.tokens import ClaimsJWTAuthentication, tokens_for_user
+from ems_project.benchmarking import rolled_back, measure, seed_employees
+
+
+class ProbeView(APIView):
+    """
+    Authenticates, checks a profile permission and resolves the employee id,
+    the work every scoped API request does before touching its own data
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request):
+        can_approve = CanApproveLeaves().has_permission(request, self)
+        return Response({'employee_id': access.get_user_access(request.user).employee_id, 'approver': can_approve})
+
+
+class Command(BaseCommand):
+    help = "Benchmark requests/second of database-backed vs claims-based JWT authentication"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            seed_employees(1, departments=1)
+            user = User.objects.get(employee_profile__isnull=False)
+            token = str(tokens_for_user(user).access_token)
+            factory = APIRequestFactory()
+
+            for label, authentication in [('JWTAuthentication', JWTAuthentication),
+                                          ('ClaimsJWTAuthentication', ClaimsJWTAuthentication)]:
+                view = ProbeView.as_view(authentication_classes=[authentication])
+                access.clear()
+                self.run(label, view, factory, token, options['requests'])
+
+    def run(self, label, view, factory, token, count):
+        with measure() as result:
+            for _ in range(count):
+                response = view(factory.get('/probe/', HTTP_AUTHORIZATION=f'Bearer {token}'))
+                assert response.status_code == 200, response.data
+        self.stdout.write(
+            f"{label}: {count} requests in {result['seconds']:.3f}s "
+            f"({count / result['seconds']:.0f} requests/s, {result['queries'] / count:.2f} queries/request)"
+        )
@@ -0,0 +1,55 @@
+import gzip
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from authentication.models import LoginAttempt
+
+ARCHIVED_FIELDS = ['id', 'user_id', 'username', 'ip_address', 'timestamp', 'is_successful']
+
+
+class Command(BaseCommand):
+    help = "Delete (and optionally archive) login attempts older than the retention period, in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.LOGIN_AUDIT_RETENTION_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--archive', help="Append pruned rows to this JSON Lines file (.gz to compress)")
+        parser.add_argument('--dry-run', action='store_true')
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        expired = LoginAttempt.objects.filter(timestamp__lt=cutoff)
+        if options['dry_run']:
+            self.stdout.write(f"{expired.count()} login attempts older than {cutoff:%Y-%m-%d %H:%M} would be pruned.")
+            return
+
+        archive = None
+        if options['archive']:
+            opener = gzip.open if options['archive'].endswith('.gz') else open
+            archive = opener(options['archive'], 'at')
+
+        pruned = 0
+        try:
+            while True:
+                # Oldest first, one short transaction per batch
+                with transaction.atomic():
+                    rows = list(expired.order_by('timestamp', 'pk').values(*ARCHIVED_FIELDS)[:options['batch_size']])
+                    if not rows:
+                        break
+                    if archive is not None:
+                        for row in rows:
+                            row['timestamp'] = row['timestamp'].isoformat()
+                            archive.write(json.dumps(row) + '\n')
+                        archive.flush()
+                    LoginAttempt.objects.filter(pk__in=[row['id'] for row in rows]).delete()
+                pruned += len(rows)
+        finally:
+            if archive is not None:
+                archive.close()
+
+        self.stdout.write(f"Pruned {pruned} login attempts older than {cutoff:%Y-%m-%d %H:%M}.")
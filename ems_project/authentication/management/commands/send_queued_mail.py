@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from authentication import outbox
+
+
+class Command(BaseCommand):
+    help = "Send the due messages of the mail outbox"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        summary = outbox.send_queued_mail(batch_size=options['batch_size'])
+        self.stdout.write(
+            f"{summary['sent']} sent, {summary['retried']} to retry, {summary['failed']} failed."
+        )
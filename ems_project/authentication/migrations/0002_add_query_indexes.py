@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="loginattempt",
+            index=models.Index(
+                fields=["-timestamp"], name="loginattempt_timestamp_idx"
+            ),
+        ),
+    ]
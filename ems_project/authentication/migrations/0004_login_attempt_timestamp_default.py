@@ -0,0 +1,19 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("authentication", "0003_outgoing_email"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="loginattempt",
+            name="timestamp",
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
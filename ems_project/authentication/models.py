@@ -1,7 +1,8 @@
 from django.db import models
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from django.utils import timezone
 
 # Create your models here.
 
@@ -36,6 +37,25 @@ def create_user_profile(sender, instance, created, **kwargs):
     if created:
         UserProfile.objects.create(user=instance)
 
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+@receiver(post_save, sender=UserProfile)
+@receiver(post_delete, sender=UserProfile)
+@receiver(post_save, sender='employees.Employee')
+@receiver(post_delete, sender='employees.Employee')
+def invalidate_user_access(sender, instance, **kwargs):
+    """
+    Drop cached access entries affected by a user, profile or employee change
+    """
+    from .access import invalidate
+
+    if sender is User:
+        invalidate(user_id=instance.pk)
+    elif sender is UserProfile:
+        invalidate(user_id=instance.user_id)
+    else:
+        invalidate(user_id=instance.user_id, employee_id=instance.pk)
+
 class PasswordResetToken(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     token = models.CharField(max_length=255, unique=True)
@@ -50,7 +70,8 @@ class LoginAttempt(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, null=True)
     username = models.CharField(max_length=150)
     ip_address = models.GenericIPAddressField()
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Set when the attempt is made; attempts are written in batches later
+    timestamp = models.DateTimeField(default=timezone.now)
     is_successful = models.BooleanField(default=False)
 
     def __str__(self):
@@ -58,3 +79,39 @@ class LoginAttempt(models.Model):
 
     class Meta:
         ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['-timestamp'], name='loginattempt_timestamp_idx'),
+        ]
+
+class OutgoingEmail(models.Model):
+    """
+    Outbox of mail waiting to be sent by the background mail worker
+    """
+    STATUS_CHOICES = [
+        ('PENDING', 'Pending'),
+        ('SENT', 'Sent'),
+        ('FAILED', 'Failed')
+    ]
+
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    from_email = models.CharField(max_length=254)
+    recipients = models.JSONField()
+    status = models.CharField(max_length=7, choices=STATUS_CHOICES, default='PENDING')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Not sent before this time: retry backoff, or the lease of a worker
+    # currently sending it
+    send_after = models.DateTimeField(default=timezone.now)
+    claim = models.UUIDField(null=True, blank=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.subject} to {', '.join(self.recipients)} ({self.get_status_display()})"
+
+    class Meta:
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['send_after'], condition=models.Q(status='PENDING'), name='outgoingemail_due_idx'),
+        ]
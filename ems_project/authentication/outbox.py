@@ -0,0 +1,188 @@
+"""
+Outgoing mail, sent in the background.
+
+``queue_mail`` stores a message in the ``OutgoingEmail`` outbox and, once
+the surrounding transaction commits, wakes a worker: a Celery task when
+MAIL_OUTBOX_WORKER is 'celery', otherwise a single background thread of
+this process. Workers claim due messages in batches with a time-limited
+lease (so a crashed worker's batch is picked up again), send each batch
+over one SMTP connection and reschedule failures with exponential backoff
+until MAIL_OUTBOX_MAX_ATTEMPTS is reached. Before each message is sent its
+lease is renewed, only if this worker still holds it, and its outcome is
+recorded right after; a message another worker reclaimed after the batch's
+lease ran out is skipped instead of being sent twice.
+
+``send_queued_mail`` is also available as a management command, for cron.
+"""
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMessage, get_connection
+from django.db import close_old_connections, transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import OutgoingEmail
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mail-outbox')
+_retry_timer = None
+_retry_lock = threading.Lock()
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+def queue_mail(subject, body, from_email, recipients):
+    """
+    Add a message to the outbox; it is sent after the current transaction
+    commits
+    """
+    message = OutgoingEmail.objects.create(
+        subject=subject, body=body, from_email=from_email, recipients=list(recipients),
+    )
+    transaction.on_commit(dispatch)
+    return message
+
+
+def dispatch(countdown=0):
+    """
+    Ask a worker to send the due messages, after ``countdown`` seconds
+    """
+    if get_setting('MAIL_OUTBOX_WORKER', 'thread') == 'celery':
+        from .tasks import send_queued_mail_task
+
+        send_queued_mail_task.apply_async(countdown=countdown)
+        return None
+    if countdown:
+        _schedule_retry(countdown)
+        return None
+    return _executor.submit(_run_in_thread)
+
+
+def _schedule_retry(countdown):
+    global _retry_timer
+    with _retry_lock:
+        if _retry_timer is not None:
+            _retry_timer.cancel()
+        _retry_timer = threading.Timer(countdown, dispatch)
+        _retry_timer.daemon = True
+        _retry_timer.start()
+
+
+def _run_in_thread():
+    close_old_connections()
+    try:
+        summary = send_queued_mail()
+    except Exception:
+        logger.exception("Sending queued mail failed")
+        raise
+    finally:
+        close_old_connections()
+    if summary['next_retry'] is not None:
+        dispatch(countdown=summary['next_retry'])
+    return summary
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` due messages to this worker
+    """
+    now = timezone.now()
+    claim = uuid.uuid4()
+    due = OutgoingEmail.objects.filter(status='PENDING', send_after__lte=now)
+    ids = list(due.order_by('send_after').values_list('pk', flat=True)[:batch_size])
+    if not ids:
+        return []
+    # Only rows nobody else claimed in the meantime are updated
+    due.filter(pk__in=ids).update(claim=claim, send_after=now + get_lease())
+    return list(OutgoingEmail.objects.filter(claim=claim))
+
+
+def get_lease():
+    return timedelta(seconds=get_setting('MAIL_OUTBOX_LEASE', 300))
+
+
+def backoff(attempts):
+    return get_setting('MAIL_OUTBOX_RETRY_DELAY', 30) * 2 ** (attempts - 1)
+
+
+def _held(message):
+    return OutgoingEmail.objects.filter(pk=message.pk, claim=message.claim, status='PENDING')
+
+
+def _send_batch(messages, connection):
+    """
+    Send a claimed batch; returns the number of messages sent, retried and
+    failed for good
+    """
+    max_attempts = get_setting('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+    sent = retried = failed = 0
+    for message in messages:
+        # Earlier messages may have outlasted the batch's lease
+        if not _held(message).update(send_after=timezone.now() + get_lease()):
+            logger.warning("Mail %s was reclaimed by another worker", message.pk)
+            continue
+        held = _held(message)
+        message.attempts += 1
+        try:
+            connection.open()
+            EmailMessage(
+                message.subject, message.body, message.from_email, message.recipients, connection=connection,
+            ).send()
+        except Exception as exc:
+            message.last_error = f'{type(exc).__name__}: {exc}'
+            if message.attempts >= max_attempts:
+                message.status = 'FAILED'
+                failed += 1
+            else:
+                message.send_after = timezone.now() + timedelta(seconds=backoff(message.attempts))
+                retried += 1
+            # The connection may be unusable after an error; the next message
+            # opens a new one
+            connection.close()
+        else:
+            message.status = 'SENT'
+            message.sent_at = timezone.now()
+            message.last_error = ''
+            sent += 1
+        message.claim = None
+        held.update(
+            status=message.status, attempts=message.attempts, last_error=message.last_error,
+            send_after=message.send_after, sent_at=message.sent_at, claim=None,
+        )
+    return sent, retried, failed
+
+
+def send_queued_mail(batch_size=None):
+    """
+    Send every due message, batch by batch, over one SMTP connection that
+    stays open for the whole run.
+
+    Returns the number of messages sent, retried and failed for good, and
+    the seconds until the next retry is due (None when nothing is waiting).
+    """
+    batch_size = batch_size or get_setting('MAIL_OUTBOX_BATCH_SIZE', 100)
+    summary = {'sent': 0, 'retried': 0, 'failed': 0}
+    connection = get_connection(fail_silently=False)
+    try:
+        while True:
+            messages = claim_batch(batch_size)
+            if not messages:
+                break
+            sent, retried, failed = _send_batch(messages, connection)
+            summary['sent'] += sent
+            summary['retried'] += retried
+            summary['failed'] += failed
+    finally:
+        connection.close()
+
+    next_due = OutgoingEmail.objects.filter(status='PENDING').aggregate(next_due=Min('send_after'))['next_due']
+    summary['next_retry'] = max((next_due - timezone.now()).total_seconds(), 0) if next_due else None
+    return summary
@@ -0,0 +1,26 @@
+from rest_framework import permissions
+
+from .access import has_flag
+
+
+class ProfilePermission(permissions.BasePermission):
+    """
+    Grants access to staff users and to users whose profile has the
+    ``flag`` permission set
+    """
+    flag = None
+
+    def has_permission(self, request, view):
+        return has_flag(request.user, self.flag)
+
+
+class CanViewPayroll(ProfilePermission):
+    flag = 'can_view_payroll'
+
+
+class CanManageEmployees(ProfilePermission):
+    flag = 'can_manage_employees'
+
+
+class CanApproveLeaves(ProfilePermission):
+    flag = 'can_approve_leaves'
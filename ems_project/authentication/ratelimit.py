@@ -0,0 +1,239 @@
+"""
+Brute-force protection for the login and password reset endpoints.
+
+Each limit is an approximate sliding window: the count in the current
+fixed window plus the previous window's count weighted by how much of it
+still overlaps the sliding window. That needs two integers per key, so
+checking and recording an attempt is O(1) and never reads the database.
+
+Counters live in this process unless LOGIN_RATE_LIMIT_CACHE names a cache
+alias (e.g. 'api' backed by Redis) to share them between processes. The
+in-process counters are warmed from recent failed LoginAttempt rows the
+first time they are used.
+"""
+import math
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+
+from .models import LoginAttempt
+
+class MemoryStore:
+    """
+    Per-process counters: key -> [window index, current count, previous count]
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._lock = threading.Lock()
+        self._sweep_at = 10000
+        self.warmed = False
+
+    def claim_warm_up(self):
+        with self._lock:
+            claimed, self.warmed = not self.warmed, True
+        return claimed
+
+    def _shift(self, entry, index):
+        if entry[0] == index:
+            return entry
+        previous = entry[1] if entry[0] == index - 1 else 0
+        return [index, 0, previous]
+
+    def add(self, key, index, window, amount=1):
+        with self._lock:
+            entry = self._shift(self._counters.get(key, [index, 0, 0]), index)
+            entry[1] += amount
+            self._counters[key] = entry
+            if len(self._counters) >= self._sweep_at:
+                self._sweep(index)
+
+    def counts(self, key, index, window):
+        entry = self._counters.get(key)
+        if entry is None:
+            return 0, 0
+        _, current, previous = self._shift(list(entry), index)
+        return current, previous
+
+    def reset(self, key, index):
+        with self._lock:
+            self._counters.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._counters.clear()
+            self.warmed = False
+
+    def _sweep(self, index):
+        """
+        Drop counters that no longer affect any window; the caller holds the
+        lock. Amortized: the next sweep waits until the table doubles.
+        """
+        self._counters = {key: entry for key, entry in self._counters.items() if entry[0] >= index - 1}
+        self._sweep_at = max(10000, 2 * len(self._counters))
+
+
+class CacheStore:
+    """
+    Counters shared through a Django cache, one key per window
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+        self.warmed = False
+
+    def _key(self, key, index):
+        return f'ratelimit:{key}:{index}'
+
+    def claim_warm_up(self):
+        """
+        Only the first process to use the shared counters warms them
+        """
+        self.warmed = True
+        return self.cache.add('ratelimit:warmed', True, None)
+
+    def add(self, key, index, window, amount=1):
+        cache_key = self._key(key, index)
+        if not self.cache.add(cache_key, amount, 2 * window):
+            try:
+                self.cache.incr(cache_key, amount)
+            except ValueError:
+                self.cache.set(cache_key, amount, 2 * window)
+
+    def counts(self, key, index, window):
+        current, previous = self._key(key, index), self._key(key, index - 1)
+        values = self.cache.get_many([current, previous])
+        return values.get(current, 0), values.get(previous, 0)
+
+    def reset(self, key, index):
+        self.cache.delete_many([self._key(key, index), self._key(key, index - 1)])
+
+
+_memory_store = MemoryStore()
+_cache_stores = {}
+
+
+def get_store():
+    alias = getattr(settings, 'LOGIN_RATE_LIMIT_CACHE', None)
+    if not alias:
+        return _memory_store
+    if alias not in _cache_stores:
+        _cache_stores[alias] = CacheStore(alias)
+    return _cache_stores[alias]
+
+
+def get_limits():
+    """
+    The configured limits: name -> (attempts, window in seconds)
+    """
+    return settings.LOGIN_RATE_LIMITS
+
+
+class RateLimit:
+    def __init__(self, name, store=None, now=None):
+        self.name = name
+        self.limit, self.window = get_limits()[name]
+        self.store = store or get_store()
+        self.now = now if now is not None else time.time()
+        self.index = int(self.now // self.window)
+        # Seconds into the current window
+        self.elapsed = self.now - self.index * self.window
+
+    def key(self, value):
+        return f'{self.name}:{str(value).lower()}'
+
+    def counts(self, value):
+        return self.store.counts(self.key(value), self.index, self.window)
+
+    def count(self, value):
+        current, previous = self.counts(value)
+        return current + previous * (1 - self.elapsed / self.window)
+
+    def hit(self, value):
+        self.store.add(self.key(value), self.index, self.window)
+
+    def reset(self, value):
+        self.store.reset(self.key(value), self.index)
+
+    def retry_after(self, value):
+        """
+        Seconds until the weighted count drops below the limit, 0 if it is
+        below already
+        """
+        current, previous = self.counts(value)
+        if current + previous * (1 - self.elapsed / self.window) < self.limit:
+            return 0
+        if current >= self.limit:
+            # Wait for the current window to become the previous one and
+            # decay enough: current * (1 - t / window) < limit
+            wait = self.window - self.elapsed + self.window * (1 - self.limit / current)
+        else:
+            # previous * (1 - t / window) + current < limit
+            wait = self.window * (1 - (self.limit - current) / previous) - self.elapsed
+        return max(math.ceil(wait), 1)
+
+
+def warm(store=None, now=None):
+    """
+    Replay the failed login attempts still inside their windows into
+    ``store``
+    """
+    store = store or get_store()
+    now = now if now is not None else time.time()
+    names = ['login_ip', 'login_username']
+    longest = max(get_limits()[name][1] for name in names)
+    since = timezone.now() - timedelta(seconds=2 * longest)
+    attempts = LoginAttempt.objects.filter(timestamp__gte=since, is_successful=False).order_by('timestamp')
+    for username, ip_address, timestamp in attempts.values_list('username', 'ip_address', 'timestamp').iterator():
+        for name, value in zip(names, (ip_address, username)):
+            rate_limit = RateLimit(name, store=store, now=timestamp.timestamp())
+            # Only the current and the previous window count
+            if rate_limit.index >= int(now // rate_limit.window) - 1:
+                rate_limit.hit(value)
+
+
+def _ensure_warm(store):
+    if getattr(settings, 'LOGIN_RATE_LIMIT_WARM', True) and not store.warmed:
+        if store.claim_warm_up():
+            warm(store)
+
+
+def check(**values):
+    """
+    Seconds to wait if any of the named limits is exceeded for its value
+    (e.g. ``check(login_ip='10.0.0.1', login_username='alice')``), else 0
+    """
+    store = get_store()
+    _ensure_warm(store)
+    now = time.time()
+    return max((RateLimit(name, store, now).retry_after(value) for name, value in values.items() if value), default=0)
+
+
+def hit(**values):
+    """
+    Record an attempt against each of the named limits
+    """
+    store = get_store()
+    now = time.time()
+    for name, value in values.items():
+        if value:
+            RateLimit(name, store, now).hit(value)
+
+
+def reset(**values):
+    store = get_store()
+    for name, value in values.items():
+        if value:
+            RateLimit(name, store).reset(value)
+
+
+def clear():
+    """
+    Forget the in-process counters (they are warmed again on next use)
+    """
+    _memory_store.clear()
+    _cache_stores.clear()
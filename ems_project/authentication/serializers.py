@@ -9,11 +9,23 @@ class UserSerializer(serializers.ModelSerializer):
         fields = ['id', 'username', 'email', 'first_name', 'last_name']
 
 class UserProfileSerializer(serializers.ModelSerializer):
+    """
+    A profile as its owner sees it: the role and permission flags are
+    read-only, so users cannot grant themselves access
+    """
     user = UserSerializer(read_only=True)
 
     class Meta:
         model = UserProfile
         fields = '__all__'
+        read_only_fields = ['role', 'can_view_payroll', 'can_manage_employees', 'can_approve_leaves']
+
+class AdminUserProfileSerializer(UserProfileSerializer):
+    """
+    A profile as staff see it, with the role and flags writable
+    """
+    class Meta(UserProfileSerializer.Meta):
+        read_only_fields = []
 
 class UserRegistrationSerializer(serializers.ModelSerializer):
     password = serializers.CharField(
@@ -40,11 +52,10 @@ class UserRegistrationSerializer(serializers.ModelSerializer):
         validated_data.pop('password2')
         user = User.objects.create_user(**validated_data)
         
-        # Automatically create user profile
-        UserProfile.objects.create(
-            user=user, 
-            role='EMPLOYEE'  # Default role
-        )
+        # The post_save signal has created the profile already
+        profile = user.profile
+        profile.role = 'EMPLOYEE'  # Default role
+        profile.save(update_fields=['role'])
         
         return user
 
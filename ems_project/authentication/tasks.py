@@ -0,0 +1,13 @@
+from celery import shared_task
+
+from . import outbox
+
+
+@shared_task(ignore_result=True)
+def send_queued_mail_task():
+    """
+    Send the due messages of the mail outbox, then schedule the next retry
+    """
+    summary = outbox.send_queued_mail()
+    if summary['next_retry'] is not None:
+        outbox.dispatch(countdown=summary['next_retry'])
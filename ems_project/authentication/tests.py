@@ -1,3 +1,533 @@
-from django.test import TestCase
+import gzip
+import json
+import os
+import socketserver
+import tempfile
+import threading
+from datetime import date, timedelta
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.mail import get_connection
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from attendance.models import LeaveRequest
+from employees.test_utils import create_employee
+from . import access, audit, outbox, ratelimit
+from .models import LoginAttempt, OutgoingEmail
+from .tokens import ClaimsJWTAuthentication, ClaimsUser
+from .views import get_client_ip
+
+
+class UserAccessTests(TestCase):
+    def setUp(self):
+        access.clear()
+        self.user = User.objects.create_user('employee')
+        self.employee = create_employee(1, user=self.user)
+
+    def test_loaded_once_and_reused(self):
+        with self.assertNumQueries(1):
+            first = access.get_user_access(self.user)
+        with self.assertNumQueries(0):
+            second = access.get_user_access(self.user)
+
+        self.assertIs(first, second)
+        self.assertEqual((first.role, first.employee_id), ('EMPLOYEE', self.employee.pk))
+        self.assertFalse(first.can_approve_leaves)
+
+    def test_profile_and_employee_changes_invalidate(self):
+        access.get_user_access(self.user)
+
+        profile = self.user.profile
+        profile.can_approve_leaves = True
+        profile.save()
+        self.assertTrue(access.get_user_access(self.user).can_approve_leaves)
+
+        self.employee.delete()
+        self.assertIsNone(access.get_user_access(self.user).employee_id)
+
+    @override_settings(USER_ACCESS_TTL=0)
+    def test_entries_expire(self):
+        access.get_user_access(self.user)
+
+        with self.assertNumQueries(1):
+            access.get_user_access(self.user)
+
+    def test_staff_hold_every_flag_without_a_query(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+
+        with self.assertNumQueries(0):
+            self.assertTrue(access.has_flag(admin, 'can_view_payroll'))
+
+
+class ProfilePermissionTests(TestCase):
+    def setUp(self):
+        access.clear()
+        self.client = APIClient()
+        self.approver = User.objects.create_user('approver')
+        self.approver.profile.can_approve_leaves = True
+        self.approver.profile.save()
+        self.approver_employee = create_employee(1, user=self.approver)
+        self.leave = LeaveRequest.objects.create(
+            employee=create_employee(2, user=User.objects.create_user('employee')),
+            leave_type='CL', reason='Personal', start_date=date(2024, 1, 10), end_date=date(2024, 1, 12),
+            total_days=3,
+        )
+
+    def test_flag_grants_approval(self):
+        self.client.force_authenticate(self.approver)
+
+        response = self.client.patch(f'/api/v1/leave-requests/{self.leave.pk}/approve_leave/')
+
+        self.assertEqual(response.status_code, 200)
+        self.leave.refresh_from_db()
+        self.assertEqual((self.leave.status, self.leave.approved_by_id), ('A', self.approver_employee.pk))
+
+    def test_without_flag_only_own_records_are_visible(self):
+        self.client.force_authenticate(self.leave.employee.user)
+        self.client.get('/api/v1/leave-requests/')
+
+        # Warm cache: count and page only, without joining users
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/leave-requests/?fields=status')
+        self.assertEqual(response.data['count'], 1)
+
+        response = self.client.patch(f'/api/v1/leave-requests/{self.leave.pk}/approve_leave/')
+        self.assertEqual(response.status_code, 403)
+        self.assertEqual(self.client.get('/api/v1/payslips/unpaid_payslips/').status_code, 403)
+
+
+    def test_users_cannot_grant_themselves_flags(self):
+        user = self.leave.employee.user
+        self.client.force_authenticate(user)
+
+        response = self.client.patch(f'/api/v1/auth/profiles/{user.profile.pk}/', {
+            'phone_number': '5550100', 'role': 'ADMIN', 'can_view_payroll': True, 'can_approve_leaves': True,
+        })
+
+        self.assertEqual(response.status_code, 200)
+        user.profile.refresh_from_db()
+        self.assertEqual(user.profile.phone_number, '5550100')
+        self.assertEqual(user.profile.role, 'EMPLOYEE')
+        self.assertFalse(user.profile.can_view_payroll or user.profile.can_approve_leaves)
+        self.assertEqual(self.client.get('/api/v1/payslips/salary_statistics/').status_code, 403)
+        self.assertEqual(self.client.delete(f'/api/v1/auth/profiles/{user.profile.pk}/').status_code, 405)
+
+        # Other users' profiles are out of reach
+        response = self.client.patch(f'/api/v1/auth/profiles/{self.approver.profile.pk}/', {'phone_number': '1'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_staff_can_grant_flags(self):
+        user = self.leave.employee.user
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+        response = self.client.patch(f'/api/v1/auth/profiles/{user.profile.pk}/', {'can_view_payroll': True})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(access.has_flag(user, 'can_view_payroll'))
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        access.clear()
+        self.addCleanup(audit.login_attempts.clear)
+        self.user = User.objects.create_user('employee', email='employee@example.com', password='secret')
+        self.employee = create_employee(1, user=self.user)
+        self.user.profile.can_view_payroll = True
+        self.user.profile.save()
+
+    def authenticate(self, token):
+        request = APIRequestFactory().get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return ClaimsJWTAuthentication().authenticate(request)[0]
+
+    def test_login_embeds_claims(self):
+        response = APIClient().post('/api/v1/auth/users/login/', {'username': 'employee', 'password': 'secret'})
+
+        user = self.authenticate(response.data['access'])
+        self.assertEqual((user.token['role'], user.token['employee_id']), ('EMPLOYEE', self.employee.pk))
+        self.assertEqual(user.token['permissions'], ['can_view_payroll'])
+
+    def test_register_issues_tokens_with_claims(self):
+        response = APIClient().post('/api/v1/auth/users/register/', {
+            'username': 'newcomer', 'email': 'newcomer@example.com', 'first_name': 'New', 'last_name': 'Comer',
+            'password': 'Unguessable-42', 'password2': 'Unguessable-42',
+        })
+
+        self.assertEqual(response.status_code, 201)
+        user = self.authenticate(response.data['access'])
+        self.assertEqual(user.id, User.objects.get(username='newcomer').pk)
+        self.assertEqual(user.token['username'], 'newcomer')
+        self.assertEqual((user.token['role'], user.token['employee_id']), ('EMPLOYEE', None))
+        self.assertEqual(user.token['permissions'], [])
+        self.assertFalse(user.token['is_staff'])
+
+    def test_authorization_needs_no_query(self):
+        token = APIClient().post('/api/v1/auth/users/login/', {'username': 'employee', 'password': 'secret'}).data['access']
+        access.clear()
+
+        with self.assertNumQueries(0):
+            user = self.authenticate(token)
+            self.assertIsInstance(user, ClaimsUser)
+            self.assertEqual(access.get_user_access(user).employee_id, self.employee.pk)
+            self.assertTrue(access.has_flag(user, 'can_view_payroll'))
+            self.assertFalse(access.has_flag(user, 'can_approve_leaves'))
+
+        # Anything else comes from the user row, loaded once
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, 'employee@example.com')
+            self.assertEqual(user.first_name, '')
+
+    def test_refresh_reads_current_claims(self):
+        self.user.is_staff = True
+        self.user.save()
+        refresh = APIClient().post('/api/v1/auth/users/login/', {'username': 'employee', 'password': 'secret'}).data['refresh']
+        self.user.is_staff = False
+        self.user.save()
+        self.user.profile.can_view_payroll = False
+        self.user.profile.save()
+
+        response = APIClient().post('/api/token/refresh/', {'refresh': refresh})
+
+        self.assertEqual(response.status_code, 200)
+        user = self.authenticate(response.data['access'])
+        self.assertFalse(user.token['is_staff'])
+        self.assertEqual(user.token['permissions'], [])
+        # The old refresh token was rotated out
+        self.assertEqual(APIClient().post('/api/token/refresh/', {'refresh': refresh}).status_code, 401)
+
+    def test_deactivated_user_cannot_refresh(self):
+        refresh = APIClient().post('/api/v1/auth/users/login/', {'username': 'employee', 'password': 'secret'}).data['refresh']
+        self.user.is_active = False
+        self.user.save()
+
+        response = APIClient().post('/api/token/refresh/', {'refresh': refresh})
+
+        self.assertEqual(response.status_code, 401)
+        self.assertNotIn('access', response.data)
+
+    def test_tokens_without_claims_fall_back_to_the_access_cache(self):
+        user = self.authenticate(RefreshToken.for_user(self.user).access_token)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(access.get_user_access(user).employee_id, self.employee.pk)
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough SMTP for smtplib: accepts every message except those for
+    recipients containing 'reject'
+    """
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply('220 localhost ready')
+        recipients = []
+        while line := self.rfile.readline().decode():
+            command = line[:4].upper()
+            if command in ('HELO', 'EHLO'):
+                self.reply('250 localhost')
+            elif command == 'RCPT':
+                if 'reject' in line:
+                    self.reply('550 mailbox unavailable')
+                else:
+                    recipients.append(line)
+                    self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 end with .')
+                data = []
+                while (line := self.rfile.readline().decode()) != '.\r\n':
+                    data.append(line)
+                self.server.messages.append(''.join(data))
+                recipients = []
+                self.reply('250 OK')
+            elif command == 'QUIT':
+                self.reply('221 bye')
+                return
+            else:
+                self.reply('250 OK')
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+
+
+class SMTPServerMixin:
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = SMTPStandIn()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+        smtp_settings = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1', EMAIL_PORT=cls.server.server_address[1], EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='', EMAIL_HOST_PASSWORD='',
+        )
+        smtp_settings.enable()
+        cls.addClassCleanup(smtp_settings.disable)
+
+    def setUp(self):
+        self.server.connections = 0
+        self.server.messages = []
+
+
+def queue(*recipients):
+    return OutgoingEmail.objects.bulk_create([
+        OutgoingEmail(subject='Hello', body='Body', from_email='noreply@example.com', recipients=[recipient])
+        for recipient in recipients
+    ])
+
+
+class MailOutboxTests(SMTPServerMixin, TestCase):
+    def test_batches_share_one_connection(self):
+        queue('a@example.com', 'b@example.com', 'c@example.com')
+
+        summary = outbox.send_queued_mail(batch_size=2)
+
+        self.assertEqual((summary['sent'], summary['next_retry']), (3, None))
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(self.server.connections, 1)
+        self.assertFalse(OutgoingEmail.objects.exclude(status='SENT').exists())
+
+    @override_settings(MAIL_OUTBOX_MAX_ATTEMPTS=2, MAIL_OUTBOX_RETRY_DELAY=60)
+    def test_failures_are_retried_with_backoff_then_given_up(self):
+        queue('reject@example.com', 'ok@example.com')
+
+        summary = outbox.send_queued_mail()
+
+        self.assertEqual((summary['sent'], summary['retried']), (1, 1))
+        self.assertAlmostEqual(summary['next_retry'], 60, delta=5)
+        message = OutgoingEmail.objects.get(recipients=['reject@example.com'])
+        self.assertEqual((message.status, message.attempts), ('PENDING', 1))
+        self.assertIn('SMTPRecipientsRefused', message.last_error)
+
+        OutgoingEmail.objects.filter(pk=message.pk).update(send_after=timezone.now())
+        summary = outbox.send_queued_mail()
+
+        self.assertEqual((summary['failed'], summary['next_retry']), (1, None))
+        self.assertEqual(OutgoingEmail.objects.get(pk=message.pk).status, 'FAILED')
+
+    def test_claimed_messages_are_not_sent_twice(self):
+        queue('a@example.com')
+        self.assertEqual(len(outbox.claim_batch(10)), 1)
+
+        self.assertEqual(outbox.send_queued_mail()['sent'], 0)
+
+
+    def test_message_reclaimed_after_the_lease_expired_mid_batch_is_skipped(self):
+        first, second = queue('a@example.com', 'b@example.com')
+        batch = outbox.claim_batch(10)
+        # The first send outlasts the lease and another worker claims the rest
+        OutgoingEmail.objects.filter(pk=second.pk).update(send_after=timezone.now() - timedelta(seconds=1))
+        [reclaimed] = outbox.claim_batch(10)
+        self.assertEqual(reclaimed.pk, second.pk)
+
+        connection = get_connection()
+        with self.assertLogs('authentication.outbox', 'WARNING'):
+            self.assertEqual(outbox._send_batch(batch, connection), (1, 0, 0))
+        self.assertEqual(outbox._send_batch([reclaimed], connection), (1, 0, 0))
+        connection.close()
+
+        self.assertEqual(len(self.server.messages), 2)
+        self.assertEqual(set(OutgoingEmail.objects.values_list('status', 'attempts')), {('SENT', 1)})
+
+class PasswordResetMailTests(SMTPServerMixin, TransactionTestCase):
+    def test_request_returns_before_the_mail_is_sent_in_the_background(self):
+        User.objects.create_user('employee', email='employee@example.com')
+
+        response = APIClient().post('/api/v1/auth/password-reset/request_reset/', {'email': 'employee@example.com'})
+
+        self.assertEqual(response.status_code, 200)
+        # The worker runs one job at a time: this one finishes after the
+        # one queued by the request
+        outbox.dispatch().result(timeout=10)
+        self.assertEqual(len(self.server.messages), 1)
+        self.assertIn('reset-password?token=', self.server.messages[0])
+        self.assertEqual(OutgoingEmail.objects.get().status, 'SENT')
+
+
+@override_settings(LOGIN_AUDIT_BUFFER_SIZE=3)
+class LoginAuditTests(TestCase):
+    def setUp(self):
+        ratelimit.clear()
+        audit.login_attempts.clear()
+        self.addCleanup(audit.login_attempts.clear)
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        spool_settings = override_settings(LOGIN_AUDIT_SPOOL_PATH=os.path.join(directory.name, 'spool.jsonl'))
+        spool_settings.enable()
+        self.addCleanup(spool_settings.disable)
+        User.objects.create_user('employee', password='secret')
+        self.client = APIClient()
+
+    def login(self, password='secret'):
+        return self.client.post('/api/v1/auth/users/login/', {'username': 'employee', 'password': password})
+
+    def test_attempts_are_written_in_batches(self):
+        self.login()
+        self.login(password='wrong')
+        self.assertEqual(LoginAttempt.objects.count(), 0)
+
+        with self.assertNumQueries(1):
+            audit.record_login_attempt('employee', '127.0.0.1', True)
+
+        self.assertEqual(
+            list(LoginAttempt.objects.order_by('timestamp').values_list('is_successful', flat=True)),
+            [True, False, True],
+        )
+
+    def test_flush_keeps_the_time_of_the_attempt(self):
+        attempt = audit.record_login_attempt('employee', '127.0.0.1', False)
+
+        self.assertEqual(audit.login_attempts.flush(), 1)
+        self.assertEqual(LoginAttempt.objects.get().timestamp, attempt.timestamp)
+
+    def test_unwritable_attempts_are_spooled_and_replayed(self):
+        audit.record_login_attempt('employee', '127.0.0.1', False)
+        with mock.patch.object(LoginAttempt.objects, 'bulk_create', side_effect=DatabaseError), \
+                self.assertLogs('authentication.audit', 'ERROR'):
+            audit.login_attempts.flush()
+        self.assertEqual(LoginAttempt.objects.count(), 0)
+
+        audit.login_attempts.flush()
+
+        self.assertEqual(LoginAttempt.objects.get().username, 'employee')
+        self.assertEqual(audit.load_spool(), [])
+
+    def test_prune_command_archives_in_batches(self):
+        now = timezone.now()
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(username=f'user{days}', ip_address='127.0.0.1', timestamp=now - timedelta(days=days))
+            for days in (1, 200, 300, 400)
+        ])
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        archive = os.path.join(directory.name, 'attempts.jsonl.gz')
+
+        out = StringIO()
+        call_command('prune_login_attempts', days=180, batch_size=2, archive=archive, stdout=out)
+
+        self.assertIn('Pruned 3 login attempts', out.getvalue())
+        self.assertEqual(list(LoginAttempt.objects.values_list('username', flat=True)), ['user1'])
+        with gzip.open(archive, 'rt') as handle:
+            self.assertEqual([json.loads(line)['username'] for line in handle], ['user400', 'user300', 'user200'])
+
+
+class RateLimitTests(TestCase):
+    def setUp(self):
+        ratelimit.clear()
+        self.addCleanup(audit.login_attempts.clear)
+        User.objects.create_user('employee', email='employee@example.com', password='secret')
+        self.client = APIClient()
+
+    def login(self, username='employee', password='wrong', ip='10.0.0.1'):
+        return self.client.post(
+            '/api/v1/auth/users/login/', {'username': username, 'password': password}, REMOTE_ADDR=ip,
+        )
+
+    def test_failed_logins_lock_the_username(self):
+        for _ in range(5):
+            self.assertEqual(self.login().status_code, 401)
+
+        with self.assertNumQueries(0):
+            response = self.login(password='secret')
+
+        self.assertEqual(response.status_code, 429)
+        self.assertGreater(int(response['Retry-After']), 0)
+        self.assertEqual(self.login(username='other').status_code, 401)
+
+    def test_successful_login_resets_the_username_counter(self):
+        for _ in range(4):
+            self.login()
+        self.assertEqual(self.login(password='secret').status_code, 200)
+
+        self.assertEqual(self.login().status_code, 401)
+
+    @override_settings(LOGIN_RATE_LIMITS={**settings.LOGIN_RATE_LIMITS, 'login_ip': (3, 600)})
+    def test_ip_limit_spans_usernames(self):
+        for index in range(3):
+            self.login(username=f'user{index}')
+
+        self.assertEqual(self.login(username='employee', password='secret').status_code, 429)
+        self.assertEqual(self.login(ip='10.0.0.2', password='secret').status_code, 200)
+
+    @override_settings(LOGIN_RATE_LIMITS={**settings.LOGIN_RATE_LIMITS, 'login_ip': (3, 600)})
+    def test_forwarded_for_cannot_be_rotated(self):
+        for index in range(3):
+            self.client.post(
+                '/api/v1/auth/users/login/', {'username': f'user{index}', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}',
+            )
+
+        response = self.client.post(
+            '/api/v1/auth/users/login/', {'username': 'employee', 'password': 'secret'},
+            REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='192.0.2.99',
+        )
+        self.assertEqual(response.status_code, 429)
+
+    def test_client_ip_behind_trusted_proxies(self):
+        request = APIRequestFactory().get('/', REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR='6.6.6.6, 203.0.113.7')
+
+        self.assertEqual(get_client_ip(request), '10.0.0.1')
+        with override_settings(TRUSTED_PROXY_COUNT=1):
+            self.assertEqual(get_client_ip(request), '203.0.113.7')
+        with override_settings(TRUSTED_PROXY_COUNT=3):
+            self.assertEqual(get_client_ip(request), '10.0.0.1')
+
+    @override_settings(LOGIN_RATE_LIMITS={**settings.LOGIN_RATE_LIMITS, 'login_username': (10, 100)})
+    def test_previous_window_is_weighted_by_its_overlap(self):
+        store = ratelimit.MemoryStore()
+        for _ in range(8):
+            ratelimit.RateLimit('login_username', store, now=1050).hit('employee')
+        for _ in range(2):
+            ratelimit.RateLimit('login_username', store, now=1120).hit('employee')
+
+        later = ratelimit.RateLimit('login_username', store, now=1125)
+        self.assertEqual(later.count('employee'), 2 + 8 * 0.75)
+        self.assertEqual(later.retry_after('employee'), 0)
+        for _ in range(3):
+            later.hit('employee')
+        # 5 + 8 * (1 - t / 100) < 10 once t > 37.5, 12.5 seconds from now
+        self.assertEqual(later.retry_after('employee'), 13)
+
+    def test_counters_are_warmed_from_recent_failures(self):
+        LoginAttempt.objects.bulk_create([
+            LoginAttempt(username='employee', ip_address='10.0.0.9', is_successful=False) for _ in range(5)
+        ])
+
+        self.assertEqual(self.login(password='secret').status_code, 429)
+
+    def test_password_reset_requests_are_limited_per_email(self):
+        for _ in range(3):
+            self.client.post('/api/v1/auth/password-reset/request_reset/', {'email': 'employee@example.com'})
+
+        response = self.client.post('/api/v1/auth/password-reset/request_reset/', {'email': 'employee@example.com'})
+        self.assertEqual(response.status_code, 429)
+
+    @override_settings(LOGIN_RATE_LIMIT_CACHE='api')
+    def test_shared_cache_store(self):
+        caches['api'].clear()
+        for _ in range(5):
+            self.login()
+
+        self.assertEqual(self.login(password='secret').status_code, 429)
+        ratelimit.clear()
+        self.assertEqual(self.login(password='secret').status_code, 429)
@@ -0,0 +1,109 @@
+"""
+JWTs carrying the claims needed to authorize API requests.
+
+Tokens issued by ``tokens_for_user`` embed the user's staff status, role,
+permission flags and employee id. ``ClaimsJWTAuthentication`` (opt in with
+JWT_STATELESS_AUTH=1) trusts those claims instead of loading the ``User``
+row on every request; the row is only fetched when a view reads an
+attribute the token does not carry. Claims are a snapshot taken when the
+token is issued: ``ClaimsTokenRefreshSerializer`` re-reads the user and
+profile on every refresh and refuses inactive users, so role, permission
+and account changes apply within ACCESS_TOKEN_LIFETIME.
+"""
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from . import access
+from .access import UserAccess, get_user_access
+
+PERMISSION_FLAGS = ['can_view_payroll', 'can_manage_employees', 'can_approve_leaves']
+
+
+def tokens_for_user(user):
+    """
+    A refresh token (and through it, access tokens) for ``user`` with the
+    authorization claims embedded
+    """
+    access = get_user_access(user)
+    refresh = RefreshToken.for_user(user)
+    refresh['username'] = user.username
+    refresh['is_staff'] = user.is_staff
+    refresh['is_superuser'] = user.is_superuser
+    refresh['role'] = access.role
+    refresh['employee_id'] = access.employee_id
+    refresh['permissions'] = [flag for flag in PERMISSION_FLAGS if getattr(access, flag)]
+    return refresh
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Issues the new tokens with claims read from the user and profile as
+    they are now, instead of copying them from the refresh token
+    """
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh[api_settings.USER_ID_CLAIM]).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        # Another process may have changed the profile
+        access.invalidate(user_id=user.pk)
+        tokens = tokens_for_user(user)
+
+        data = {'access': str(tokens.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            data['refresh'] = str(tokens)
+        return data
+
+
+class ClaimsUser(TokenUser):
+    """
+    A user backed by token claims. Attributes the token does not carry are
+    read from the ``User`` row, which is loaded on first use.
+    """
+
+    @cached_property
+    def db_user(self):
+        try:
+            return User.objects.get(pk=self.id)
+        except User.DoesNotExist:
+            raise AuthenticationFailed('User not found', code='user_not_found')
+
+    @cached_property
+    def token_access(self):
+        """
+        The UserAccess described by the claims, or None for tokens issued
+        without them
+        """
+        if 'role' not in self.token:
+            return None
+        permissions = set(self.token.get('permissions', []))
+        return UserAccess(
+            user_id=self.id,
+            role=self.token['role'],
+            employee_id=self.token.get('employee_id'),
+            **{flag: self.is_staff or self.is_superuser or flag in permissions for flag in PERMISSION_FLAGS}
+        )
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.db_user, attr)
+
+
+class ClaimsJWTAuthentication(JWTStatelessUserAuthentication):
+    """
+    Authenticates bearer tokens without a database lookup
+    """
+
+    def get_user(self, validated_token):
+        super().get_user(validated_token)
+        return ClaimsUser(validated_token)
@@ -0,0 +1,13 @@
+from django.urls import path, include
+from rest_framework.routers import DefaultRouter
+from .views import UserViewSet, UserProfileViewSet, PasswordResetViewSet, LoginAttemptViewSet
+
+router = DefaultRouter()
+router.register(r'users', UserViewSet, basename='user')
+router.register(r'profiles', UserProfileViewSet, basename='user-profile')
+router.register(r'password-reset', PasswordResetViewSet, basename='password-reset')
+router.register(r'login-attempts', LoginAttemptViewSet, basename='login-attempt')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -1,24 +1,46 @@
 from django.shortcuts import render
 from rest_framework import viewsets, permissions, status, filters
 from rest_framework.decorators import action
+from rest_framework.exceptions import Throttled
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate
 from django.utils import timezone
-from django.core.mail import send_mail
+from django_filters.rest_framework import DjangoFilterBackend
 import uuid
 
+from ems_project.pagination import LoginAttemptPagination
+
 from .models import UserProfile, PasswordResetToken, LoginAttempt
+from .tokens import tokens_for_user
+from . import audit, outbox, ratelimit
 from .serializers import (
     UserSerializer, 
     UserProfileSerializer, 
+    AdminUserProfileSerializer,
     UserRegistrationSerializer, 
     PasswordResetSerializer, 
     PasswordResetTokenSerializer,
     LoginAttemptSerializer
 )
 
+def get_client_ip(request):
+    """
+    Get client IP address
+
+    X-Forwarded-For is only trusted for the TRUSTED_PROXY_COUNT entries
+    appended by our own proxies, counted from the right; anything to their
+    left was sent by the client and is ignored.
+    """
+    proxies = getattr(settings, 'TRUSTED_PROXY_COUNT', 0)
+    x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxies and x_forwarded_for:
+        addresses = [address.strip() for address in x_forwarded_for.split(',')]
+        if len(addresses) >= proxies:
+            return addresses[-proxies]
+    return request.META.get('REMOTE_ADDR')
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     A ViewSet for handling user-related operations
@@ -38,7 +60,7 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
+            refresh = tokens_for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
                 'refresh': str(refresh),
@@ -53,44 +75,52 @@ class UserViewSet(viewsets.ModelViewSet):
         """
         username = request.data.get('username')
         password = request.data.get('password')
+        ip_address = get_client_ip(request)
+        
+        # Refuse before checking the password while either limit is exceeded
+        wait = ratelimit.check(login_ip=ip_address, login_username=username)
+        if wait:
+            raise Throttled(wait=wait)
         
         user = authenticate(username=username, password=password)
         
         # Log login attempt
-        login_attempt = LoginAttempt.objects.create(
+        audit.record_login_attempt(
             username=username,
-            ip_address=self.get_client_ip(request),
+            ip_address=ip_address,
             is_successful=user is not None
         )
         
         if user:
-            refresh = RefreshToken.for_user(user)
+            ratelimit.reset(login_username=username)
+            refresh = tokens_for_user(user)
             return Response({
                 'refresh': str(refresh),
                 'access': str(refresh.access_token)
             })
+        ratelimit.hit(login_ip=ip_address, login_username=username)
         return Response({'detail': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
-    def get_client_ip(self, request):
-        """
-        Get client IP address
-        """
-        x_forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
-        if x_forwarded_for:
-            ip = x_forwarded_for.split(',')[0]
-        else:
-            ip = request.META.get('REMOTE_ADDR')
-        return ip
-
 class UserProfileViewSet(viewsets.ModelViewSet):
     """
     A ViewSet for handling user profile operations
+
+    Profiles are created with their user and deleted with it. Users may
+    edit their own contact details; only staff can change roles and
+    permission flags.
     """
     queryset = UserProfile.objects.all()
     serializer_class = UserProfileSerializer
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [filters.SearchFilter]
     search_fields = ['department', 'role']
+    http_method_names = ['get', 'put', 'patch', 'head', 'options']
+
+    def get_serializer_class(self):
+        user = self.request.user
+        if user.is_staff or user.is_superuser:
+            return AdminUserProfileSerializer
+        return UserProfileSerializer
 
     def get_queryset(self):
         """
@@ -99,7 +129,7 @@ class UserProfileViewSet(viewsets.ModelViewSet):
         user = self.request.user
         if user.is_staff or user.is_superuser:
             return UserProfile.objects.all()
-        return UserProfile.objects.filter(user=user)
+        return UserProfile.objects.filter(user_id=user.pk)
 
 class PasswordResetViewSet(viewsets.ViewSet):
     """
@@ -112,6 +142,13 @@ class PasswordResetViewSet(viewsets.ViewSet):
         """
         Request password reset token
         """
+        ip_address = get_client_ip(request)
+        email = str(request.data.get('email', ''))
+        wait = ratelimit.check(reset_ip=ip_address, reset_email=email)
+        if wait:
+            raise Throttled(wait=wait)
+        ratelimit.hit(reset_ip=ip_address, reset_email=email)
+        
         serializer = PasswordResetSerializer(data=request.data)
         if serializer.is_valid():
             email = serializer.validated_data['email']
@@ -127,12 +164,11 @@ class PasswordResetViewSet(viewsets.ViewSet):
             
             # Send reset email
             reset_url = f"https://yourfrontend.com/reset-password?token={token}"
-            send_mail(
+            outbox.queue_mail(
                 'Password Reset Request',
                 f'Click the link to reset your password: {reset_url}',
                 'noreply@yourcompany.com',
                 [email],
-                fail_silently=False,
             )
             
             return Response({'detail': 'Password reset link sent'})
@@ -163,3 +199,14 @@ class PasswordResetViewSet(viewsets.ViewSet):
         reset_token.save()
         
         return Response({'detail': 'Password reset successful'})
+
+class LoginAttemptViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    A ViewSet for auditing login attempts
+    """
+    queryset = LoginAttempt.objects.all()
+    serializer_class = LoginAttemptSerializer
+    permission_classes = [permissions.IsAdminUser]
+    filter_backends = [DjangoFilterBackend]
+    filterset_fields = ['username', 'ip_address', 'is_successful']
+    pagination_class = LoginAttemptPagination
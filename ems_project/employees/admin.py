@@ -1,13 +1,15 @@
 from django.contrib import admin
 from .models import Employee, Department, EmployeeDocument, Performance
+from .search import EmployeeSearchAdminMixin
 
 # Register your models here.
 
 @admin.register(Employee)
-class EmployeeAdmin(admin.ModelAdmin):
+class EmployeeAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('first_name', 'last_name', 'email', 'department', 'employment_type')
     list_filter = ('department', 'employment_type', 'is_active')
     search_fields = ('first_name', 'last_name', 'email')
+    employee_search_path = ''
     ordering = ('first_name', 'last_name')
 
 @admin.register(Department)
@@ -16,13 +18,13 @@ class DepartmentAdmin(admin.ModelAdmin):
     search_fields = ('name',)
 
 @admin.register(EmployeeDocument)
-class EmployeeDocumentAdmin(admin.ModelAdmin):
+class EmployeeDocumentAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('employee', 'document_type', 'uploaded_at')
     list_filter = ('document_type',)
     search_fields = ('employee__first_name', 'employee__last_name')
 
 @admin.register(Performance)
-class PerformanceAdmin(admin.ModelAdmin):
+class PerformanceAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('employee', 'review_date', 'overall_score')
     list_filter = ('review_date',)
     search_fields = ('employee__first_name', 'employee__last_name')
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class EmployeesConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "employees"
+
+    def ready(self):
+        from ems_project import response_cache
+        from .models import Department, Employee, Performance
+
+        # Models rendered by cached responses; see ems_project.response_cache
+        for model in (Department, Employee, Performance,):
+            response_cache.watch(model)
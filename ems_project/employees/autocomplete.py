@@ -0,0 +1,247 @@
+"""
+In-process prefix index for the people-picker autocomplete.
+
+Every active employee is indexed under the words of their first name,
+last name and email address (minus the top-level domain) as a sorted
+list of ``(word, employee id)`` pairs, so the employees whose words start
+with a prefix are a contiguous slice found with ``bisect``. A lookup reads
+the narrowest slice among the words of the query and checks the other
+words against each candidate, stopping once ``limit`` matches are found; it
+never touches the database.
+
+The index is loaded the first time it is used (or at server start, see
+``preload``) and employee and department saves and deletes in this
+process are applied to it as they happen, and replayed on an index that
+is being rebuilt. Bulk writes and other processes' writes are picked up by
+a rebuild in the background once the index is older than
+EMPLOYEE_AUTOCOMPLETE_TTL seconds.
+"""
+import bisect
+import logging
+import sys
+import threading
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import close_old_connections
+
+from .models import Employee
+from .search import get_terms
+
+logger = logging.getLogger(__name__)
+
+Entry = namedtuple('Entry', ['id', 'full_name', 'department_id', 'department', 'words'])
+
+
+def get_ttl():
+    return getattr(settings, 'EMPLOYEE_AUTOCOMPLETE_TTL', 300)
+
+
+def index_words(first_name, last_name, email):
+    # 'jane.doe@mail.example.com' is indexed as jane, doe, mail and example
+    email = (email or '').rsplit('.', 1)[0]
+    return frozenset(sys.intern(word) for word in get_terms(f'{first_name} {last_name} {email}'))
+
+
+def make_entry(pk, first_name, last_name, email, department_id, department):
+    return Entry(pk, f'{first_name} {last_name}', department_id, department, index_words(first_name, last_name, email))
+
+
+class PrefixIndex:
+    def __init__(self, entries=()):
+        self._entries = {entry.id: entry for entry in entries}
+        self._keys = sorted((word, entry.id) for entry in self._entries.values() for word in entry.words)
+        self._lock = threading.Lock()
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def load(cls):
+        rows = Employee.objects.filter(is_active=True).values_list(
+            'pk', 'first_name', 'last_name', 'email', 'department_id', 'department__name',
+        )
+        return cls(make_entry(*row) for row in rows.iterator(chunk_size=5000))
+
+    def _remove(self, pk):
+        """
+        Drop an employee's words; the caller holds the lock
+        """
+        entry = self._entries.pop(pk, None)
+        if entry is None:
+            return
+        for word in entry.words:
+            index = bisect.bisect_left(self._keys, (word, pk))
+            if index < len(self._keys) and self._keys[index] == (word, pk):
+                del self._keys[index]
+
+    def put(self, entry):
+        with self._lock:
+            self._remove(entry.id)
+            self._entries[entry.id] = entry
+            for word in entry.words:
+                bisect.insort(self._keys, (word, entry.id))
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove(pk)
+
+    def set_department(self, department_id, name):
+        """
+        Rename a department, or detach its employees when ``name`` is None
+        """
+        with self._lock:
+            for pk, entry in self._entries.items():
+                if entry.department_id == department_id:
+                    self._entries[pk] = entry._replace(
+                        department_id=None if name is None else department_id, department=name,
+                    )
+
+    def _slice(self, prefix):
+        """
+        The range of keys whose word starts with ``prefix``
+        """
+        start = bisect.bisect_left(self._keys, (prefix,))
+        end = bisect.bisect_left(self._keys, (prefix + '\U0010ffff',), lo=start)
+        return prefix, start, end
+
+    def lookup(self, query, limit=10):
+        """
+        Up to ``limit`` entries with a word starting with each word of
+        ``query``, in order of the matched word
+        """
+        terms = set(get_terms(query))
+        if not terms or limit <= 0:
+            return []
+        matches = []
+        seen = set()
+        with self._lock:
+            # Scan the narrowest slice and check the other words per entry
+            first, index, end = min((self._slice(term) for term in terms), key=lambda found: found[2] - found[1])
+            rest = terms - {first}
+            while index < end and len(matches) < limit:
+                pk = self._keys[index][1]
+                index += 1
+                if pk in seen:
+                    continue
+                seen.add(pk)
+                entry = self._entries[pk]
+                if all(any(other.startswith(term) for other in entry.words) for term in rest):
+                    matches.append(entry)
+        return matches
+
+
+class EmployeeAutocomplete:
+    """
+    The process-wide index, loaded on first use and rebuilt in the
+    background when it is older than the TTL. Changes made while an index
+    is being built are recorded and replayed on it before it is swapped
+    in, so none are lost to the rebuild's snapshot.
+    """
+
+    def __init__(self):
+        self._index = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+        self._pending = None
+
+    def get_index(self):
+        index = self._index
+        if index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self._rebuild()
+                index = self._index
+        elif time.monotonic() - index.built_at > get_ttl():
+            self._refresh_in_background()
+        return index
+
+    def _rebuild(self):
+        with self._lock:
+            self._pending = []
+        try:
+            index = PrefixIndex.load()
+        except Exception:
+            with self._lock:
+                self._pending = None
+            raise
+        with self._lock:
+            for change in self._pending:
+                change(index)
+            self._pending = None
+            self._index = index
+
+    def _refresh_in_background(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh, daemon=True, name='employee-autocomplete').start()
+
+    def _refresh(self):
+        try:
+            self._rebuild()
+        except Exception:
+            logger.exception("Rebuilding the employee autocomplete index failed")
+        finally:
+            self._refreshing = False
+            close_old_connections()
+
+    def _apply(self, change):
+        """
+        Apply ``change``, a function of a PrefixIndex, to the current index
+        and record it for an index being built
+        """
+        with self._lock:
+            index = self._index
+            if self._pending is not None:
+                self._pending.append(change)
+        if index is not None:
+            change(index)
+
+    def lookup(self, query, limit=10):
+        return self.get_index().lookup(query, limit)
+
+    def employee_saved(self, employee):
+        if not employee.is_active:
+            self.employee_deleted(employee.pk)
+            return
+        department = employee.department.name if employee.department_id else None
+        entry = make_entry(
+            employee.pk, employee.first_name, employee.last_name, employee.email, employee.department_id, department,
+        )
+        self._apply(lambda index: index.put(entry))
+
+    def employee_deleted(self, pk):
+        self._apply(lambda index: index.remove(pk))
+
+    def department_changed(self, department_id, name):
+        self._apply(lambda index: index.set_department(department_id, name))
+
+    def clear(self):
+        self._index = None
+
+
+employees = EmployeeAutocomplete()
+
+
+def preload():
+    """
+    Build the index in a background thread, so the first autocomplete
+    request does not wait for it; called when the server starts
+    """
+    if not getattr(settings, 'EMPLOYEE_AUTOCOMPLETE_PRELOAD', True):
+        return
+
+    def build():
+        try:
+            employees.get_index()
+        except Exception:
+            logger.exception("Loading the employee autocomplete index failed")
+        finally:
+            close_old_connections()
+
+    threading.Thread(target=build, daemon=True, name='employee-autocomplete').start()
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.models import Q
+
+from employees import search
+from employees.models import Employee
+from ems_project.benchmarking import rolled_back, measure, seed_employees
+
+QUERIES = ['fir', 'first4242', 'last777 first777', 'bench_user_31337', 'nobody']
+
+
+class Command(BaseCommand):
+    help = "Compare employee search through the full-text index with icontains scans (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=100000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--page-size', type=int, default=10)
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.stdout.write(f"Seeding {options['employees']} employees...")
+            seed_employees(options['employees'], batch_size=5000)
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE')
+
+            self.stdout.write(f"Backend: {connection.vendor}")
+            for query in QUERIES:
+                self.stdout.write(self.style.MIGRATE_HEADING(repr(query)))
+                for label, queryset in [('icontains', self.icontains(query)),
+                                        ('index', search.search(Employee.objects.all(), query))]:
+                    self.run(label, queryset, options['repeat'], options['page_size'])
+
+    def icontains(self, query):
+        """
+        The OR-chain of icontains lookups that SearchFilter builds, one per
+        word
+        """
+        queryset = Employee.objects.all()
+        for term in query.split():
+            queryset = queryset.filter(
+                Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(email__icontains=term)
+            )
+        return queryset.order_by('pk')
+
+    def run(self, label, queryset, repeat, page_size):
+        # A list request: the count and the first page
+        timings = []
+        for _ in range(repeat):
+            with measure() as result:
+                count = queryset.count()
+                page = list(queryset.values_list('first_name', 'last_name')[:page_size])
+            timings.append(result['seconds'])
+        top = ', '.join(' '.join(name) for name in page[:3])
+        self.stdout.write(f"  {label:>9}: {min(timings) * 1000:8.2f} ms  {count} matches  [{top}]")
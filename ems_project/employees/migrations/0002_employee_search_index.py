@@ -0,0 +1,116 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+import employees.models
+
+
+# The search index as of this migration. Later changes to the index belong
+# in new migrations, not here, so this DDL is kept local rather than
+# imported from employees.search.
+SQLITE_INDEX_SQL = [
+    """
+    CREATE VIRTUAL TABLE employees_employee_fts USING fts5(
+        first_name, last_name, email,
+        content='employees_employee', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER employees_employee_fts_insert AFTER INSERT ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END
+    """,
+    """
+    CREATE TRIGGER employees_employee_fts_delete AFTER DELETE ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(employees_employee_fts, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+    END
+    """,
+    """
+    CREATE TRIGGER employees_employee_fts_update AFTER UPDATE OF first_name, last_name, email
+    ON employees_employee BEGIN
+        INSERT INTO employees_employee_fts(employees_employee_fts, rowid, first_name, last_name, email)
+        VALUES ('delete', old.id, old.first_name, old.last_name, old.email);
+        INSERT INTO employees_employee_fts(rowid, first_name, last_name, email)
+        VALUES (new.id, new.first_name, new.last_name, new.email);
+    END
+    """,
+    # bm25 weights for first_name, last_name and email
+    "INSERT INTO employees_employee_fts(employees_employee_fts, rank) VALUES ('rank', 'bm25(10.0, 10.0, 1.0)')",
+    "INSERT INTO employees_employee_fts(employees_employee_fts) VALUES ('rebuild')",
+]
+
+SQLITE_DROP_SQL = [
+    "DROP TRIGGER IF EXISTS employees_employee_fts_insert",
+    "DROP TRIGGER IF EXISTS employees_employee_fts_delete",
+    "DROP TRIGGER IF EXISTS employees_employee_fts_update",
+    "DROP TABLE IF EXISTS employees_employee_fts",
+]
+
+# Must match employees.search.POSTGRES_DOCUMENT for queries to use the index
+POSTGRES_INDEX_SQL = [
+    """
+    CREATE INDEX employee_search_idx ON employees_employee USING GIN (
+        (setweight(to_tsvector('simple', first_name || ' ' || last_name), 'A')
+         || setweight(to_tsvector('simple', translate(email, '@._-+', '     ')), 'D'))
+    )
+    """,
+]
+
+POSTGRES_DROP_SQL = ["DROP INDEX IF EXISTS employee_search_idx"]
+
+
+def create_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_INDEX_SQL, "postgresql": POSTGRES_INDEX_SQL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+def drop_search_index(apps, schema_editor):
+    statements = {"sqlite": SQLITE_DROP_SQL, "postgresql": POSTGRES_DROP_SQL}
+    for sql in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("employees", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="EmployeeSearchIndex",
+            fields=[
+                (
+                    "employee",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_index",
+                        serialize=False,
+                        to="employees.employee",
+                    ),
+                ),
+                ("first_name", models.TextField()),
+                ("last_name", models.TextField()),
+                ("email", models.TextField()),
+                (
+                    "document",
+                    employees.models.SearchDocumentField(
+                        db_column="employees_employee_fts"
+                    ),
+                ),
+                ("rank", models.FloatField()),
+            ],
+            options={
+                "db_table": "employees_employee_fts",
+                "managed": False,
+            },
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 from django.core.validators import RegexValidator, EmailValidator, MinValueValidator, MaxValueValidator
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 
 class Department(models.Model):
     name = models.CharField(max_length=100, unique=True)
@@ -51,6 +53,71 @@ class Employee(models.Model):
     def full_name(self):
         return f"{self.first_name} {self.last_name}"
 
+@receiver(post_save, sender=Employee)
+def update_autocomplete_on_save(sender, instance, **kwargs):
+    """
+    Keep this process's autocomplete index in step with employee changes
+    """
+    from .autocomplete import employees
+
+    employees.employee_saved(instance)
+
+@receiver(post_delete, sender=Employee)
+def update_autocomplete_on_delete(sender, instance, **kwargs):
+    from .autocomplete import employees
+
+    employees.employee_deleted(instance.pk)
+
+@receiver(post_save, sender=Department)
+@receiver(post_delete, sender=Department)
+def update_autocomplete_departments(sender, instance, **kwargs):
+    """
+    Department renames show up in autocomplete results; deleting one
+    detaches its employees (on_delete=SET_NULL sends no employee signals)
+    """
+    from .autocomplete import employees
+
+    name = None if kwargs.get('signal') is post_delete else instance.name
+    employees.department_changed(instance.pk, name)
+
+class SearchDocumentField(models.TextField):
+    """
+    The hidden column of an FTS5 table that is named after the table
+    """
+
+@SearchDocumentField.register_lookup
+class Match(models.Lookup):
+    lookup_name = 'match'
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f'{lhs} MATCH {rhs}', lhs_params + rhs_params
+
+class EmployeeSearchIndex(models.Model):
+    """
+    The SQLite FTS5 table indexing employee names and emails. It is created
+    and kept in sync by database triggers (see employees/search.py).
+    """
+    employee = models.OneToOneField(
+        Employee,
+        primary_key=True,
+        db_column='rowid',
+        db_constraint=False,
+        on_delete=models.DO_NOTHING,
+        related_name='search_index',
+    )
+    first_name = models.TextField()
+    last_name = models.TextField()
+    email = models.TextField()
+    document = SearchDocumentField(db_column='employees_employee_fts')
+    # bm25() of the row against the MATCH query, lower is more relevant
+    rank = models.FloatField()
+
+    class Meta:
+        managed = False
+        db_table = 'employees_employee_fts'
+
 class EmployeeDocument(models.Model):
     DOCUMENT_TYPES = [
         ('ID', 'Identity Proof'),
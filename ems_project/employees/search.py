@@ -0,0 +1,124 @@
+"""
+Full-text search over employee names and email addresses.
+
+On SQLite the ``employees_employee_fts`` FTS5 table indexes first_name,
+last_name and email; triggers keep it in step with every insert, update
+and delete on ``employees_employee``, bulk writes included. On PostgreSQL
+a GIN index over a tsvector of the same columns serves the search. Both
+are created by migrations (employees 0002); this module only queries them.
+Other backends fall back to ``icontains``.
+
+Every word of a query is matched as a prefix ("jo sm" finds John Smith)
+and all of them must match. Results are ordered by relevance, with name
+matches ranked above email matches.
+"""
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, F, FloatField, Q
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+from .models import Employee, EmployeeSearchIndex
+
+MAX_TERMS = 8
+
+FTS_TABLE = 'employees_employee_fts'
+
+# setweight() labels: A for names, D for the email address. The parser
+# would keep an address as one token, so its punctuation becomes spaces.
+# Must match the indexed expression of the employee_search_idx migration.
+POSTGRES_DOCUMENT = (
+    "(setweight(to_tsvector('simple', {table}first_name || ' ' || {table}last_name), 'A')"
+    " || setweight(to_tsvector('simple', translate({table}email, '@._-+', '     ')), 'D'))"
+)
+
+
+def get_terms(query):
+    """
+    The words of a search query, lowercased; punctuation separates words
+    """
+    return re.findall(r'[^\W_]+', (query or '').lower())[:MAX_TERMS]
+
+
+def fts5_query(terms):
+    return ' AND '.join(f'"{term}"*' for term in terms)
+
+
+def tsquery(terms):
+    return ' & '.join(f'{term}:*' for term in terms)
+
+
+def _postgres_document(queryset):
+    return POSTGRES_DOCUMENT.format(table=f'"{queryset.model._meta.db_table}".')
+
+
+def search(queryset, query, ranked=True):
+    """
+    Restrict an Employee queryset to the matches for ``query``, most
+    relevant first unless ``ranked`` is False
+    """
+    terms = get_terms(query)
+    if not terms:
+        return queryset.none()
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        if not ranked:
+            return queryset.filter(pk__in=matching_ids(query, using=queryset.db))
+        return queryset.filter(search_index__document__match=fts5_query(terms)).annotate(
+            search_rank=F('search_index__rank'),
+        ).order_by('search_rank', 'pk')
+    if vendor == 'postgresql':
+        document = _postgres_document(queryset)
+        queryset = queryset.filter(RawSQL(
+            f"{document} @@ to_tsquery('simple', %s)", [tsquery(terms)], output_field=BooleanField(),
+        ))
+        if not ranked:
+            return queryset
+        return queryset.annotate(search_rank=RawSQL(
+            f"ts_rank({document}, to_tsquery('simple', %s))", [tsquery(terms)], output_field=FloatField(),
+        )).order_by('-search_rank', 'pk')
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(first_name__icontains=term) | Q(last_name__icontains=term) | Q(email__icontains=term)
+    return queryset.filter(condition)
+
+
+def matching_ids(query, using='default'):
+    """
+    An unordered subquery of the ids of the employees matching ``query``
+    """
+    terms = get_terms(query)
+    if connections[using].vendor == 'sqlite' and terms:
+        return EmployeeSearchIndex.objects.using(using).filter(
+            document__match=fts5_query(terms),
+        ).values('employee_id')
+    return search(Employee.objects.using(using), query, ranked=False).values('pk')
+
+
+class EmployeeSearchAdminMixin:
+    """
+    Admin search through the employee index. ``employee_search_path`` is
+    the lookup from the admin's model to Employee ('' for Employee itself).
+    """
+    employee_search_path = 'employee'
+
+    def get_search_results(self, request, queryset, search_term):
+        if not get_terms(search_term):
+            return super().get_search_results(request, queryset, search_term)
+        lookup = f'{self.employee_search_path}__in' if self.employee_search_path else 'pk__in'
+        return queryset.filter(**{lookup: matching_ids(search_term, using=queryset.db)}), False
+
+
+class EmployeeSearchFilter(filters.SearchFilter):
+    """
+    ``?search=`` through the employee index, most relevant first (an
+    explicit ``?ordering=`` still takes precedence)
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        query = request.query_params.get(self.search_param, '')
+        if not get_terms(query):
+            return queryset
+        return search(queryset, query)
@@ -1,4 +1,5 @@
 from rest_framework import serializers
+from ems_project.sparse_fieldsets import SparseFieldsetSerializerMixin
 from .models import Employee, Department, EmployeeDocument, Performance
 
 class DepartmentSerializer(serializers.ModelSerializer):
@@ -25,7 +26,18 @@ class PerformanceSerializer(serializers.ModelSerializer):
     def get_reviewer_name(self, obj):
         return f"{obj.reviewer.first_name} {obj.reviewer.last_name}" if obj.reviewer else None
 
-class EmployeeSerializer(serializers.ModelSerializer):
+class EmployeeListSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
+    """
+    Compact representation used by the employee list endpoint
+    """
+    full_name = serializers.ReadOnlyField()
+    department_name = serializers.CharField(source='department.name', read_only=True)
+
+    class Meta:
+        model = Employee
+        fields = ['id', 'full_name', 'department', 'department_name', 'is_active']
+
+class EmployeeSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     department_name = serializers.CharField(source='department.name', read_only=True)
     documents = EmployeeDocumentSerializer(many=True, read_only=True)
     performance_records = PerformanceSerializer(many=True, read_only=True)
@@ -0,0 +1,30 @@
+"""
+Fixture factories shared by the apps' tests.
+"""
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+
+from .models import Employee
+
+
+def create_employee(index, user=None, salary='30000.00', **kwargs):
+    """
+    An employee numbered ``index``, with a user of their own unless
+    ``user`` is given; other fields can be overridden
+    """
+    if user is None:
+        user = User.objects.create(username=f'employee{index}')
+    defaults = {
+        'first_name': f'First{index}',
+        'last_name': f'Last{index}',
+        'email': f'employee{index}@example.com',
+        'gender': 'F',
+        'date_of_birth': date(1990, 1, 1),
+        'date_of_joining': date(2020, 1, 1),
+        'employment_type': 'FT',
+        'salary': Decimal(salary),
+    }
+    defaults.update(kwargs)
+    return Employee.objects.create(user=user, **defaults)
@@ -1,3 +1,474 @@
-from django.test import TestCase
+import socketserver
+import threading
+import time
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from ems_project import response_cache
+from . import autocomplete, search
+from .models import Department, Employee, EmployeeDocument, Performance
+from .test_utils import create_employee
+
+
+class EmployeeQueryBudgetTests(TestCase):
+    """
+    Every endpoint runs a fixed number of queries regardless of how many
+    rows it renders.
+    """
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def seed(self, count, prefix='e'):
+        Employee.objects.all().delete()
+        reviewer = create_employee(f'{prefix}-reviewer')
+        for index in range(count):
+            department = Department.objects.create(name=f'Dept {prefix}-{index}')
+            employee = create_employee(f'{prefix}-{index}', department=department)
+            EmployeeDocument.objects.create(employee=employee, document_type='ID', document_file='id.pdf')
+            Performance.objects.create(
+                employee=employee, reviewer=reviewer, review_date=date(2024, 1, 1),
+                technical_score=8, communication_score=7, teamwork_score=9, leadership_score=6,
+            )
+        return Employee.objects.exclude(pk=reviewer.pk).first()
+
+    def test_employee_list(self):
+        for count in (2, 12):
+            self.seed(count, prefix=count)
+            # count, employees joined with departments
+            with self.assertNumQueries(2):
+                response = self.client.get('/api/v1/employees/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data['count'], count + 1)
+
+    def test_employee_list_expanded(self):
+        for count in (2, 12):
+            self.seed(count, prefix=count)
+            # count, employees, documents, performance records with reviewers
+            with self.assertNumQueries(4):
+                response = self.client.get('/api/v1/employees/?expand=documents,performance_records')
+            employee = response.data['results'][-1]
+            self.assertIn('documents', employee)
+            self.assertIn('performance_records', employee)
+
+    def test_employee_detail(self):
+        employee = self.seed(3)
+        with self.assertNumQueries(3):
+            response = self.client.get(f'/api/v1/employees/{employee.pk}/')
+        self.assertEqual(len(response.data['performance_records']), 1)
+
+    def test_performance_history(self):
+        employee = self.seed(3)
+        Performance.objects.create(
+            employee=employee, review_date=date(2023, 1, 1),
+            technical_score=8, communication_score=7, teamwork_score=9, leadership_score=6,
+        )
+        # employee lookup, performances joined with employee and reviewer
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/api/v1/employees/{employee.pk}/performance_history/')
+        self.assertEqual(len(response.data), 2)
+
+    def test_performance_list_and_top_performers(self):
+        for count in (2, 12):
+            self.seed(count, prefix=count)
+            with self.assertNumQueries(2):
+                self.client.get('/api/v1/performances/')
+            with self.assertNumQueries(1):
+                response = self.client.get('/api/v1/performances/top_performers/')
+            self.assertEqual(len(response.data), min(count, 10))
+
+
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.employee = create_employee(1, department=Department.objects.create(name='Engineering'))
+
+    def test_compact_list(self):
+        response = self.client.get('/api/v1/employees/')
+
+        self.assertEqual(response.data['results'], [{
+            'id': self.employee.pk,
+            'full_name': 'First1 Last1',
+            'department': self.employee.department_id,
+            'department_name': 'Engineering',
+            'is_active': True,
+        }])
+
+    def test_fields_select_only_requested_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/v1/employees/?fields=email,department_name')
+
+        self.assertEqual(response.data['results'], [{
+            'id': self.employee.pk,
+            'email': 'employee1@example.com',
+            'department_name': 'Engineering',
+        }])
+        self.assertNotIn('salary', queries[-1]['sql'])
+
+    def test_fields_on_detail(self):
+        response = self.client.get(f'/api/v1/employees/{self.employee.pk}/?fields=salary')
+
+        self.assertEqual(response.data, {'id': self.employee.pk, 'salary': '30000.00'})
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    """
+    Just enough of the Redis protocol (RESP2) for Django's Redis cache
+    backend: strings with expiry, counters, MGET and MULTI/EXEC pipelines
+    """
+
+    def read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def encode(self, value):
+        if value is None:
+            return b'$-1\r\n'
+        if isinstance(value, Exception):
+            return b'-ERR ' + str(value).encode() + b'\r\n'
+        if isinstance(value, int):
+            return b':%d\r\n' % value
+        if isinstance(value, list):
+            return b'*%d\r\n' % len(value) + b''.join(self.encode(item) for item in value)
+        if value == 'OK' or value == 'QUEUED':
+            return b'+' + value.encode() + b'\r\n'
+        return b'$%d\r\n%s\r\n' % (len(value), value)
+
+    def handle(self):
+        queued = None
+        while (args := self.read_command()) is not None:
+            name = args[0].decode().upper()
+            if name == 'MULTI':
+                queued, reply = [], 'OK'
+            elif name == 'EXEC':
+                reply, queued = [self.server.execute(command) for command in queued], None
+            elif queued is not None:
+                queued.append(args)
+                reply = 'QUEUED'
+            else:
+                reply = self.server.execute(args)
+            self.wfile.write(self.encode(reply))
+
+
+class RedisStandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.data = {}
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return 'redis://%s:%d/0' % self.server_address
+
+    def _get(self, key):
+        value, expires = self.data.get(key, (None, None))
+        if expires is not None and expires <= time.monotonic():
+            del self.data[key]
+            return None
+        return value
+
+    def execute(self, args):
+        name, args = args[0].decode().upper(), args[1:]
+        with self.lock:
+            if name in ('PING', 'SELECT', 'CLIENT'):
+                return 'OK'
+            if name == 'GET':
+                return self._get(args[0])
+            if name == 'MGET':
+                return [self._get(key) for key in args]
+            if name == 'EXISTS':
+                return sum(self._get(key) is not None for key in args)
+            if name == 'SET':
+                key, value, options = args[0], args[1], [arg.decode().upper() for arg in args[2:]]
+                if 'NX' in options and self._get(key) is not None:
+                    return None
+                expires = None
+                if 'EX' in options:
+                    expires = time.monotonic() + int(options[options.index('EX') + 1])
+                self.data[key] = (value, expires)
+                return 'OK'
+            if name == 'DEL':
+                return sum(self.data.pop(key, None) is not None for key in args)
+            if name in ('INCR', 'INCRBY'):
+                delta = int(args[1]) if name == 'INCRBY' else 1
+                value = int(self._get(args[0]) or 0) + delta
+                self.data[args[0]] = (str(value).encode(), self.data.get(args[0], (None, None))[1])
+                return value
+            return ValueError(f'unknown command {name}')
+
+
+class DepartmentResponseCacheTests(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        response_cache.reset_statistics()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        Department.objects.create(name='Engineering')
+
+    def test_repeated_reads_are_served_from_the_cache(self):
+        with self.assertNumQueries(2):
+            first = self.client.get('/api/v1/departments/')
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/v1/departments/')
+
+        self.assertEqual(second.data, first.data)
+        stats = self.client.get('/api/v1/cache-statistics/').data
+        self.assertEqual(stats['employees.views.DepartmentViewSet.list'], {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_query_params_and_scope_are_part_of_the_key(self):
+        self.client.get('/api/v1/departments/')
+
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/v1/departments/?search=none')
+        self.assertEqual(response.data['count'], 0)
+
+        self.client.force_authenticate(User.objects.create_user('staff', is_staff=True))
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/departments/')
+        self.client.force_authenticate(User.objects.create_user('employee'))
+        self.assertEqual(self.client.get('/api/v1/departments/').status_code, 403)
+
+    def test_writes_invalidate_cached_responses(self):
+        self.client.get('/api/v1/departments/')
+
+        department = Department.objects.create(name='Finance')
+        self.assertEqual(self.client.get('/api/v1/departments/').data['count'], 2)
+
+        self.client.get(f'/api/v1/departments/{department.pk}/')
+        department.delete()
+        self.assertEqual(self.client.get(f'/api/v1/departments/{department.pk}/').status_code, 404)
+
+    def test_top_performers_follow_employee_changes(self):
+        employee = create_employee(1)
+        Performance.objects.create(
+            employee=employee, review_date=date(2024, 1, 1),
+            technical_score=8, communication_score=7, teamwork_score=9, leadership_score=6,
+        )
+        self.client.get('/api/v1/performances/top_performers/')
+
+        employee.first_name = 'Renamed'
+        employee.save()
+
+        response = self.client.get('/api/v1/performances/top_performers/')
+        self.assertEqual(response.data[0]['employee_name'], 'Renamed Last1')
+
+
+    def test_user_saves_keep_top_performers_cached(self):
+        self.client.get('/api/v1/performances/top_performers/')
+
+        User.objects.create_user('someone')
+
+        with self.assertNumQueries(0):
+            self.client.get('/api/v1/performances/top_performers/')
+
+    def test_app_config_connects_version_receivers(self):
+        # Management commands and Celery workers never import the views
+        uid = f'{response_cache.KEY_PREFIX}:employees.employee'
+        post_save.disconnect(sender=Employee, dispatch_uid=uid)
+        self.addCleanup(response_cache.watch, Employee)
+        apps.get_app_config('employees').ready()
+        before = response_cache.model_versions(['employees.employee'])
+
+        create_employee(1)
+
+        self.assertNotEqual(response_cache.model_versions(['employees.employee']), before)
+
+
+class RedisResponseCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = RedisStandIn()
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+    def setUp(self):
+        self.server.data.clear()
+        cache_settings = override_settings(CACHES={
+            'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+            'api': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': self.server.url},
+        })
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        Department.objects.create(name='Engineering')
+
+    def test_responses_and_counters_live_in_redis(self):
+        self.client.get('/api/v1/departments/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/v1/departments/')
+        self.assertEqual(response.data['results'][0]['name'], 'Engineering')
+
+        Department.objects.create(name='Finance')
+        self.assertEqual(self.client.get('/api/v1/departments/').data['count'], 2)
+
+        keys = {key.decode() for key in self.server.data}
+        self.assertTrue(any('api-cache:response:' in key for key in keys))
+        stats = response_cache.statistics()['employees.views.DepartmentViewSet.list']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+
+class EmployeeSearchTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        self.john = create_employee(1, first_name='John', last_name='Smith', email='jsmith@example.com')
+        self.joan = create_employee(2, first_name='Joan', last_name='Doe', email='joan.doe@example.com')
+        self.mary = create_employee(3, first_name='Mary', last_name='Jones', email='mary@johnson.example.com')
+
+    def search(self, query):
+        return list(search.search(Employee.objects.all(), query).values_list('first_name', flat=True))
+
+    def test_prefix_and_multiple_words(self):
+        self.assertEqual(set(self.search('jo')), {'John', 'Joan', 'Mary'})
+        self.assertEqual(self.search('jo sm'), ['John'])
+        self.assertEqual(self.search('JOAN.DOE@'), ['Joan'])
+        self.assertEqual(self.search('nobody'), [])
+        self.assertEqual(self.search('"*'), [])
+
+    def test_names_rank_above_emails(self):
+        self.assertEqual(self.search('john'), ['John', 'Mary'])
+
+    def test_index_follows_writes(self):
+        self.john.first_name = 'Jonathan'
+        self.john.save()
+        self.assertEqual(self.search('john'), ['Mary'])
+        self.assertEqual(self.search('jonathan'), ['Jonathan'])
+
+        Employee.objects.filter(pk=self.joan.pk).update(last_name='Roe')
+        self.assertEqual(self.search('roe'), ['Joan'])
+        self.assertEqual(self.search('doe'), ['Joan'])
+
+        self.mary.delete()
+        self.assertEqual(self.search('mary'), [])
+
+    def test_api_search(self):
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/v1/employees/?search=jo')
+        self.assertEqual(response.data['count'], 3)
+        response = self.client.get('/api/v1/employees/?search=smi')
+        self.assertEqual([row['full_name'] for row in response.data['results']], ['John Smith'])
+
+        Employee.objects.filter(pk=self.mary.pk).update(salary=Decimal('10000.00'))
+        response = self.client.get('/api/v1/employees/?search=jo&ordering=salary')
+        self.assertEqual(response.data['results'][0]['full_name'], 'Mary Jones')
+
+    def test_admin_search(self):
+        Performance.objects.create(
+            employee=self.john, review_date=date(2024, 1, 1),
+            technical_score=8, communication_score=7, teamwork_score=9, leadership_score=6,
+        )
+        self.client.force_login(User.objects.get(username='admin'))
+        response = self.client.get('/admin/employees/performance/', {'q': 'smith'})
+        self.assertEqual(response.context['cl'].result_count, 1)
+        response = self.client.get('/admin/employees/performance/', {'q': 'doe'})
+        self.assertEqual(response.context['cl'].result_count, 0)
+        response = self.client.get('/admin/employees/employee/', {'q': 'jo'})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+
+class AutocompleteTests(TestCase):
+    def setUp(self):
+        autocomplete.employees.clear()
+        self.addCleanup(autocomplete.employees.clear)
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('picker'))
+        self.engineering = Department.objects.create(name='Engineering')
+        self.john = create_employee(
+            1, first_name='John', last_name='Smith', email='jsmith@example.com', department=self.engineering,
+        )
+        self.joan = create_employee(2, first_name='Joan', last_name='Doe', email='joan.doe@mail.example.com')
+        create_employee(3, first_name='Mary', last_name='Jones', email='mary@example.com', is_active=False)
+
+    def suggest(self, query, **params):
+        response = self.client.get('/api/v1/employees/autocomplete/', {'q': query, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_suggestions_without_queries(self):
+        self.suggest('warm up')
+        with self.assertNumQueries(0):
+            results = self.suggest('jo')
+        self.assertEqual(results, [
+            {'id': self.joan.pk, 'full_name': 'Joan Doe', 'department': None},
+            {'id': self.john.pk, 'full_name': 'John Smith', 'department': 'Engineering'},
+        ])
+        self.assertEqual([row['full_name'] for row in self.suggest('smith j')], ['John Smith'])
+        self.assertEqual([row['full_name'] for row in self.suggest('mail')], ['Joan Doe'])
+        self.assertEqual(self.suggest('com'), [])
+        self.assertEqual(self.suggest(''), [])
+        self.assertEqual(len(self.suggest('jo', limit=1)), 1)
+        response = self.client.get('/api/v1/employees/autocomplete/', {'q': 'jo', 'limit': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_index_follows_saves_and_deletes(self):
+        self.suggest('warm up')
+        self.john.first_name = 'Jonathan'
+        self.john.save()
+        self.assertEqual([row['full_name'] for row in self.suggest('jon')], ['Jonathan Smith'])
+        self.assertEqual(self.suggest('john'), [])
+
+        self.joan.is_active = False
+        self.joan.save()
+        self.assertEqual(self.suggest('joan'), [])
+
+        self.engineering.name = 'Platform'
+        self.engineering.save()
+        self.assertEqual(self.suggest('jon')[0]['department'], 'Platform')
+        self.engineering.delete()
+        self.assertIsNone(self.suggest('jon')[0]['department'])
+
+        self.john.delete()
+        self.assertEqual(self.suggest('jon'), [])
+
+    def test_changes_during_a_rebuild_are_replayed(self):
+        self.suggest('warm up')
+        load = autocomplete.PrefixIndex.load
+
+        def load_then_save():
+            # The snapshot is read before these changes
+            index = load()
+            self.john.first_name = 'Jonathan'
+            self.john.save()
+            self.joan.delete()
+            return index
+
+        with mock.patch.object(autocomplete.PrefixIndex, 'load', side_effect=load_then_save):
+            autocomplete.employees._rebuild()
+
+        self.assertEqual([row['full_name'] for row in self.suggest('jo')], ['Jonathan Smith'])
+
+    def test_prefix_index(self):
+        index = autocomplete.PrefixIndex([
+            autocomplete.make_entry(pk, first, last, f'{first}@example.com', None, None)
+            for pk, (first, last) in enumerate([('Ann', 'Lee'), ('Anna', 'Ng'), ('Bo', 'Annan'), ('Cy', 'Li')])
+        ])
+        self.assertEqual([entry.id for entry in index.lookup('an')], [0, 1, 2])
+        self.assertEqual([entry.id for entry in index.lookup('an l')], [0])
+        self.assertEqual([entry.id for entry in index.lookup('l')], [0, 3])
+        index.remove(0)
+        index.put(autocomplete.make_entry(4, 'Andy', 'Lo', 'andy@example.com', None, None))
+        self.assertEqual([entry.id for entry in index.lookup('an l')], [4])
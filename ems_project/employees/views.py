@@ -1,28 +1,66 @@
 from django.shortcuts import render
-from rest_framework import viewsets, permissions, filters
+from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.contrib.auth.models import User
+from django.db.models import Prefetch
 
+from ems_project.response_cache import cache_response
+from ems_project.sparse_fieldsets import SparseFieldsetMixin
+from . import autocomplete
+from .search import EmployeeSearchFilter
 from .models import Employee, Department, EmployeeDocument, Performance
 from .serializers import (
     EmployeeSerializer, 
+    EmployeeListSerializer, 
     DepartmentSerializer, 
     EmployeeDocumentSerializer, 
     PerformanceSerializer
 )
 
-class EmployeeViewSet(viewsets.ModelViewSet):
+class EmployeeViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Employee records
+
+    The list returns a compact representation; use ?fields= to pick columns
+    and ?expand=documents,performance_records for nested histories.
+    ?search= matches word prefixes of names and emails, best match first.
     """
     queryset = Employee.objects.all()
     serializer_class = EmployeeSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    list_serializer_class = EmployeeListSerializer
+    sparse_field_sources = {
+        'full_name': ['first_name', 'last_name'],
+        'department_name': ['department__name'],
+    }
+    sparse_field_prefetches = {
+        'documents': ['documents'],
+        'performance_records': [
+            Prefetch('performance_records', queryset=Performance.objects.select_related('reviewer')),
+        ],
+    }
+    filter_backends = [DjangoFilterBackend, EmployeeSearchFilter, filters.OrderingFilter]
     filterset_fields = ['department', 'employment_type', 'is_active']
+    # Served by the full-text index in employees/search.py
     search_fields = ['first_name', 'last_name', 'email']
     ordering_fields = ['date_of_joining', 'salary']
 
+    def get_queryset(self):
+        """
+        Join and prefetch the relations the serializer renders, so a page of
+        employees costs a fixed number of queries whatever its size
+        """
+        queryset = Employee.objects.all()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('department').prefetch_related(
+                *self.sparse_field_prefetches['documents'],
+                *self.sparse_field_prefetches['performance_records'],
+            )
+        elif self.action in ['update', 'partial_update']:
+            queryset = queryset.select_related('department')
+        return queryset
+
     def get_permissions(self):
         """
         Custom permission logic based on action
@@ -35,13 +73,28 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             permission_classes = [permissions.IsAuthenticated]
         return [permission() for permission in permission_classes]
 
+    @action(detail=False, methods=['get'])
+    def autocomplete(self, request):
+        """
+        People-picker suggestions for ?q= (word prefixes of names and
+        emails), served from the in-process index without a query
+        """
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        entries = autocomplete.employees.lookup(request.query_params.get('q', ''), limit)
+        return Response([
+            {'id': entry.id, 'full_name': entry.full_name, 'department': entry.department} for entry in entries
+        ])
+
     @action(detail=True, methods=['get'])
     def performance_history(self, request, pk=None):
         """
         Retrieve performance history for a specific employee
         """
         employee = self.get_object()
-        performances = Performance.objects.filter(employee=employee)
+        performances = Performance.objects.filter(employee=employee).select_related('employee', 'reviewer')
         serializer = PerformanceSerializer(performances, many=True)
         return Response(serializer.data)
 
@@ -65,6 +118,14 @@ class DepartmentViewSet(viewsets.ModelViewSet):
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
 
+    @cache_response(Department)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(Department)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
 class EmployeeDocumentViewSet(viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Employee Documents
@@ -91,17 +152,18 @@ class PerformanceViewSet(viewsets.ModelViewSet):
         """
         Optionally filter performances by employee
         """
-        queryset = Performance.objects.all()
+        queryset = Performance.objects.select_related('employee', 'reviewer')
         employee_id = self.request.query_params.get('employee_id', None)
         if employee_id is not None:
             queryset = queryset.filter(employee_id=employee_id)
         return queryset
 
     @action(detail=False, methods=['get'])
+    @cache_response(Performance, Employee)
     def top_performers(self, request):
         """
         Retrieve top performers based on overall score
         """
-        top_performers = Performance.objects.order_by('-overall_score')[:10]
+        top_performers = Performance.objects.select_related('employee', 'reviewer').order_by('-overall_score')[:10]
         serializer = self.get_serializer(top_performers, many=True)
         return Response(serializer.data)
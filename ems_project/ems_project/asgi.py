@@ -14,3 +14,8 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ems_project.settings")
 
 application = get_asgi_application()
+
+# Load the employee autocomplete index before the first request needs it
+from employees.autocomplete import preload  # noqa: E402
+
+preload()
@@ -0,0 +1,86 @@
+"""
+Helpers shared by the ``benchmark_*`` management commands.
+
+Benchmarks seed their data inside a transaction that is rolled back at the
+end, so they can be pointed at any database without leaving rows behind.
+"""
+import random
+import time
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from employees.models import Department, Employee
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """
+    Run the enclosed block in a transaction that is always rolled back.
+    """
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback
+    except Rollback:
+        pass
+
+
+@contextmanager
+def measure():
+    """
+    Time the enclosed block and count the queries it executes.
+
+    Yields a dict that is filled with ``seconds`` and ``queries`` on exit.
+    """
+    result = {}
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        yield result
+        result['seconds'] = time.perf_counter() - started
+    result['queries'] = len(queries)
+
+
+def seed_employees(count, departments=10, batch_size=1000, seed=0):
+    """
+    Bulk create ``count`` active employees (and their users) spread across
+    ``departments`` departments. Returns the created departments.
+    """
+    rng = random.Random(seed)
+    depts = Department.objects.bulk_create([
+        Department(name=f'Benchmark Department {i}') for i in range(departments)
+    ])
+
+    offset = User.objects.count()
+    users = User.objects.bulk_create([
+        User(username=f'bench_user_{offset + i}') for i in range(count)
+    ], batch_size=batch_size)
+    if users and users[0].pk is None:
+        # Backends without RETURNING do not set primary keys on bulk_create
+        users = list(User.objects.filter(username__startswith='bench_user_').order_by('pk'))[-count:]
+
+    Employee.objects.bulk_create([
+        Employee(
+            user=user,
+            first_name=f'First{i}',
+            last_name=f'Last{i}',
+            email=f'{user.username}@bench.example.com',
+            department=depts[i % departments],
+            gender=rng.choice('MFO'),
+            date_of_birth=date(1980 + i % 20, 1 + i % 12, 1 + i % 28),
+            date_of_joining=date(2015 + i % 8, 1 + i % 12, 1),
+            employment_type='FT',
+            salary=Decimal(rng.randrange(2000000, 20000000)) / 100,
+        )
+        for i, user in enumerate(users)
+    ], batch_size=batch_size)
+
+    return depts
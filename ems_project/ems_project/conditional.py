@@ -0,0 +1,81 @@
+"""
+Conditional GET (ETag / Last-Modified) for polled list endpoints.
+
+The validators come from one aggregate over the rows the endpoint would
+render: the newest ``updated_at`` and the row count (so deletions change
+the ETag too). Changes to related models rendered alongside the rows, such
+as employee names, are covered by the per-model versions kept by
+``response_cache``. A client presenting a current ETag gets a 304 before
+anything is loaded or serialized.
+
+Last-Modified has a one second resolution and cannot see deletions, so
+it is sent for information only: If-Modified-Since never produces a 304,
+only a matching If-None-Match does.
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from . import response_cache
+
+
+def resource_state(queryset, timestamp_field='updated_at'):
+    """
+    Newest modification time and number of rows of ``queryset``
+    """
+    return queryset.order_by().aggregate(last_modified=Max(timestamp_field), count=Count('pk'))
+
+
+def conditional_response(*models, queryset=None, timestamp_field='updated_at'):
+    """
+    Answer GET requests with 304 Not Modified when the client's ETag still
+    matches, and add ETag and Last-Modified to successful responses.
+
+    ``queryset`` is a callable of (view, request) returning the rows the
+    response is built from; by default the view's filtered queryset.
+    ``models`` are related models rendered with those rows.
+    """
+    labels = sorted(response_cache.model_label(model) for model in models)
+    for model in models:
+        response_cache.watch(model)
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return method(view, request, *args, **kwargs)
+
+            if queryset is not None:
+                rows = queryset(view, request)
+            else:
+                rows = view.filter_queryset(view.get_queryset())
+            state = resource_state(rows, timestamp_field)
+            last_modified = state['last_modified']
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            etag = quote_etag(hashlib.sha1(json.dumps([
+                request.get_full_path(),
+                request.user.pk,
+                last_modified.isoformat() if last_modified else None,
+                state['count'],
+                sorted(response_cache.model_versions(labels).items()),
+            ]).encode()).hexdigest())
+
+            # Without last_modified, If-Modified-Since alone never matches
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                response['ETag'] = etag
+                if timestamp is not None:
+                    response['Last-Modified'] = http_date(timestamp)
+            return response
+
+        return wrapper
+
+    return decorator
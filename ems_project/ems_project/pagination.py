@@ -0,0 +1,175 @@
+"""
+Keyset (seek) pagination for large, append-heavy tables.
+
+Pages are addressed by the ordering value and primary key of the last row
+seen instead of an OFFSET, so fetching a deep page costs the same as the
+first one, and no COUNT(*) is issued unless the client asks for it.
+"""
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on ``ordering`` (a single, non-nullable field, optionally
+    prefixed with '-') with the primary key as tie-breaker.
+
+    ``?page_size=`` overrides the page size up to ``max_page_size`` and
+    ``?count=true`` adds the total row count to the response.
+    """
+    ordering = '-pk'
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.count = queryset.count() if self.get_include_count(request) else None
+
+        field, descending = self.get_ordering(request, queryset, view)
+        position, pk, reverse = self.decode_cursor(request)
+
+        # Walking backwards flips the comparison and the order
+        forward_descending = descending != reverse
+        queryset = queryset.annotate(keyset_position=F(field))
+        if forward_descending:
+            queryset = queryset.order_by('-keyset_position', '-pk')
+        else:
+            queryset = queryset.order_by('keyset_position', 'pk')
+
+        if position is not None:
+            lookup = 'lt' if forward_descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'keyset_position__{lookup}': position})
+                | Q(keyset_position=position, **{f'pk__{lookup}': pk})
+            )
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.has_next = has_more if not reverse else position is not None
+        self.has_previous = position is not None if not reverse else has_more
+        self.first = results[0] if results else None
+        self.last = results[-1] if results else None
+        return results
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                return _positive_int(
+                    request.query_params[self.page_size_query_param],
+                    strict=True,
+                    cutoff=self.max_page_size
+                )
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_include_count(self, request):
+        value = request.query_params.get(self.count_query_param, '')
+        return value.lower() in ('1', 'true', 'yes')
+
+    def get_ordering(self, request, queryset, view):
+        """
+        The keyset field and its direction; a client ?ordering= applied by
+        the view's OrderingFilter takes precedence over ``ordering``
+        """
+        ordering = self.ordering
+        filter_backends = getattr(view, 'filter_backends', [])
+        for backend in filter_backends:
+            if issubclass(backend, OrderingFilter):
+                requested = backend().get_ordering(request, queryset, view)
+                if requested and backend.ordering_param in request.query_params:
+                    ordering = requested[0]
+                break
+        return ordering.lstrip('-'), ordering.startswith('-')
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, None, False
+        try:
+            data = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            return data['v'], int(data['pk']), bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, instance, reverse):
+        data = {'v': _encode_value(instance.keyset_position), 'pk': instance.pk}
+        if reverse:
+            data['r'] = True
+        encoded = base64.urlsafe_b64encode(json.dumps(data).encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        return self.encode_cursor(self.last, reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if self.first is None:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.first, reverse=True)
+
+    def get_paginated_response(self, data):
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'count': {'type': 'integer', 'example': 123},
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+            'required': ['results'],
+        }
+
+
+class AttendancePagination(KeysetPagination):
+    ordering = '-date'
+
+
+class PayslipPagination(KeysetPagination):
+    ordering = '-payroll_period__start_date'
+
+
+class LoginAttemptPagination(KeysetPagination):
+    ordering = '-timestamp'
+    page_size = 50
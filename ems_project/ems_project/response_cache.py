@@ -0,0 +1,194 @@
+"""
+Response caching for read-heavy API endpoints.
+
+Responses are stored in the ``api`` cache (local memory unless a Redis URL
+is configured) under a key built from the endpoint, the user scope, the
+URL arguments, the query parameters and a version number per model the
+endpoint reads. Saving or deleting an instance of one of those models bumps
+its version, so every cached response that depends on it stops matching
+and simply expires. Hit and miss counters are kept per endpoint.
+
+The version receivers of the models that cached endpoints read are
+connected in their apps' ``AppConfig.ready()``, so writes from Celery
+workers and management commands, which never import the views, expire
+cached responses too.
+"""
+import hashlib
+import json
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections, router, transaction
+from django.db.models.signals import post_delete, post_save
+from rest_framework.response import Response
+
+KEY_PREFIX = 'api-cache'
+SCOPES = ('role', 'user')
+
+_endpoints = set()
+
+
+def get_cache():
+    return caches[getattr(settings, 'API_CACHE_ALIAS', 'api')]
+
+
+def get_timeout():
+    return getattr(settings, 'API_CACHE_TIMEOUT', 300)
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def _version_key(label):
+    return f'{KEY_PREFIX}:version:{label}'
+
+
+def _counter_key(endpoint, outcome):
+    return f'{KEY_PREFIX}:stats:{endpoint}:{outcome}'
+
+
+def _increment(cache, key, timeout=None):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Lost a race with another writer if add() fails; retry the increment
+        if not cache.add(key, 1, timeout):
+            return cache.incr(key)
+        return 1
+
+
+def model_versions(labels):
+    """
+    Current version of each model label. A missing version (never bumped, or
+    evicted) starts from the clock, so it can never go back to a value that
+    cached responses were stored under.
+    """
+    cache = get_cache()
+    keys = {_version_key(label): label for label in labels}
+    versions = cache.get_many(keys)
+    for key in set(keys) - set(versions):
+        cache.add(key, time.time_ns(), None)
+        versions[key] = cache.get(key)
+    return {label: versions[key] for key, label in keys.items()}
+
+
+def invalidate(model):
+    """
+    Expire every cached response that depends on ``model``
+    """
+    cache = get_cache()
+    key = _version_key(model_label(model))
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _invalidate_on_change(sender, using=None, **kwargs):
+    invalidate(sender)
+    # A concurrent request may cache the old data again before the write is
+    # committed, so bump the version once more when it is
+    using = using or router.db_for_write(sender)
+    if connections[using].in_atomic_block:
+        transaction.on_commit(lambda: invalidate(sender), using=using)
+
+
+def watch(model):
+    """
+    Invalidate cached responses whenever ``model`` is saved or deleted
+    """
+    uid = f'{KEY_PREFIX}:{model_label(model)}'
+    post_save.connect(_invalidate_on_change, sender=model, dispatch_uid=uid)
+    post_delete.connect(_invalidate_on_change, sender=model, dispatch_uid=uid)
+
+
+def _scope(request, scope):
+    user = request.user
+    if scope == 'user':
+        return f'user:{user.pk}' if user.is_authenticated else 'anonymous'
+    return 'staff' if user.is_staff else 'user'
+
+
+def cache_key(endpoint, request, scope, kwargs, versions, extra=None):
+    payload = json.dumps([
+        _scope(request, scope),
+        sorted((key, str(value)) for key, value in kwargs.items()),
+        sorted((key, request.query_params.getlist(key)) for key in request.query_params),
+        sorted(versions.items()),
+        extra,
+    ])
+    digest = hashlib.sha1(payload.encode()).hexdigest()
+    return f'{KEY_PREFIX}:response:{endpoint}:{digest}'
+
+
+def cache_response(*models, scope='role', timeout=None, vary_on=None):
+    """
+    Cache the data of successful GET responses of a view(set) method.
+
+    ``models`` are the models the response is built from; ``scope`` is
+    'role' to share entries between users with the same staff status or
+    'user' to keep them per user. ``vary_on`` is an optional callable of the
+    request returning extra (JSON serializable) key material, such as the
+    current date.
+    """
+    if scope not in SCOPES:
+        raise ValueError(f"scope must be one of {SCOPES}")
+    for model in models:
+        watch(model)
+    labels = sorted(model_label(model) for model in models)
+
+    def decorator(method):
+        endpoint = f'{method.__module__}.{method.__qualname__}'
+        _endpoints.add(endpoint)
+
+        @wraps(method)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET':
+                return method(view, request, *args, **kwargs)
+
+            cache = get_cache()
+            extra = vary_on(request) if vary_on is not None else None
+            key = cache_key(endpoint, request, scope, kwargs, model_versions(labels), extra)
+            data = cache.get(key)
+            if data is not None:
+                _increment(cache, _counter_key(endpoint, 'hits'))
+                return Response(data)
+
+            _increment(cache, _counter_key(endpoint, 'misses'))
+            response = method(view, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout if timeout is not None else get_timeout())
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+def statistics():
+    """
+    Hit and miss counts per cached endpoint
+    """
+    cache = get_cache()
+    keys = [_counter_key(endpoint, outcome) for endpoint in _endpoints for outcome in ('hits', 'misses')]
+    counters = cache.get_many(keys)
+    stats = {}
+    for endpoint in sorted(_endpoints):
+        hits = counters.get(_counter_key(endpoint, 'hits'), 0)
+        misses = counters.get(_counter_key(endpoint, 'misses'), 0)
+        requests = hits + misses
+        stats[endpoint] = {
+            'hits': hits,
+            'misses': misses,
+            'hit_ratio': round(hits / requests, 4) if requests else None,
+        }
+    return stats
+
+
+def reset_statistics():
+    get_cache().delete_many([
+        _counter_key(endpoint, outcome) for endpoint in _endpoints for outcome in ('hits', 'misses')
+    ])
@@ -124,6 +124,11 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 10,
 }
 
+# Authorize API requests from the claims of tokens issued at login instead of
+# loading the user on every request (see authentication.tokens)
+if os.environ.get('JWT_STATELESS_AUTH') == '1':
+    REST_FRAMEWORK['DEFAULT_AUTHENTICATION_CLASSES'][0] = 'authentication.tokens.ClaimsJWTAuthentication'
+
 # JWT Configuration
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -139,6 +144,8 @@ SIMPLE_JWT = {
     'AUTH_HEADER_NAME': 'HTTP_AUTHORIZATION',
     'USER_ID_FIELD': 'id',
     'USER_ID_CLAIM': 'user_id',
+    # Re-reads the user's claims on refresh; see authentication.tokens
+    'TOKEN_REFRESH_SERIALIZER': 'authentication.tokens.ClaimsTokenRefreshSerializer',
 }
 
 # CORS Configuration
@@ -173,6 +180,69 @@ EMAIL_USE_TLS = True
 EMAIL_HOST_USER = os.environ.get('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.environ.get('EMAIL_HOST_PASSWORD')
 
+# Cache Configuration
+# API responses are cached in local memory unless API_CACHE_REDIS_URL points at
+# a Redis (or Redis-protocol compatible) server, e.g. redis://localhost:6379/1
+API_CACHE_REDIS_URL = os.environ.get('API_CACHE_REDIS_URL')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'api': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': API_CACHE_REDIS_URL,
+    } if API_CACHE_REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'api-responses',
+    },
+}
+API_CACHE_TIMEOUT = 300  # Seconds; writes invalidate cached responses sooner
+
+# Mail outbox (see authentication.outbox)
+MAIL_OUTBOX_WORKER = os.environ.get('MAIL_OUTBOX_WORKER', 'thread')  # 'celery' to send from Celery workers
+MAIL_OUTBOX_BATCH_SIZE = 100  # Messages claimed and sent per batch
+MAIL_OUTBOX_MAX_ATTEMPTS = 5  # Then the message is marked as failed
+MAIL_OUTBOX_RETRY_DELAY = 30  # Seconds before the first retry, doubled after each attempt
+MAIL_OUTBOX_LEASE = 300  # Seconds a worker owns a claimed message; renewed before each send
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', 'redis://localhost:6379/0')
+
+# Login audit (see authentication.audit)
+LOGIN_AUDIT_BUFFER_SIZE = 100  # Attempts written per batch; 1 writes every attempt immediately
+LOGIN_AUDIT_FLUSH_INTERVAL = 5  # Seconds an attempt may wait in memory
+LOGIN_AUDIT_SPOOL_PATH = BASE_DIR / 'login_attempts.spool.jsonl'  # Used when the database is unavailable
+LOGIN_AUDIT_RETENTION_DAYS = 180  # Default age for prune_login_attempts
+
+# Login and password reset rate limits (see authentication.ratelimit)
+LOGIN_RATE_LIMITS = {
+    # name: (attempts, window in seconds)
+    'login_ip': (20, 600),  # Failed logins per client IP
+    'login_username': (5, 300),  # Failed logins per username
+    'reset_ip': (10, 3600),  # Reset requests per client IP
+    'reset_email': (3, 3600),  # Reset requests per email address
+}
+LOGIN_RATE_LIMIT_CACHE = None  # Cache alias to share counters between processes, e.g. 'api'
+TRUSTED_PROXY_COUNT = int(os.environ.get('TRUSTED_PROXY_COUNT', 0))  # Reverse proxies appending to X-Forwarded-For; 0 uses REMOTE_ADDR
+
+# Authorization
+USER_ACCESS_TTL = 300  # Seconds a process may reuse a user's cached role, flags and employee id
+
+# Employee autocomplete (see employees.autocomplete)
+EMPLOYEE_AUTOCOMPLETE_PRELOAD = True  # Build the index in the background when the server starts
+EMPLOYEE_AUTOCOMPLETE_TTL = 300  # Seconds before the index is rebuilt to pick up bulk and other processes' writes
+
+# Attendance Configuration
+ATTENDANCE_SHIFT_START = '09:30'  # Check-ins after this count as late minutes
+
+# Payroll Configuration
+PAYROLL_PF_PERCENTAGE = 12  # Provident fund, percent of basic salary
+PAYROLL_TAX_PERCENTAGE = 10  # Flat tax, percent of taxable earnings, when no TaxSlab is configured
+PAYROLL_BULK_BATCH_SIZE = 1000  # Rows per INSERT during a payroll run
+PAYROLL_DEDUCT_ABSENCES = False  # Treat absent days as unpaid, on top of approved leave
+PAYROLL_PROCESSES = int(os.environ.get('PAYROLL_PROCESSES', 1))  # Worker processes computing payslips; 1 computes in-process
+PAYROLL_WORKER = os.environ.get('PAYROLL_WORKER', 'thread')  # 'celery' to run payroll jobs on Celery workers
+PAYROLL_CHUNK_SIZE = 500  # Employees computed and committed per chunk of a background run
+PAYROLL_RUN_LEASE = 300  # Seconds without progress before another worker may resume a run
+
 # Logging Configuration
 LOGGING = {
     'version': 1,
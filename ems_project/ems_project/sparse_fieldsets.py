@@ -0,0 +1,112 @@
+"""
+Sparse fieldsets for the REST API.
+
+Clients pass ``?fields=id,first_name`` to receive only the listed fields and
+``?expand=documents`` to add expensive (nested) fields to a compact list
+representation. The queryset is narrowed accordingly with ``only()`` so the
+database only returns the columns that will be serialized.
+"""
+from rest_framework.permissions import SAFE_METHODS
+
+
+class SparseFieldsetSerializerMixin:
+    """
+    Serializer mixin accepting a ``fields`` keyword argument that restricts
+    the serialized fields. The primary key is always kept.
+    """
+
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields) - {'id'}:
+                self.fields.pop(name)
+
+
+class SparseFieldsetMixin:
+    """
+    ViewSet mixin wiring ``?fields=`` and ``?expand=`` to the serializer and
+    the queryset of read requests.
+
+    ``list_serializer_class`` is the compact representation used by the list
+    action when neither parameter is given. ``sparse_field_sources`` maps
+    serializer fields that are not plain model fields to the ORM paths they
+    read, and ``sparse_field_prefetches`` maps nested fields to the prefetch
+    lookups they need.
+    """
+    list_serializer_class = None
+    sparse_field_sources = {}
+    sparse_field_prefetches = {}
+
+    def _get_param_set(self, name):
+        value = self.request.query_params.get(name)
+        if value is None:
+            return None
+        return {field.strip() for field in value.split(',') if field.strip()}
+
+    def get_sparse_fields(self):
+        """
+        The set of fields to render, or None to render every field
+        """
+        request = getattr(self, 'request', None)
+        if request is None or request.method not in SAFE_METHODS:
+            return None
+
+        fields = self._get_param_set('fields')
+        expand = self._get_param_set('expand') or set()
+
+        if fields is None:
+            if self.action != 'list' or self.list_serializer_class is None:
+                return None
+            fields = set(self.list_serializer_class.Meta.fields)
+        return fields | expand
+
+    def get_serializer_class(self):
+        if (
+            self.action == 'list'
+            and self.list_serializer_class is not None
+            and getattr(self, 'request', None) is not None
+            and 'fields' not in self.request.query_params
+            and 'expand' not in self.request.query_params
+        ):
+            return self.list_serializer_class
+        return super().get_serializer_class()
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fields = self.get_sparse_fields()
+        if fields is None:
+            return queryset
+        return self.restrict_to_fields(queryset, fields)
+
+    def restrict_to_fields(self, queryset, fields):
+        """
+        Load only the columns, joins and prefetches the given fields need
+        """
+        opts = queryset.model._meta
+        concrete_fields = {field.name for field in opts.concrete_fields}
+
+        columns = {opts.pk.name}
+        prefetches = []
+        for name in fields:
+            if name in self.sparse_field_sources:
+                columns.update(self.sparse_field_sources[name])
+            elif name in concrete_fields:
+                columns.add(name)
+            prefetches.extend(self.sparse_field_prefetches.get(name, []))
+
+        relations = sorted({column.rsplit('__', 1)[0] for column in columns if '__' in column})
+
+        queryset = queryset.select_related(None).prefetch_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        if prefetches:
+            queryset = queryset.prefetch_related(*prefetches)
+        return queryset.only(*columns)
+
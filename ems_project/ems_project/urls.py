@@ -32,4 +32,6 @@ urlpatterns = [
     path('api/v1/', include('employees.urls')),
     path('api/v1/', include('attendance.urls')),
     path('api/v1/', include('payroll.urls')),
+    path('api/v1/auth/', include('authentication.urls')),
+    path('api/v1/cache-statistics/', views.cache_statistics, name='cache_statistics'),
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
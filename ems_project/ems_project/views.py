@@ -1,6 +1,19 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
+from rest_framework import permissions
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+
+from . import response_cache
 
 @login_required
 def home(request):
     return render(request, 'home.html')
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAdminUser])
+def cache_statistics(request):
+    """
+    Hit and miss counters of the API response cache
+    """
+    return Response(response_cache.statistics())
@@ -14,3 +14,8 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "ems_project.settings")
 
 application = get_wsgi_application()
+
+# Load the employee autocomplete index before the first request needs it
+from employees.autocomplete import preload  # noqa: E402
+
+preload()
@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import SalaryComponent, PayrollPeriod, Payslip
+from .models import SalaryComponent, TaxSlab, PayrollPeriod, Payslip
+from employees.search import EmployeeSearchAdminMixin
 
 # Register your models here.
 
@@ -9,6 +10,10 @@ class SalaryComponentAdmin(admin.ModelAdmin):
     list_filter = ('component_type', 'is_taxable')
     search_fields = ('name',)
 
+@admin.register(TaxSlab)
+class TaxSlabAdmin(admin.ModelAdmin):
+    list_display = ('lower_limit', 'percentage')
+
 @admin.register(PayrollPeriod)
 class PayrollPeriodAdmin(admin.ModelAdmin):
     list_display = ('start_date', 'end_date', 'is_processed', 'processed_at')
@@ -16,7 +21,7 @@ class PayrollPeriodAdmin(admin.ModelAdmin):
     ordering = ('-start_date',)
 
 @admin.register(Payslip)
-class PayslipAdmin(admin.ModelAdmin):
+class PayslipAdmin(EmployeeSearchAdminMixin, admin.ModelAdmin):
     list_display = ('employee', 'payroll_period', 'basic_salary', 'net_salary', 'is_paid')
     list_filter = ('is_paid', 'payroll_period')
     search_fields = ('employee__first_name', 'employee__last_name')
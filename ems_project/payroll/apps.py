@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class PayrollConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "payroll"
+
+    def ready(self):
+        from ems_project import response_cache
+        from .models import PayrollPeriod, SalaryComponent
+
+        # Models rendered by cached responses; see ems_project.response_cache
+        for model in (PayrollPeriod, SalaryComponent,):
+            response_cache.watch(model)
@@ -0,0 +1,110 @@
+"""
+Payslip arithmetic.
+
+Pure functions of salaries, salary component rates, leave days and
+performance scores, with no Django imports, so worker processes can load
+them without setting Django up (see payroll.parallel).
+"""
+from array import array
+from decimal import Decimal, ROUND_HALF_UP
+
+CENT = Decimal('0.01')
+HUNDRED = Decimal('100')
+DAYS_PER_MONTH = 30  # Same convention as Payslip.calculate_leave_deductions
+MAX_PERFORMANCE_SCORE = Decimal('10')
+
+
+def _money(value):
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def calculate_amounts(salary, rates, leave_days, performance_score, pf_rate, tax_rate, tax_table=None):
+    """
+    Every earning, deduction and total column of a payslip; see
+    payroll.services.calculate_payslip_amounts. Tax follows ``tax_table``
+    (a payroll.tax.TaxTable) when given, else the flat ``tax_rate``.
+    """
+    amounts = {'BASIC': Decimal('0'), 'HRA': Decimal('0'), 'OTHER': Decimal('0'), 'BONUS': Decimal('0')}
+    taxable = Decimal('0')
+    has_basic = False
+
+    for component_type, rate, is_taxable in rates:
+        amount = salary * rate
+        if component_type == 'BASIC':
+            has_basic = True
+        elif component_type == 'BONUS':
+            if performance_score is None:
+                continue
+            amount = amount * Decimal(performance_score) / MAX_PERFORMANCE_SCORE
+        elif component_type == 'DA':
+            component_type = 'OTHER'
+        amount = _money(amount)
+        amounts[component_type] += amount
+        if is_taxable:
+            taxable += amount
+
+    if not has_basic:
+        amounts['BASIC'] = _money(salary)
+        taxable += amounts['BASIC']
+
+    basic_salary = amounts['BASIC']
+    gross_earnings = basic_salary + amounts['HRA'] + amounts['OTHER'] + amounts['BONUS']
+
+    pf_contribution = _money(basic_salary * pf_rate)
+    if tax_table is not None:
+        tax_deduction = from_paise(tax_table.monthly_tax(to_paise(taxable)))
+    else:
+        tax_deduction = _money(taxable * tax_rate)
+
+    # Leave deductions never push the net salary below zero. Multiplying
+    # before dividing rounds the exact value (as payroll.vectorized does).
+    leave_deductions = _money(basic_salary * leave_days / DAYS_PER_MONTH)
+    leave_deductions = max(Decimal('0'), min(leave_deductions, gross_earnings - pf_contribution - tax_deduction))
+
+    total_deductions = pf_contribution + tax_deduction + leave_deductions
+
+    return {
+        'basic_salary': basic_salary,
+        'hra': amounts['HRA'],
+        'other_allowances': amounts['OTHER'],
+        'performance_bonus': amounts['BONUS'],
+        'pf_contribution': pf_contribution,
+        'tax_deduction': tax_deduction,
+        'leave_deductions': leave_deductions,
+        'gross_earnings': gross_earnings,
+        'total_deductions': total_deductions,
+        'net_salary': gross_earnings - total_deductions,
+    }
+
+
+AMOUNT_FIELDS = [
+    'basic_salary', 'hra', 'other_allowances', 'performance_bonus', 'pf_contribution', 'tax_deduction',
+    'leave_deductions', 'gross_earnings', 'total_deductions', 'net_salary',
+]
+
+
+def to_paise(amount):
+    """
+    A two-decimal amount as an integer number of paise
+    """
+    return int(amount.scaleb(2))
+
+
+def from_paise(paise):
+    return Decimal(paise).scaleb(-2)
+
+
+def calculate_columns(salaries, leave_days, scores, rates, pf_rate, tax_rate, tax_table=None):
+    """
+    Payslip amounts for a partition of employees given as columns:
+    salaries in paise, unpaid days, and performance scores in hundredths
+    (-1 for none). Returns one array of paise per AMOUNT_FIELDS entry.
+    """
+    columns = [array('q') for _ in AMOUNT_FIELDS]
+    for salary, days, score in zip(salaries, leave_days, scores):
+        amounts = calculate_amounts(
+            from_paise(salary), rates, days, None if score < 0 else from_paise(score), pf_rate, tax_rate, tax_table,
+        )
+        for column, field in zip(columns, AMOUNT_FIELDS):
+            column.append(to_paise(amounts[field]))
+    return columns
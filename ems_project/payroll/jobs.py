@@ -0,0 +1,225 @@
+"""
+Background payroll runs.
+
+``queue_payroll_run`` records a ``PayrollRun`` for a period and, once the
+surrounding transaction commits, hands it to a worker: a Celery task when
+PAYROLL_WORKER is 'celery', a background thread of this process when it is
+'thread' (the default), or the committing thread itself when it is
+'inline' (for tests and scripts).
+
+A worker claims the run with a time-limited lease and computes it in
+chunks of PAYROLL_CHUNK_SIZE employees, in employee id order. Each chunk's
+payslips and the run's progress are committed together, so a run that
+crashes keeps every finished chunk and resumes after the last one: when
+it is queued again, when its Celery task is redelivered, or from the
+``run_payroll_jobs`` command once the lease has expired. A chunk that
+fails marks the run FAILED with the error; queueing it again resumes it.
+With PAYROLL_PROCESSES above 1, chunks are computed on one process pool
+kept for the whole run (see payroll.parallel).
+"""
+import logging
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import PayrollRun, Payslip
+from . import parallel, services
+
+logger = logging.getLogger(__name__)
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='payroll')
+
+ACTIVE_STATUSES = ['QUEUED', 'RUNNING', 'FAILED']
+
+
+def get_setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LeaseLost(Exception):
+    pass
+
+
+def queue_payroll_run(payroll_period, chunk_size=None):
+    """
+    Queue the payroll run of a period, or resume its unfinished run.
+    Returns the run.
+    """
+    with transaction.atomic():
+        run = PayrollRun.objects.select_for_update().filter(
+            payroll_period=payroll_period, status__in=ACTIVE_STATUSES,
+        ).first()
+        if run is None:
+            run = PayrollRun.objects.create(
+                payroll_period=payroll_period,
+                chunk_size=chunk_size or get_setting('PAYROLL_CHUNK_SIZE', 500),
+            )
+        elif run.status == 'FAILED':
+            run.status = 'QUEUED'
+            run.save(update_fields=['status'])
+        run_id = run.pk
+        transaction.on_commit(lambda: dispatch(run_id))
+    return run
+
+
+def dispatch(run_id):
+    worker = get_setting('PAYROLL_WORKER', 'thread')
+    if worker == 'celery':
+        from .tasks import run_payroll_task
+
+        run_payroll_task.delay(run_id)
+        return None
+    if worker == 'inline':
+        return run_payroll(run_id)
+    return _executor.submit(_run_in_thread, run_id)
+
+
+def _run_in_thread(run_id):
+    close_old_connections()
+    try:
+        return run_payroll(run_id)
+    except Exception:
+        logger.exception("Payroll run %s failed", run_id)
+        raise
+    finally:
+        close_old_connections()
+
+
+def claim_run(run_id):
+    """
+    Take ownership of a queued run, or of a running one whose worker's
+    lease expired; None if another worker holds it or it is finished
+    """
+    now = timezone.now()
+    claim = uuid.uuid4()
+    claimable = Q(status='QUEUED') | Q(status='RUNNING', lease_expires_at__lt=now)
+    claimed = PayrollRun.objects.filter(claimable, pk=run_id).update(
+        status='RUNNING', claim=claim, lease_expires_at=now + get_lease(),
+    )
+    if not claimed:
+        return None
+    run = PayrollRun.objects.select_related('payroll_period').get(pk=run_id)
+    if run.started_at is None:
+        run.started_at = now
+        run.save(update_fields=['started_at'])
+    return run
+
+
+def get_lease():
+    return timedelta(seconds=get_setting('PAYROLL_RUN_LEASE', 300))
+
+
+def _owned(run):
+    return PayrollRun.objects.filter(pk=run.pk, claim=run.claim)
+
+
+def run_payroll(run_id):
+    """
+    Compute the remaining chunks of a run. Returns the run, or None when it
+    could not be claimed.
+    """
+    run = claim_run(run_id)
+    if run is None:
+        return None
+    period = run.payroll_period
+    batch_size = get_setting('PAYROLL_BULK_BATCH_SIZE', 1000)
+    processes = get_setting('PAYROLL_PROCESSES', 1)
+    pool = parallel.get_pool(processes) if processes > 1 else None
+    try:
+        inputs = services.load_inputs(period)
+        # Employees who already have a payslip for the period are excluded
+        remaining = services.payroll_employees(period)
+        run.total_employees = run.processed_employees + remaining.count()
+        _owned(run).update(total_employees=run.total_employees)
+
+        while True:
+            started = time.perf_counter()
+            employees = list(remaining.filter(pk__gt=run.last_employee_id or 0).values_list(
+                'pk', 'salary', 'performance_score',
+            )[:run.chunk_size])
+            if not employees:
+                break
+            with transaction.atomic():
+                if pool is None:
+                    payslips = services.build_payslips(period, employees, inputs)
+                else:
+                    payslips = parallel.build_payslips_parallel(period, processes, inputs, employees, executor=pool)
+                Payslip.objects.bulk_create(payslips, batch_size=batch_size)
+                net_salary = sum((payslip.net_salary for payslip in payslips), Decimal('0'))
+                run.last_employee_id = employees[-1][0]
+                seconds = time.perf_counter() - started
+                updated = _owned(run).update(
+                    processed_employees=F('processed_employees') + len(employees),
+                    payslips_created=F('payslips_created') + len(payslips),
+                    total_net_salary=F('total_net_salary') + net_salary,
+                    processing_seconds=F('processing_seconds') + seconds,
+                    last_employee_id=run.last_employee_id,
+                    lease_expires_at=timezone.now() + get_lease(),
+                )
+                if not updated:
+                    # Another worker took the run over; drop this chunk
+                    raise LeaseLost
+            run.processed_employees += len(employees)
+
+        with transaction.atomic():
+            period.is_processed = True
+            period.processed_at = timezone.now()
+            period.save(update_fields=['is_processed', 'processed_at'])
+            _owned(run).update(status='COMPLETED', claim=None, finished_at=timezone.now())
+    except LeaseLost:
+        logger.warning("Payroll run %s was taken over by another worker", run.pk)
+        return None
+    except Exception as exc:
+        logger.exception("Payroll run %s failed after employee %s", run.pk, run.last_employee_id)
+        run.refresh_from_db(fields=['errors'])
+        _owned(run).update(status='FAILED', claim=None, errors=run.errors + [{
+            'at': timezone.now().isoformat(),
+            'after_employee_id': run.last_employee_id,
+            'error': f'{type(exc).__name__}: {exc}',
+        }])
+    finally:
+        if pool is not None:
+            pool.shutdown()
+    run.refresh_from_db()
+    return run
+
+
+def resume_stale_runs():
+    """
+    Run every queued run and every running one whose lease expired (e.g.
+    its process crashed). Returns the runs that were picked up.
+    """
+    stale = PayrollRun.objects.filter(
+        Q(status='QUEUED') | Q(status='RUNNING', lease_expires_at__lt=timezone.now()),
+    ).order_by('created_at').values_list('pk', flat=True)
+    return [run for run in map(run_payroll, list(stale)) if run is not None]
+
+
+def run_status(run):
+    """
+    Progress, throughput and errors of a run, for the run-status endpoint
+    """
+    throughput = run.processed_employees / run.processing_seconds if run.processing_seconds else None
+    remaining = max(run.total_employees - run.processed_employees, 0)
+    return {
+        'run_id': run.pk,
+        'status': run.status,
+        'total_employees': run.total_employees,
+        'processed_employees': run.processed_employees,
+        'payslips_created': run.payslips_created,
+        'progress': round(100 * run.processed_employees / run.total_employees, 1) if run.total_employees else None,
+        'employees_per_second': round(throughput, 1) if throughput else None,
+        'eta_seconds': round(remaining / throughput, 1) if throughput and run.status == 'RUNNING' else None,
+        'total_net_salary': run.total_net_salary,
+        'errors': run.errors,
+        'created_at': run.created_at,
+        'started_at': run.started_at,
+        'finished_at': run.finished_at,
+    }
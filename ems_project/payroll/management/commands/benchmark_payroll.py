@@ -0,0 +1,135 @@
+import os
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from attendance.models import LeaveRequest
+from employees.models import Employee, Performance
+from ems_project.benchmarking import rolled_back, measure, seed_employees
+from payroll.models import SalaryComponent, PayrollPeriod
+from payroll.tax import TaxTable
+from payroll import parallel, services, vectorized
+
+
+class Command(BaseCommand):
+    help = "Benchmark a full payroll run on seeded data (rolled back afterwards)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=50000)
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument(
+            '--processes', default='1',
+            help="Comma-separated worker process counts to compare, e.g. 1,2,4,8",
+        )
+        parser.add_argument('--tax-lookups', type=int, default=100000)
+        parser.add_argument('--tax-slabs', type=int, default=200)
+
+    def handle(self, *args, **options):
+        count = options['employees']
+
+        with rolled_back():
+            self.stdout.write(f"Seeding {count} employees...")
+            seed_employees(count)
+            SalaryComponent.objects.bulk_create([
+                SalaryComponent(name='Basic', component_type='BASIC', percentage=Decimal('50')),
+                SalaryComponent(name='HRA', component_type='HRA', percentage=Decimal('20')),
+                SalaryComponent(name='DA', component_type='DA', percentage=Decimal('10')),
+                SalaryComponent(name='Bonus', component_type='BONUS', percentage=Decimal('10')),
+            ])
+            period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+
+            employee_ids = list(Employee.objects.values_list('pk', flat=True))
+            LeaveRequest.objects.bulk_create([
+                LeaveRequest(
+                    employee_id=pk, leave_type='CL', reason='Benchmark', status='A',
+                    start_date=date(2024, 1, 10), end_date=date(2024, 1, 11), total_days=2,
+                )
+                for pk in employee_ids[::10]
+            ], batch_size=1000)
+            Performance.objects.bulk_create([
+                Performance(
+                    employee_id=pk, review_date=date(2023, 12, 1) - timedelta(days=pk % 30),
+                    technical_score=7, communication_score=8, teamwork_score=6, leadership_score=7,
+                    overall_score=Decimal('7.00'),
+                )
+                for pk in employee_ids[::3]
+            ], batch_size=1000)
+
+            process_counts = [int(value) for value in options['processes'].split(',')]
+            results = []
+            for processes in process_counts:
+                inputs = services.load_inputs(period)
+                with measure() as compute:
+                    if processes > 1:
+                        parallel.build_payslips_parallel(period, processes, inputs=inputs)
+                    else:
+                        services.build_payslips(period, inputs=inputs)
+
+                with transaction.atomic():
+                    with measure() as result:
+                        summary = services.process_payroll(
+                            period, batch_size=options['batch_size'], processes=processes,
+                        )
+                    # Undo the run so the next process count starts over
+                    transaction.set_rollback(True)
+                period.refresh_from_db()
+                results.append((processes, compute, result, summary))
+
+            with measure() as dry_run:
+                vectorized.dry_run(period, tax_percentage=Decimal('12.5'))
+
+            # A rerun after late leave corrections for a few employees
+            services.process_payroll(period, batch_size=options['batch_size'])
+            LeaveRequest.objects.bulk_create([
+                LeaveRequest(
+                    employee_id=pk, leave_type='CL', reason='Correction', status='A',
+                    start_date=date(2024, 1, 22), end_date=date(2024, 1, 22), total_days=1,
+                )
+                for pk in employee_ids[:10]
+            ])
+            with measure() as rerun:
+                rerun_summary = services.rerun_payroll(period, batch_size=options['batch_size'])
+
+        lookups = self.benchmark_tax_lookups(options['tax_lookups'], options['tax_slabs'])
+
+        self.stdout.write(f"CPUs available: {os.cpu_count()}")
+        baseline = results[0][1]['seconds']
+        for processes, compute, result, summary in results:
+            created = summary['payslips_created']
+            self.stdout.write(
+                f"{processes} process(es): {created} payslips\n"
+                f"  Compute: {compute['seconds']:.3f}s ({baseline / compute['seconds']:.2f}x)\n"
+                f"  Full run: {result['seconds']:.3f}s, {created / result['seconds']:.0f} payslips/s, "
+                f"{result['queries']} queries"
+            )
+        self.stdout.write(f"Vectorized dry run: {dry_run['seconds']:.3f}s, {dry_run['queries']} queries")
+        self.stdout.write(
+            f"Rerun after {len(employee_ids[:10])} corrections: {rerun['seconds']:.3f}s, "
+            f"{rerun_summary['payslips_updated']} payslips updated, {rerun['queries']} queries"
+        )
+        self.stdout.write(
+            f"{options['tax_lookups']} tax lookups over {options['tax_slabs']} slabs: "
+            f"{lookups['scalar']['seconds']:.3f}s bisect, {lookups['vectorized']['seconds']:.3f}s vectorized"
+        )
+
+    def benchmark_tax_lookups(self, count, slabs):
+        """
+        Time TaxTable.monthly_tax against vectorized.slab_tax on random
+        incomes; both must give the same taxes
+        """
+        generator = random.Random(0)
+        table = TaxTable(
+            (Decimal(index * 50000), Decimal(generator.randrange(0, 4000)).scaleb(-2))
+            for index in range(slabs)
+        )
+        incomes = [generator.randrange(0, 10 ** 8) for _ in range(count)]
+
+        with measure() as scalar:
+            taxes = [table.monthly_tax(income) for income in incomes]
+        with measure() as vectorized_lookup:
+            columns = vectorized.slab_tax(table, vectorized.np.array(incomes))
+        assert columns.tolist() == taxes
+        return {'scalar': scalar, 'vectorized': vectorized_lookup}
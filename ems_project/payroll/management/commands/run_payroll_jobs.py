@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from payroll import jobs
+
+
+class Command(BaseCommand):
+    help = "Run queued payroll runs and resume those whose worker stopped"
+
+    def handle(self, *args, **options):
+        for run in jobs.resume_stale_runs():
+            status = jobs.run_status(run)
+            self.stdout.write(
+                f"Run {run.pk} ({run.payroll_period}): {status['status']}, "
+                f"{status['processed_employees']}/{status['total_employees']} employees."
+            )
@@ -0,0 +1,25 @@
+# Generated by Django 4.2.9 on 2026-10-18 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="payslip",
+            index=models.Index(
+                condition=models.Q(("is_paid", False)),
+                fields=["payroll_period"],
+                name="payslip_unpaid_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="payslip",
+            index=models.Index(fields=["net_salary"], name="payslip_net_salary_idx"),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:40
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0002_add_query_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="payslip",
+            name="updated_at",
+            field=models.DateTimeField(
+                auto_now=True, default=django.utils.timezone.now
+            ),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0003_payslip_updated_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PayrollRun",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("QUEUED", "Queued"),
+                            ("RUNNING", "Running"),
+                            ("COMPLETED", "Completed"),
+                            ("FAILED", "Failed"),
+                        ],
+                        default="QUEUED",
+                        max_length=10,
+                    ),
+                ),
+                ("chunk_size", models.PositiveIntegerField()),
+                ("total_employees", models.PositiveIntegerField(default=0)),
+                ("processed_employees", models.PositiveIntegerField(default=0)),
+                ("payslips_created", models.PositiveIntegerField(default=0)),
+                (
+                    "total_net_salary",
+                    models.DecimalField(decimal_places=2, default=0, max_digits=14),
+                ),
+                ("last_employee_id", models.BigIntegerField(blank=True, null=True)),
+                ("processing_seconds", models.FloatField(default=0)),
+                ("errors", models.JSONField(blank=True, default=list)),
+                ("claim", models.UUIDField(blank=True, null=True)),
+                ("lease_expires_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                ("started_at", models.DateTimeField(blank=True, null=True)),
+                ("finished_at", models.DateTimeField(blank=True, null=True)),
+                (
+                    "payroll_period",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="runs",
+                        to="payroll.payrollperiod",
+                    ),
+                ),
+            ],
+            options={
+                "get_latest_by": "created_at",
+                "indexes": [
+                    models.Index(
+                        fields=["payroll_period", "status"],
+                        name="payrollrun_period_status_idx",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 4.2.9 on 2026-10-18 19:36
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("payroll", "0004_payroll_run"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="TaxSlab",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "lower_limit",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Annual taxable income from which the rate applies",
+                        max_digits=12,
+                        unique=True,
+                        validators=[django.core.validators.MinValueValidator(0)],
+                    ),
+                ),
+                (
+                    "percentage",
+                    models.DecimalField(
+                        decimal_places=2,
+                        help_text="Tax rate on income within the slab",
+                        max_digits=5,
+                        validators=[
+                            django.core.validators.MinValueValidator(0),
+                            django.core.validators.MaxValueValidator(100),
+                        ],
+                    ),
+                ),
+            ],
+            options={
+                "ordering": ["lower_limit"],
+            },
+        ),
+    ]
@@ -1,5 +1,8 @@
 from django.db import models
-from django.core.validators import MinValueValidator
+from django.db.models import Q
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.core.validators import MinValueValidator, MaxValueValidator
 from employees.models import Employee
 from attendance.models import LeaveRequest
 
@@ -24,6 +27,24 @@ class SalaryComponent(models.Model):
     def __str__(self):
         return self.name
 
+class TaxSlab(models.Model):
+    """
+    A progressive income tax band: annual taxable income from lower_limit up
+    to the next slab's lower limit is taxed at percentage
+    """
+    lower_limit = models.DecimalField(max_digits=12, decimal_places=2, unique=True,
+                                      validators=[MinValueValidator(0)],
+                                      help_text="Annual taxable income from which the rate applies")
+    percentage = models.DecimalField(max_digits=5, decimal_places=2,
+                                     validators=[MinValueValidator(0), MaxValueValidator(100)],
+                                     help_text="Tax rate on income within the slab")
+
+    class Meta:
+        ordering = ['lower_limit']
+
+    def __str__(self):
+        return f"{self.percentage}% from {self.lower_limit}"
+
 class PayrollPeriod(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
@@ -33,6 +54,15 @@ class PayrollPeriod(models.Model):
     def __str__(self):
         return f"{self.start_date} to {self.end_date}"
 
+    def unpaid_leave_days(self, employee_ids=None):
+        """
+        Approved leave days per employee within this period, as a
+        {employee_id: days} mapping
+        """
+        return LeaveRequest.objects.unpaid_days_by_employee(
+            self.start_date, self.end_date, employee_ids=employee_ids
+        )
+
 class Payslip(models.Model):
     PAYMENT_MODES = [
         ('BANK', 'Bank Transfer'),
@@ -68,25 +98,83 @@ class Payslip(models.Model):
     is_paid = models.BooleanField(default=False)
     remarks = models.TextField(blank=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         unique_together = ('employee', 'payroll_period')
         ordering = ['-payroll_period__start_date']
+        indexes = [
+            models.Index(fields=['payroll_period'], condition=Q(is_paid=False), name='payslip_unpaid_idx'),
+            models.Index(fields=['net_salary'], name='payslip_net_salary_idx'),
+        ]
 
     def __str__(self):
         return f"{self.employee.full_name} - {self.payroll_period}"
 
-    def calculate_leave_deductions(self):
+    def calculate_leave_deductions(self, unpaid_leave_days=None):
         """
         Calculate salary deductions based on unpaid leaves
+
+        Pass the mapping returned by PayrollPeriod.unpaid_leave_days to avoid
+        a query per payslip when computing a whole period.
         """
-        unpaid_leaves = LeaveRequest.objects.filter(
-            employee=self.employee,
-            start_date__gte=self.payroll_period.start_date,
-            end_date__lte=self.payroll_period.end_date,
-            status='A'  # Only approved leaves
-        )
+        if unpaid_leave_days is None:
+            unpaid_leave_days = self.payroll_period.unpaid_leave_days(employee_ids=[self.employee_id])
         
-        total_unpaid_days = sum(leave.total_days for leave in unpaid_leaves)
+        total_unpaid_days = unpaid_leave_days.get(self.employee_id, 0)
         daily_salary = self.basic_salary / 30  # Assuming 30 days in a month
         
         return total_unpaid_days * daily_salary
+
+class PayrollRun(models.Model):
+    """
+    A payroll period computed in the background, one chunk of employees
+    (by id) per transaction. ``last_employee_id`` is where a resumed run
+    continues; a worker owns the run while ``claim`` is set and its lease
+    has not expired.
+    """
+    STATUS_CHOICES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('COMPLETED', 'Completed'),
+        ('FAILED', 'Failed')
+    ]
+
+    payroll_period = models.ForeignKey(PayrollPeriod, on_delete=models.CASCADE, related_name='runs')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='QUEUED')
+    chunk_size = models.PositiveIntegerField()
+
+    # Progress
+    total_employees = models.PositiveIntegerField(default=0)
+    processed_employees = models.PositiveIntegerField(default=0)
+    payslips_created = models.PositiveIntegerField(default=0)
+    total_net_salary = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    last_employee_id = models.BigIntegerField(null=True, blank=True)
+    # Time spent computing chunks, excluding time queued or crashed
+    processing_seconds = models.FloatField(default=0)
+    errors = models.JSONField(default=list, blank=True)
+
+    claim = models.UUIDField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        get_latest_by = 'created_at'
+        indexes = [
+            models.Index(fields=['payroll_period', 'status'], name='payrollrun_period_status_idx'),
+        ]
+
+    def __str__(self):
+        return f"Payroll run {self.pk} for {self.payroll_period} ({self.status})"
+
+@receiver(post_save, sender=Payslip)
+@receiver(post_delete, sender=Payslip)
+def invalidate_salary_statistics(sender, instance, **kwargs):
+    """
+    Drop the cached salary statistics of the payslip's period
+    """
+    from .statistics import invalidate
+    invalidate(instance.payroll_period_id)
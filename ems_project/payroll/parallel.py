@@ -0,0 +1,100 @@
+"""
+Payslip computation across worker processes.
+
+Once a period's inputs are loaded, computing payslips is pure CPU work per
+employee, so ``build_payslips_parallel`` splits the eligible employees into
+partitions and computes them on a ``ProcessPoolExecutor``. Partitions travel
+as columns of integers (salaries in paise, unpaid days, scores in
+hundredths) and come back as one array of paise per payslip amount, which
+is much cheaper to pickle than model instances or Decimals. The parent
+turns the columns back into unsaved Payslips for a single bulk write.
+Background runs (payroll.jobs) keep one pool for all of a run's chunks.
+
+Workers are started with the 'spawn' method (no fork of a process holding
+database connections and threads) and only import payroll.calculator.
+"""
+import multiprocessing
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+
+from .calculator import AMOUNT_FIELDS, calculate_columns, from_paise, to_paise
+from .models import Payslip
+from . import services
+
+# Partitions per process, so a slow partition does not leave the others idle
+PARTITIONS_PER_PROCESS = 4
+
+
+def to_columns(rows, leave_days):
+    """
+    (pk, salary, performance_score) rows as (ids, salaries, leave days,
+    scores) integer columns
+    """
+    ids, salaries, days, scores = array('q'), array('q'), array('q'), array('q')
+    for employee_id, salary, score in rows:
+        ids.append(employee_id)
+        salaries.append(to_paise(salary))
+        days.append(leave_days.get(employee_id, 0))
+        scores.append(-1 if score is None else to_paise(score))
+    return ids, salaries, days, scores
+
+
+def load_columns(payroll_period, leave_days):
+    """
+    The eligible employees of a period as integer columns
+    """
+    rows = services.payroll_employees(payroll_period).values_list('pk', 'salary', 'performance_score')
+    return to_columns(rows.iterator(chunk_size=5000), leave_days)
+
+
+def get_pool(processes):
+    return ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'))
+
+
+def partitions(count, parts):
+    """
+    ``parts`` contiguous, nearly equal slices covering range(count)
+    """
+    parts = max(1, min(parts, count))
+    size, extra = divmod(count, parts)
+    start = 0
+    for index in range(parts):
+        end = start + size + (index < extra)
+        yield slice(start, end)
+        start = end
+
+
+def build_payslips_parallel(payroll_period, processes, inputs=None, employees=None, executor=None):
+    """
+    Build (unsaved) payslips for every eligible employee of the period, or
+    for ``employees`` given as (pk, salary, performance_score) rows, on
+    ``processes`` worker processes; the result matches build_payslips.
+    ``executor``, a pool from get_pool, is reused instead of a new pool.
+    """
+    inputs = inputs or services.load_inputs(payroll_period)
+    if employees is None:
+        ids, salaries, days, scores = load_columns(payroll_period, inputs['leave_days'])
+    else:
+        ids, salaries, days, scores = to_columns(employees, inputs['leave_days'])
+    if not ids:
+        return []
+
+    shared = (inputs['rates'], inputs['pf_rate'], inputs['tax_rate'], inputs['tax_table'])
+    slices = list(partitions(len(ids), processes * PARTITIONS_PER_PROCESS))
+    with nullcontext(executor) if executor else get_pool(processes) as executor:
+        futures = [
+            executor.submit(calculate_columns, salaries[part], days[part], scores[part], *shared)
+            for part in slices
+        ]
+        results = [future.result() for future in futures]
+
+    payslips = []
+    for part, columns in zip(slices, results):
+        for offset, employee_id in enumerate(ids[part]):
+            payslips.append(Payslip(
+                employee_id=employee_id,
+                payroll_period=payroll_period,
+                **{field: from_paise(column[offset]) for field, column in zip(AMOUNT_FIELDS, columns)},
+            ))
+    return payslips
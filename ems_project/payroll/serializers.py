@@ -1,18 +1,24 @@
 from rest_framework import serializers
-from .models import SalaryComponent, PayrollPeriod, Payslip
+from .models import SalaryComponent, TaxSlab, PayrollPeriod, Payslip
 from employees.serializers import EmployeeSerializer
+from ems_project.sparse_fieldsets import SparseFieldsetSerializerMixin
 
 class SalaryComponentSerializer(serializers.ModelSerializer):
     class Meta:
         model = SalaryComponent
         fields = '__all__'
 
-class PayrollPeriodSerializer(serializers.ModelSerializer):
+class TaxSlabSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaxSlab
+        fields = '__all__'
+
+class PayrollPeriodSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = PayrollPeriod
         fields = '__all__'
 
-class PayslipSerializer(serializers.ModelSerializer):
+class PayslipSerializer(SparseFieldsetSerializerMixin, serializers.ModelSerializer):
     employee_name = serializers.SerializerMethodField()
     payroll_period_details = PayrollPeriodSerializer(source='payroll_period', read_only=True)
 
@@ -41,3 +47,31 @@ class PayslipSerializer(serializers.ModelSerializer):
         # self.process_payroll_notifications(payslip)
         
         return payslip
+
+
+class PayrollDryRunSerializer(serializers.Serializer):
+    """
+    Percentages to try in a payroll dry run; anything left out keeps its
+    current value
+    """
+    component_percentages = serializers.DictField(
+        child=serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0),
+        required=False,
+        help_text="New percentages by salary component id",
+    )
+    pf_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100,
+                                             required=False)
+    tax_percentage = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, max_value=100,
+                                              required=False, help_text="Flat tax rate to try instead of the tax slabs")
+
+    def validate_component_percentages(self, value):
+        try:
+            percentages = {int(pk): percentage for pk, percentage in value.items()}
+        except ValueError:
+            raise serializers.ValidationError("Keys must be salary component ids.")
+        unknown = set(percentages) - set(SalaryComponent.objects.filter(pk__in=percentages).values_list('pk', flat=True))
+        if unknown:
+            raise serializers.ValidationError(
+                f"Unknown salary components: {', '.join(map(str, sorted(unknown)))}."
+            )
+        return percentages
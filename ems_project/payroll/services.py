@@ -0,0 +1,265 @@
+"""
+Payroll computation services.
+
+A payroll run is set-based: every input (salaries, salary component
+percentages, tax slabs, approved leave days and performance scores) is
+loaded with a handful of aggregate queries, payslip amounts are computed in
+memory and all rows are written with batched inserts inside a single
+transaction.
+
+Large periods are run in the background in employee-id chunks instead; see
+payroll.jobs. ``rerun_payroll`` recomputes a processed period after a
+correction and writes only the payslips that changed.
+"""
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from attendance.models import MonthlyAttendanceSummary
+from employees.models import Employee, Performance
+from .calculator import AMOUNT_FIELDS, HUNDRED, calculate_amounts
+from .models import SalaryComponent, PayrollPeriod, Payslip, TaxSlab
+from .tax import TaxTable
+from . import statistics
+
+
+def get_pf_rate():
+    return Decimal(str(getattr(settings, 'PAYROLL_PF_PERCENTAGE', 12))) / HUNDRED
+
+
+def get_tax_rate():
+    return Decimal(str(getattr(settings, 'PAYROLL_TAX_PERCENTAGE', 10))) / HUNDRED
+
+
+def get_tax_table():
+    """
+    The configured tax slabs compiled into a TaxTable, or None when there
+    are none (tax is then the flat PAYROLL_TAX_PERCENTAGE)
+    """
+    slabs = list(TaxSlab.objects.values_list('lower_limit', 'percentage'))
+    return TaxTable(slabs) if slabs else None
+
+
+def load_salary_rates():
+    """
+    Load all salary components as a list of (component_type, rate, is_taxable)
+    tuples, where rate is the component percentage as a fraction.
+    """
+    return [
+        (component_type, percentage / HUNDRED, is_taxable)
+        for component_type, percentage, is_taxable in SalaryComponent.objects.values_list(
+            'component_type', 'percentage', 'is_taxable'
+        )
+    ]
+
+
+def calculate_payslip_amounts(salary, rates, leave_days=0, performance_score=None,
+                              pf_rate=None, tax_rate=None, tax_table=None):
+    """
+    Compute every earning, deduction and total column of a payslip.
+
+    ``salary`` is the employee's monthly base salary and ``rates`` the output
+    of ``load_salary_rates``. Without a BASIC component the whole base salary
+    is treated as (taxable) basic pay. The BONUS components are scaled by the
+    latest performance score out of 10; employees without a review get none.
+    Tax is levied on the annualized taxable earnings through the tax slabs
+    (``tax_table``, loaded when neither it nor ``tax_rate`` is given) or, if
+    there are none, at the flat ``tax_rate``.
+    """
+    pf_rate = get_pf_rate() if pf_rate is None else pf_rate
+    if tax_rate is None and tax_table is None:
+        tax_table = get_tax_table()
+    tax_rate = get_tax_rate() if tax_rate is None else tax_rate
+    return calculate_amounts(salary, rates, leave_days, performance_score, pf_rate, tax_rate, tax_table)
+
+
+def payroll_employees(payroll_period, pending_only=True):
+    """
+    Active employees eligible for the period, annotated with their latest
+    performance score on or before the period end. Unless ``pending_only``
+    is False, employees who already have a payslip for it are left out.
+    """
+    latest_score = Performance.objects.filter(
+        employee=OuterRef('pk'),
+        review_date__lte=payroll_period.end_date,
+    ).order_by('-review_date').values('overall_score')[:1]
+
+    employees = Employee.objects.filter(
+        is_active=True,
+        date_of_joining__lte=payroll_period.end_date,
+    )
+    if pending_only:
+        employees = employees.exclude(payslips__payroll_period=payroll_period)
+    return employees.annotate(
+        performance_score=Subquery(latest_score),
+    ).order_by('pk')
+
+
+def unpaid_days_by_employee(payroll_period):
+    """
+    Unpaid days per employee: approved leave, plus absences (read from the
+    monthly attendance summaries) when PAYROLL_DEDUCT_ABSENCES is enabled.
+    """
+    unpaid_days = payroll_period.unpaid_leave_days()
+    if getattr(settings, 'PAYROLL_DEDUCT_ABSENCES', False):
+        absent_days = MonthlyAttendanceSummary.objects.absent_days_by_employee(
+            payroll_period.start_date, payroll_period.end_date
+        )
+        for employee_id, days in absent_days.items():
+            unpaid_days[employee_id] = unpaid_days.get(employee_id, 0) + days
+    return unpaid_days
+
+
+def load_inputs(payroll_period):
+    """
+    The period-wide inputs of a payroll run, loaded once and shared by
+    every chunk of employees
+    """
+    return {
+        'rates': load_salary_rates(),
+        'leave_days': unpaid_days_by_employee(payroll_period),
+        'pf_rate': get_pf_rate(),
+        'tax_rate': get_tax_rate(),
+        'tax_table': get_tax_table(),
+    }
+
+
+def build_payslips(payroll_period, employees=None, inputs=None):
+    """
+    Build (unsaved) payslips for every eligible employee of the period, or
+    for ``employees`` given as (pk, salary, performance_score) rows.
+    """
+    inputs = inputs or load_inputs(payroll_period)
+    leave_days = inputs['leave_days']
+
+    if employees is None:
+        employees = payroll_employees(payroll_period).values_list(
+            'pk', 'salary', 'performance_score',
+        ).iterator(chunk_size=2000)
+
+    return [
+        Payslip(
+            employee_id=employee_id,
+            payroll_period=payroll_period,
+            **calculate_payslip_amounts(
+                salary,
+                inputs['rates'],
+                leave_days=leave_days.get(employee_id, 0),
+                performance_score=performance_score,
+                pf_rate=inputs['pf_rate'],
+                tax_rate=inputs['tax_rate'],
+                tax_table=inputs['tax_table'],
+            )
+        )
+        for employee_id, salary, performance_score in employees
+    ]
+
+
+def process_payroll(payroll_period, batch_size=None, processes=None):
+    """
+    Generate payslips for all eligible employees and mark the period as
+    processed, all within one transaction. With more than one of
+    ``processes`` (PAYROLL_PROCESSES) the payslips are computed on a
+    process pool (see payroll.parallel).
+
+    Returns a summary with the number of payslips created and the payroll
+    totals for the run.
+    """
+    batch_size = batch_size or getattr(settings, 'PAYROLL_BULK_BATCH_SIZE', 1000)
+    processes = processes or getattr(settings, 'PAYROLL_PROCESSES', 1)
+
+    with transaction.atomic():
+        if processes > 1:
+            from .parallel import build_payslips_parallel
+
+            payslips = build_payslips_parallel(payroll_period, processes)
+        else:
+            payslips = build_payslips(payroll_period)
+        Payslip.objects.bulk_create(payslips, batch_size=batch_size)
+
+        payroll_period.is_processed = True
+        payroll_period.processed_at = timezone.now()
+        payroll_period.save(update_fields=['is_processed', 'processed_at'])
+
+    return {
+        'payslips_created': len(payslips),
+        'total_gross_earnings': sum((p.gross_earnings for p in payslips), Decimal('0')),
+        'total_deductions': sum((p.total_deductions for p in payslips), Decimal('0')),
+        'total_net_salary': sum((p.net_salary for p in payslips), Decimal('0')),
+    }
+
+
+def rerun_payroll(payroll_period, batch_size=None):
+    """
+    Recompute every payslip of a period, e.g. after a late leave or
+    attendance correction, and write only the differences: payslips whose
+    amounts changed are updated with one bulk_update, missing ones are
+    created and paid ones are left as they are. Unpaid payslips of
+    employees no longer eligible (e.g. who left since the last run) are
+    deleted; paid ones are kept and counted as stale. Rerunning with
+    unchanged inputs writes nothing.
+
+    Returns the number of payslips created, updated, unchanged and deleted,
+    paid ones that would have changed, and stale paid ones.
+    """
+    batch_size = batch_size or getattr(settings, 'PAYROLL_BULK_BATCH_SIZE', 1000)
+
+    with transaction.atomic():
+        # Serialize reruns of the same period
+        PayrollPeriod.objects.select_for_update().filter(pk=payroll_period.pk).first()
+        existing = {
+            employee_id: (pk, is_paid, amounts)
+            for employee_id, pk, is_paid, *amounts in Payslip.objects.filter(
+                payroll_period=payroll_period,
+            ).order_by().values_list('employee_id', 'pk', 'is_paid', *AMOUNT_FIELDS).iterator(chunk_size=2000)
+        }
+        employees = payroll_employees(payroll_period, pending_only=False).values_list(
+            'pk', 'salary', 'performance_score',
+        ).iterator(chunk_size=2000)
+
+        created, updated = [], []
+        unchanged = paid_skipped = 0
+        now = timezone.now()
+        for payslip in build_payslips(payroll_period, employees):
+            if payslip.employee_id not in existing:
+                created.append(payslip)
+                continue
+            pk, is_paid, amounts = existing.pop(payslip.employee_id)
+            if amounts == [getattr(payslip, field) for field in AMOUNT_FIELDS]:
+                unchanged += 1
+            elif is_paid:
+                paid_skipped += 1
+            else:
+                # bulk_update does not apply auto_now
+                payslip.pk = pk
+                payslip.updated_at = now
+                updated.append(payslip)
+
+        Payslip.objects.bulk_create(created, batch_size=batch_size)
+        Payslip.objects.bulk_update(updated, [*AMOUNT_FIELDS, 'updated_at'], batch_size=batch_size)
+
+        # What is left in existing belongs to employees no longer eligible
+        stale = [pk for pk, is_paid, _ in existing.values() if not is_paid]
+        for start in range(0, len(stale), batch_size):
+            Payslip.objects.filter(pk__in=stale[start:start + batch_size]).delete()
+
+        if not payroll_period.is_processed:
+            payroll_period.is_processed = True
+            payroll_period.processed_at = now
+            payroll_period.save(update_fields=['is_processed', 'processed_at'])
+        if created or updated or stale:
+            # Bulk writes send no signals
+            statistics.invalidate(payroll_period.pk)
+            transaction.on_commit(lambda: statistics.invalidate(payroll_period.pk))
+
+    return {
+        'payslips_created': len(created),
+        'payslips_updated': len(updated),
+        'payslips_unchanged': unchanged,
+        'payslips_deleted': len(stale),
+        'paid_payslips_skipped': paid_skipped,
+        'stale_paid_payslips': len(existing) - len(stale),
+    }
@@ -0,0 +1,170 @@
+"""
+Salary statistics over payslips.
+
+Totals, averages and extremes come from a single aggregate query (grouped by
+department when requested). Median and 90th percentile are computed by the
+database with PERCENTILE_CONT on PostgreSQL. Other backends read, per
+percentile and group, only the two net salaries at the ranks it falls
+between (an ordered OFFSET query over payslip_net_salary_idx, using the
+group's count from the aggregate) and interpolate the same way in Python.
+
+The statistics of processed payroll periods are cached in the shared
+``api`` cache (see ems_project.response_cache) under a key carrying a
+version number per period. A payslip save or delete, or a payroll rerun,
+bumps the period's version, so the old entry stops matching. With Redis
+behind the ``api`` alias every process sees the bump at once; with the
+default per-process memory cache other processes can serve the previous
+statistics until the entry expires after API_CACHE_TIMEOUT seconds.
+"""
+import time
+from decimal import Decimal, ROUND_HALF_UP
+
+from django.db import connection
+from django.db.models import Aggregate, Avg, Count, F, FloatField, Max, Min, Sum
+
+from ems_project.response_cache import get_cache, get_timeout
+from .models import Payslip
+
+CENT = Decimal('0.01')
+PERCENTILES = {'median_salary': 0.5, 'p90_salary': 0.9}
+
+
+class PercentileCont(Aggregate):
+    """
+    Continuous percentile (PostgreSQL only)
+    """
+    function = 'PERCENTILE_CONT'
+    name = 'PercentileCont'
+    template = '%(function)s(%(percentile)s) WITHIN GROUP (ORDER BY %(expressions)s)'
+    output_field = FloatField()
+
+    def __init__(self, expression, percentile, **extra):
+        # Rendered as a literal; percentiles are fixed fractions, never input
+        super().__init__(expression, percentile=repr(float(percentile)), **extra)
+
+
+def _money(value):
+    if value is None:
+        return None
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def percentile_cont(salaries, count, fraction):
+    """
+    Linear interpolation between the closest ranks of the ``count`` net
+    salaries of ``salaries``, as PERCENTILE_CONT does; reads only those
+    two ranks
+    """
+    if not count:
+        return None
+    position = fraction * (count - 1)
+    lower = int(position)
+    values = list(salaries.order_by('net_salary').values_list('net_salary', flat=True)[lower:lower + 2])
+    if len(values) == 1:
+        return values[0]
+    weight = Decimal(str(position - lower))
+    return values[0] + (values[1] - values[0]) * weight
+
+
+def _version_key(payroll_period_id):
+    return f'payroll:salary_statistics:version:{payroll_period_id}'
+
+
+def get_version(cache, payroll_period_id):
+    """
+    The period's current version; a missing one starts from the clock, so
+    it never goes back to a version entries were stored under
+    """
+    key = _version_key(payroll_period_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def cache_key(payroll_period_id, group_by, version):
+    return f'payroll:salary_statistics:{payroll_period_id}:{version}:{group_by or "all"}'
+
+
+def invalidate(payroll_period_id):
+    """
+    Expire the cached statistics of a period in every process sharing the
+    cache
+    """
+    cache = get_cache()
+    key = _version_key(payroll_period_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns(), None)
+
+
+def _format(row):
+    return {
+        'payslip_count': row['payslip_count'],
+        'total_payroll': row['total_payroll'],
+        'average_salary': _money(row['average_salary']),
+        'highest_salary': row['highest_salary'] or 0,
+        'lowest_salary': row['lowest_salary'] or 0,
+        **{name: _money(row[name]) for name in PERCENTILES},
+    }
+
+
+def compute_salary_statistics(queryset, group_by=None):
+    aggregates = {
+        'payslip_count': Count('id'),
+        'total_payroll': Sum('net_salary'),
+        'average_salary': Avg('net_salary'),
+        'highest_salary': Max('net_salary'),
+        'lowest_salary': Min('net_salary'),
+    }
+    use_database_percentiles = connection.vendor == 'postgresql'
+    if use_database_percentiles:
+        aggregates.update({
+            name: PercentileCont('net_salary', fraction) for name, fraction in PERCENTILES.items()
+        })
+
+    queryset = queryset.order_by()
+    if group_by is None:
+        rows = [queryset.aggregate(**aggregates)]
+    else:
+        rows = list(
+            queryset.values(department=F(group_by)).annotate(**aggregates).order_by('department')
+        )
+
+    if not use_database_percentiles:
+        for row in rows:
+            salaries = queryset
+            if group_by is not None:
+                salaries = queryset.filter(**{group_by: row['department']})
+            for name, fraction in PERCENTILES.items():
+                row[name] = percentile_cont(salaries, row['payslip_count'], fraction)
+
+    if group_by is None:
+        return _format(rows[0])
+    return [{'department': row['department'], **_format(row)} for row in rows]
+
+
+def salary_statistics(payroll_period=None, group_by=None):
+    """
+    Statistics of the net salary of all payslips, or of one payroll period,
+    optionally grouped by 'department'
+    """
+    if group_by == 'department':
+        group_by = 'employee__department'
+    queryset = Payslip.objects.all()
+    if payroll_period is None:
+        return compute_salary_statistics(queryset, group_by)
+
+    queryset = queryset.filter(payroll_period=payroll_period)
+    if not payroll_period.is_processed:
+        return compute_salary_statistics(queryset, group_by)
+
+    cache = get_cache()
+    key = cache_key(payroll_period.pk, 'department' if group_by else None, get_version(cache, payroll_period.pk))
+    stats = cache.get(key)
+    if stats is None:
+        stats = compute_salary_statistics(queryset, group_by)
+        cache.set(key, stats, get_timeout())
+    return stats
@@ -0,0 +1,12 @@
+from celery import shared_task
+
+from . import jobs
+
+
+@shared_task(ignore_result=True, acks_late=True, reject_on_worker_lost=True)
+def run_payroll_task(run_id):
+    """
+    Compute a payroll run; acknowledged only once it finishes, so a crashed
+    worker's run is redelivered and resumes from its last chunk
+    """
+    jobs.run_payroll(run_id)
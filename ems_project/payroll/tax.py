@@ -0,0 +1,64 @@
+"""
+Progressive income tax slabs.
+
+``TaxTable`` compiles slabs, given as (lower limit, percentage) pairs over
+annual taxable income, into sorted breakpoints with the tax due at each
+breakpoint (a prefix sum over the slabs below it). The tax on an income is
+then one bisect, a subtraction and a multiplication, however many slabs
+there are. Everything is an integer: incomes in paise, percentages in
+hundredths of a percent and tax in 1/10000 paise until the final rounding,
+so the scalar and vectorized calculators agree to the paisa.
+
+Payroll annualizes a month's taxable earnings and deducts a twelfth of the
+annual tax. Like payroll.calculator, this module has no Django imports.
+"""
+import bisect
+
+MONTHS_PER_YEAR = 12
+RATE_SCALE = 10000  # A rate of 1 in hundredths of a percent
+
+
+def _hundredths(value):
+    return int(value.scaleb(2))
+
+
+class TaxTable:
+    """
+    The compiled slabs; income below the lowest lower limit is not taxed
+    """
+
+    def __init__(self, slabs):
+        slabs = sorted((_hundredths(lower_limit), _hundredths(percentage)) for lower_limit, percentage in slabs)
+        limits = [lower_limit for lower_limit, _ in slabs]
+        if len(set(limits)) != len(limits):
+            raise ValueError("Tax slabs must have distinct lower limits.")
+        if not slabs or slabs[0][0] > 0:
+            slabs.insert(0, (0, 0))
+
+        self.breakpoints = [lower_limit for lower_limit, _ in slabs]
+        self.rates = [rate for _, rate in slabs]
+        # Tax on the income up to each breakpoint
+        self.cumulative = [0]
+        for index in range(1, len(slabs)):
+            width = self.breakpoints[index] - self.breakpoints[index - 1]
+            self.cumulative.append(self.cumulative[-1] + width * self.rates[index - 1])
+
+    def __len__(self):
+        return len(self.breakpoints)
+
+    def annual_tax_units(self, income):
+        """
+        Tax on an annual income in paise, in 1/RATE_SCALE paise
+        """
+        if income <= 0:
+            return 0
+        index = bisect.bisect_right(self.breakpoints, income) - 1
+        return self.cumulative[index] + (income - self.breakpoints[index]) * self.rates[index]
+
+    def monthly_tax(self, taxable):
+        """
+        The month's tax, in paise, on ``taxable`` paise of monthly earnings
+        """
+        units = self.annual_tax_units(taxable * MONTHS_PER_YEAR)
+        denominator = RATE_SCALE * MONTHS_PER_YEAR
+        return (2 * units + denominator) // (2 * denominator)
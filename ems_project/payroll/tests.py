@@ -1,3 +1,707 @@
-from django.test import TestCase
+import csv
+import io
+import random
+import uuid
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from attendance.models import Attendance, LeaveRequest
+from employees.models import Department, Employee, Performance
+from employees.test_utils import create_employee
+from .models import SalaryComponent, PayrollPeriod, PayrollRun, Payslip, TaxSlab
+from .tax import TaxTable
+from . import calculator, jobs, parallel, services, statistics, vectorized
+
+
+class PayslipCalculationTests(TestCase):
+    def test_components_and_deductions(self):
+        rates = [
+            ('BASIC', Decimal('0.50'), True),
+            ('HRA', Decimal('0.20'), False),
+            ('DA', Decimal('0.10'), True),
+            ('BONUS', Decimal('0.10'), True),
+        ]
+        amounts = services.calculate_payslip_amounts(
+            Decimal('30000'), rates, leave_days=3, performance_score=Decimal('8'),
+            pf_rate=Decimal('0.12'), tax_rate=Decimal('0.10'),
+        )
+
+        self.assertEqual(amounts['basic_salary'], Decimal('15000.00'))
+        self.assertEqual(amounts['hra'], Decimal('6000.00'))
+        self.assertEqual(amounts['other_allowances'], Decimal('3000.00'))
+        self.assertEqual(amounts['performance_bonus'], Decimal('2400.00'))
+        self.assertEqual(amounts['gross_earnings'], Decimal('26400.00'))
+        self.assertEqual(amounts['pf_contribution'], Decimal('1800.00'))
+        self.assertEqual(amounts['tax_deduction'], Decimal('2040.00'))
+        self.assertEqual(amounts['leave_deductions'], Decimal('1500.00'))
+        self.assertEqual(amounts['total_deductions'], Decimal('5340.00'))
+        self.assertEqual(amounts['net_salary'], Decimal('21060.00'))
+
+    def test_without_components_salary_is_basic(self):
+        amounts = services.calculate_payslip_amounts(
+            Decimal('12000'), [], pf_rate=Decimal('0.12'), tax_rate=Decimal('0.10'),
+        )
+
+        self.assertEqual(amounts['basic_salary'], Decimal('12000.00'))
+        self.assertEqual(amounts['net_salary'], Decimal('9360.00'))
+
+    def test_leave_deductions_never_make_net_negative(self):
+        amounts = services.calculate_payslip_amounts(
+            Decimal('12000'), [], leave_days=30, pf_rate=Decimal('0.12'), tax_rate=Decimal('0.10'),
+        )
+
+        self.assertEqual(amounts['net_salary'], Decimal('0.00'))
+
+
+class ProcessPayrollTests(TestCase):
+    def setUp(self):
+        SalaryComponent.objects.create(name='Basic', component_type='BASIC', percentage=Decimal('50'))
+        SalaryComponent.objects.create(name='HRA', component_type='HRA', percentage=Decimal('20'))
+        SalaryComponent.objects.create(name='Bonus', component_type='BONUS', percentage=Decimal('10'))
+        self.period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+
+    def test_generates_payslips_for_active_employees(self):
+        employee = create_employee(1)
+        create_employee(2, is_active=False)
+        create_employee(3, date_of_joining=date(2024, 2, 1))
+        LeaveRequest.objects.create(
+            employee=employee, leave_type='CL', reason='Trip', status='A',
+            start_date=date(2024, 1, 10), end_date=date(2024, 1, 11), total_days=2,
+        )
+        Performance.objects.create(
+            employee=employee, review_date=date(2023, 12, 1),
+            technical_score=10, communication_score=10, teamwork_score=10, leadership_score=10,
+        )
+
+        summary = services.process_payroll(self.period)
+
+        self.assertEqual(summary['payslips_created'], 1)
+        payslip = Payslip.objects.get()
+        self.assertEqual(payslip.employee, employee)
+        self.assertEqual(payslip.basic_salary, Decimal('15000.00'))
+        self.assertEqual(payslip.performance_bonus, Decimal('3000.00'))
+        self.assertEqual(payslip.leave_deductions, Decimal('1000.00'))
+        self.assertEqual(summary['total_net_salary'], payslip.net_salary)
+        self.period.refresh_from_db()
+        self.assertTrue(self.period.is_processed)
+
+    def test_query_count_is_independent_of_headcount(self):
+        for index in range(20):
+            create_employee(index)
+
+        # components, leaves, tax slabs, employees, insert, period update, savepoints
+        with self.assertNumQueries(8):
+            services.process_payroll(self.period)
+
+        self.assertEqual(Payslip.objects.count(), 20)
+
+    def test_process_pool_matches_in_process_computation(self):
+        for index in range(7):
+            employee = create_employee(index, salary=f'{12345 + index * 1111}.67')
+            if index % 2:
+                Performance.objects.create(
+                    employee=employee, review_date=date(2023, 12, 1),
+                    technical_score=index, communication_score=7, teamwork_score=9, leadership_score=3,
+                )
+            if index % 3 == 0:
+                LeaveRequest.objects.create(
+                    employee=employee, leave_type='CL', reason='Trip', status='A',
+                    start_date=date(2024, 1, 10), end_date=date(2024, 1, 10 + index), total_days=index + 1,
+                )
+
+        def amounts(payslips):
+            return sorted(
+                (payslip.employee_id, [getattr(payslip, field) for field in calculator.AMOUNT_FIELDS])
+                for payslip in payslips
+            )
+
+        expected = amounts(services.build_payslips(self.period))
+        self.assertEqual(amounts(parallel.build_payslips_parallel(self.period, processes=2)), expected)
+
+        summary = services.process_payroll(self.period, processes=2)
+        self.assertEqual(summary['payslips_created'], 7)
+        self.assertEqual(amounts(Payslip.objects.all()), expected)
+
+    def test_partitions(self):
+        self.assertEqual(
+            [(part.start, part.stop) for part in parallel.partitions(10, 4)], [(0, 3), (3, 6), (6, 8), (8, 10)],
+        )
+        self.assertEqual([(part.start, part.stop) for part in parallel.partitions(2, 8)], [(0, 1), (1, 2)])
+
+    @override_settings(PAYROLL_DEDUCT_ABSENCES=True)
+    def test_absences_can_be_deducted(self):
+        employee = create_employee(1)
+        Attendance.objects.create(employee=employee, date=date(2024, 1, 5), status='A')
+        Attendance.objects.create(employee=employee, date=date(2024, 1, 8), status='P')
+
+        services.process_payroll(self.period)
+
+        self.assertEqual(Payslip.objects.get().leave_deductions, Decimal('500.00'))
+
+    def test_process_payroll_endpoint(self):
+        create_employee(1)
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = APIClient()
+        client.force_authenticate(admin)
+
+        with override_settings(PAYROLL_WORKER='inline'), self.captureOnCommitCallbacks(execute=True):
+            response = client.post(f'/api/v1/payroll-periods/{self.period.pk}/process_payroll/')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.data['status'], 'QUEUED')
+        response = client.get(f'/api/v1/payroll-periods/{self.period.pk}/run-status/')
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        self.assertEqual(response.data['payslips_created'], 1)
+
+        response = client.post(f'/api/v1/payroll-periods/{self.period.pk}/process_payroll/')
+        self.assertEqual(response.status_code, 400)
+
+
+class VectorizedCalculatorTests(TestCase):
+    def test_matches_decimal_calculator(self):
+        rates = [
+            ('BASIC', Decimal('0.4837'), True),
+            ('HRA', Decimal('0.2013'), False),
+            ('DA', Decimal('0.0333'), True),
+            ('OTHER', Decimal('0.05'), True),
+            ('BONUS', Decimal('0.1111'), True),
+        ]
+        salaries = [Decimal('0.55'), Decimal('1.00'), Decimal('30000.00'), Decimal('45678.91'), Decimal('99999999.99')]
+        scores = [None, Decimal('1.00'), Decimal('7.35'), Decimal('10.00')]
+        cases = [
+            (salary, days, score) for salary in salaries for days in (0, 3, 7, 31, 40) for score in scores
+        ]
+        arrays = vectorized.PayrollArrays(
+            employee_ids=None,
+            salaries=vectorized.np.array([calculator.to_paise(salary) for salary, _, _ in cases]),
+            leave_days=vectorized.np.array([days for _, days, _ in cases]),
+            scores=vectorized.np.array([-1 if score is None else calculator.to_paise(score) for _, _, score in cases]),
+        )
+
+        for case_rates in (rates, rates[1:], []):
+            columns = vectorized.calculate(arrays, case_rates, Decimal('0.125'), Decimal('0.10'))
+            for index, (salary, days, score) in enumerate(cases):
+                expected = calculator.calculate_amounts(
+                    salary, case_rates, days, score, Decimal('0.125'), Decimal('0.10'),
+                )
+                for field in calculator.AMOUNT_FIELDS:
+                    self.assertEqual(
+                        calculator.from_paise(int(columns[field][index])), expected[field],
+                        (field, salary, days, score),
+                    )
+
+    def test_dry_run_endpoint(self):
+        basic = SalaryComponent.objects.create(name='Basic', component_type='BASIC', percentage=Decimal('50'))
+        hra = SalaryComponent.objects.create(name='HRA', component_type='HRA', percentage=Decimal('20'))
+        period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        for index in range(3):
+            create_employee(index, salary=f'{30000 + index * 1000}.00')
+        services.process_payroll(period)
+        create_employee(3)
+        stored = list(Payslip.objects.values_list('pk', 'net_salary', 'updated_at'))
+
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = f'/api/v1/payroll-periods/{period.pk}/dry-run/'
+        response = client.post(url, {'component_percentages': {str(hra.pk): '30'}}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        # Employees with and without a payslip are both recomputed
+        self.assertEqual(response.data['employees'], 4)
+        self.assertEqual(response.data['changed_employees'], 4)
+        self.assertEqual(response.data['baseline']['hra'], Decimal('24600.00'))
+        self.assertEqual(response.data['totals']['hra'], Decimal('36900.00'))
+        self.assertEqual(response.data['difference']['hra'], Decimal('12300.00'))
+        self.assertEqual(response.data['difference']['basic_salary'], Decimal('0.00'))
+        self.assertEqual(list(Payslip.objects.values_list('pk', 'net_salary', 'updated_at')), stored)
+        basic.refresh_from_db()
+        hra.refresh_from_db()
+        self.assertEqual(hra.percentage, Decimal('20'))
+
+        response = client.post(url, {'tax_percentage': '12.5'}, format='json')
+        self.assertEqual(response.data['changed_employees'], 4)
+        self.assertEqual(response.data['difference']['hra'], Decimal('0.00'))
+        self.assertGreater(response.data['difference']['tax_deduction'], 0)
+
+        response = client.post(url, {'component_percentages': {'999': '10'}}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('component_percentages', response.data)
+
+
+class TaxSlabTests(TestCase):
+    SLABS = [
+        (Decimal('300000'), Decimal('5')),
+        (Decimal('700000'), Decimal('10')),
+        (Decimal('1000000'), Decimal('20')),
+        (Decimal('1500000'), Decimal('30')),
+    ]
+
+    def reference_tax(self, slabs, monthly_taxable):
+        """
+        The monthly tax computed slab by slab
+        """
+        income = monthly_taxable * 12
+        slabs = sorted(slabs)
+        tax = Decimal('0')
+        for index, (lower_limit, percentage) in enumerate(slabs):
+            upper_limit = slabs[index + 1][0] if index + 1 < len(slabs) else income
+            tax += max(Decimal('0'), min(income, upper_limit) - lower_limit) * percentage / 100
+        return (tax / 12).quantize(Decimal('0.01'), rounding='ROUND_HALF_UP')
+
+    def test_known_amounts(self):
+        table = TaxTable(self.SLABS)
+        # 20000 + 30000 + 40000 a year on 1,200,000
+        self.assertEqual(table.monthly_tax(calculator.to_paise(Decimal('100000'))), 750000)
+        self.assertEqual(table.monthly_tax(calculator.to_paise(Decimal('25000'))), 0)
+        self.assertEqual(table.monthly_tax(0), 0)
+        with self.assertRaises(ValueError):
+            TaxTable(self.SLABS + [(Decimal('700000.00'), Decimal('12'))])
+
+    def test_matches_slab_by_slab_computation(self):
+        generator = random.Random(24)
+        for _ in range(20):
+            slabs = {
+                Decimal(generator.randrange(0, 50000) * 100): Decimal(generator.randrange(0, 5000)).scaleb(-2)
+                for _ in range(generator.randrange(1, 8))
+            }
+            table = TaxTable(slabs.items())
+            incomes = [Decimal(generator.randrange(0, 10 ** 9)).scaleb(-2) for _ in range(50)]
+            # Incomes landing on a breakpoint and one paisa either side
+            for lower_limit in slabs:
+                monthly = (lower_limit / 12).quantize(Decimal('0.01'))
+                incomes += [monthly - Decimal('0.01'), monthly, monthly + Decimal('0.01')]
+            taxes = vectorized.slab_tax(table, vectorized.np.array([calculator.to_paise(value) for value in incomes]))
+            for income, tax in zip(incomes, taxes):
+                expected = self.reference_tax(list(slabs.items()), income)
+                self.assertEqual(calculator.from_paise(table.monthly_tax(calculator.to_paise(income))), expected)
+                self.assertEqual(calculator.from_paise(int(tax)), expected)
+
+    def test_payroll_uses_tax_slabs(self):
+        SalaryComponent.objects.create(name='Basic', component_type='BASIC', percentage=Decimal('50'))
+        SalaryComponent.objects.create(name='HRA', component_type='HRA', percentage=Decimal('50'), is_taxable=False)
+        for lower_limit, percentage in self.SLABS:
+            TaxSlab.objects.create(lower_limit=lower_limit, percentage=percentage)
+        period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        create_employee(1, salary='200000.00')
+        create_employee(2, salary='40000.00')
+
+        services.process_payroll(period)
+
+        # Taxable basic of 100000 a month, 20000 (below the first slab) for the other
+        self.assertEqual(
+            list(Payslip.objects.order_by('employee_id').values_list('tax_deduction', flat=True)),
+            [Decimal('7500.00'), Decimal('0.00')],
+        )
+        amounts = services.calculate_payslip_amounts(Decimal('200000.00'), services.load_salary_rates())
+        self.assertEqual(amounts['tax_deduction'], Decimal('7500.00'))
+        # An explicit flat rate bypasses the slabs
+        amounts = services.calculate_payslip_amounts(
+            Decimal('200000.00'), services.load_salary_rates(), tax_rate=Decimal('0.10'),
+        )
+        self.assertEqual(amounts['tax_deduction'], Decimal('10000.00'))
+
+    def test_vectorized_lookup_matches_bisect(self):
+        generator = random.Random(0)
+        table = TaxTable(
+            (Decimal(lower_limit), Decimal(generator.randrange(0, 4000)).scaleb(-2))
+            for lower_limit in range(0, 10000000, 50000)
+        )
+        incomes = [generator.randrange(0, 10 ** 8) for _ in range(10000)]
+
+        columns = vectorized.slab_tax(table, vectorized.np.array(incomes))
+
+        self.assertEqual(columns.tolist(), [table.monthly_tax(income) for income in incomes])
+
+
+@override_settings(PAYROLL_WORKER='inline', PAYROLL_CHUNK_SIZE=2)
+class PayrollJobTests(TestCase):
+    def setUp(self):
+        SalaryComponent.objects.create(name='Basic', component_type='BASIC', percentage=Decimal('50'))
+        self.period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        self.employees = [create_employee(index) for index in range(5)]
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def queue(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            run = jobs.queue_payroll_run(self.period)
+        run.refresh_from_db()
+        return run
+
+    def test_runs_in_chunks_and_reports_status(self):
+        response = self.client.get(f'/api/v1/payroll-periods/{self.period.pk}/run-status/')
+        self.assertEqual(response.status_code, 404)
+
+        run = self.queue()
+
+        self.assertEqual(run.status, 'COMPLETED')
+        self.assertEqual(Payslip.objects.filter(payroll_period=self.period).count(), 5)
+        self.assertEqual(run.last_employee_id, self.employees[-1].pk)
+        self.period.refresh_from_db()
+        self.assertTrue(self.period.is_processed)
+
+        response = self.client.get(f'/api/v1/payroll-periods/{self.period.pk}/run-status/')
+        self.assertEqual(response.data['status'], 'COMPLETED')
+        self.assertEqual(response.data['processed_employees'], 5)
+        self.assertEqual(response.data['progress'], 100.0)
+        self.assertGreater(response.data['employees_per_second'], 0)
+        self.assertEqual(response.data['total_net_salary'], sum(p.net_salary for p in Payslip.objects.all()))
+
+    def test_failed_chunk_keeps_committed_chunks_and_resumes(self):
+        build_payslips = services.build_payslips
+        calls = []
+
+        def failing_second_chunk(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 2:
+                raise ValueError('bad salary data')
+            return build_payslips(*args, **kwargs)
+
+        with mock.patch.object(services, 'build_payslips', failing_second_chunk), self.assertLogs('payroll.jobs'):
+            run = self.queue()
+
+        self.assertEqual(run.status, 'FAILED')
+        self.assertEqual(run.processed_employees, 2)
+        self.assertEqual(Payslip.objects.count(), 2)
+        self.assertEqual(run.errors[0]['after_employee_id'], self.employees[1].pk)
+        self.assertIn('bad salary data', run.errors[0]['error'])
+
+        resumed = self.queue()
+        self.assertEqual(resumed.pk, run.pk)
+        self.assertEqual(resumed.status, 'COMPLETED')
+        self.assertEqual((resumed.processed_employees, resumed.total_employees), (5, 5))
+        self.assertEqual(Payslip.objects.count(), 5)
+        self.assertEqual(len(resumed.errors), 1)
+
+    @override_settings(PAYROLL_PROCESSES=2)
+    def test_chunks_are_computed_on_one_process_pool(self):
+        expected = sorted(
+            (payslip.employee_id, payslip.net_salary) for payslip in services.build_payslips(self.period)
+        )
+
+        with mock.patch.object(parallel, 'get_pool', wraps=parallel.get_pool) as get_pool, \
+                mock.patch.object(parallel, 'build_payslips_parallel', wraps=parallel.build_payslips_parallel) as build:
+            run = self.queue()
+
+        self.assertEqual(run.status, 'COMPLETED')
+        get_pool.assert_called_once_with(2)
+        self.assertEqual(build.call_count, 3)
+        self.assertEqual(sorted(Payslip.objects.values_list('employee_id', 'net_salary')), expected)
+
+    def test_expired_lease_is_resumed(self):
+        now = timezone.now()
+        held = PayrollRun.objects.create(
+            payroll_period=self.period, chunk_size=2, status='RUNNING', claim=uuid.uuid4(),
+            lease_expires_at=now + timedelta(minutes=5),
+        )
+        self.assertIsNone(jobs.claim_run(held.pk))
+        self.assertEqual(jobs.resume_stale_runs(), [])
+
+        PayrollRun.objects.filter(pk=held.pk).update(lease_expires_at=now - timedelta(seconds=1))
+        [run] = jobs.resume_stale_runs()
+        self.assertEqual(run.status, 'COMPLETED')
+        self.assertEqual(Payslip.objects.count(), 5)
+
+
+class PayrollRerunTests(TestCase):
+    def setUp(self):
+        SalaryComponent.objects.create(name='Basic', component_type='BASIC', percentage=Decimal('50'))
+        SalaryComponent.objects.create(name='HRA', component_type='HRA', percentage=Decimal('20'))
+        self.period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        self.employees = [create_employee(index) for index in range(5)]
+        services.process_payroll(self.period)
+
+    def add_leave(self, employee):
+        LeaveRequest.objects.create(
+            employee=employee, leave_type='CL', reason='Late entry', status='A',
+            start_date=date(2024, 1, 10), end_date=date(2024, 1, 12), total_days=3,
+        )
+
+    def test_only_changed_unpaid_payslips_are_written(self):
+        Payslip.objects.filter(employee=self.employees[1]).update(is_paid=True)
+        before = dict(Payslip.objects.values_list('employee_id', 'updated_at'))
+        self.add_leave(self.employees[0])
+        self.add_leave(self.employees[1])
+        late_joiner = create_employee(5)
+
+        summary = services.rerun_payroll(self.period)
+
+        self.assertEqual(summary, {
+            'payslips_created': 1,
+            'payslips_updated': 1,
+            'payslips_unchanged': 3,
+            'payslips_deleted': 0,
+            'paid_payslips_skipped': 1,
+            'stale_paid_payslips': 0,
+        })
+        payslips = {payslip.employee_id: payslip for payslip in Payslip.objects.all()}
+        self.assertEqual(payslips[self.employees[0].pk].leave_deductions, Decimal('1500.00'))
+        self.assertEqual(
+            payslips[self.employees[0].pk].net_salary,
+            payslips[self.employees[2].pk].net_salary - Decimal('1500.00'),
+        )
+        self.assertGreater(payslips[self.employees[0].pk].updated_at, before[self.employees[0].pk])
+        self.assertEqual(payslips[self.employees[1].pk].leave_deductions, Decimal('0.00'))
+        self.assertIn(late_joiner.pk, payslips)
+        for employee in self.employees[1:]:
+            self.assertEqual(payslips[employee.pk].updated_at, before[employee.pk])
+
+        # Nothing left to write: period lock, payslips, inputs, employees, savepoints
+        with self.assertNumQueries(8):
+            summary = services.rerun_payroll(self.period)
+        self.assertEqual(summary['payslips_created'] + summary['payslips_updated'], 0)
+
+    def test_payslips_of_employees_who_left_are_removed(self):
+        Payslip.objects.filter(employee=self.employees[1]).update(is_paid=True)
+        for employee in self.employees[:2]:
+            employee.is_active = False
+            employee.save()
+
+        summary = services.rerun_payroll(self.period)
+
+        self.assertEqual(summary['payslips_deleted'], 1)
+        self.assertEqual(summary['stale_paid_payslips'], 1)
+        employee_ids = set(Payslip.objects.values_list('employee_id', flat=True))
+        self.assertNotIn(self.employees[0].pk, employee_ids)
+        # Paid payslips are history and are kept
+        self.assertIn(self.employees[1].pk, employee_ids)
+
+    def test_rerun_drops_cached_statistics(self):
+        statistics_before = services.statistics.salary_statistics(self.period)
+        self.add_leave(self.employees[0])
+
+        services.rerun_payroll(self.period)
+
+        statistics_after = services.statistics.salary_statistics(self.period)
+        self.assertNotEqual(statistics_after, statistics_before)
+
+    def test_rerun_endpoint(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        client = APIClient()
+        client.force_authenticate(admin)
+        url = f'/api/v1/payroll-periods/{self.period.pk}/rerun/'
+        self.add_leave(self.employees[0])
+
+        response = client.post(url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['payslips_updated'], 1)
+
+        PayrollRun.objects.create(payroll_period=self.period, status='RUNNING', chunk_size=10)
+        response = client.post(url)
+        self.assertEqual(response.status_code, 400)
+
+
+class LeaveDeductionTests(TestCase):
+    def test_straddling_leave_is_deducted(self):
+        employee = create_employee(1)
+        period = PayrollPeriod.objects.create(start_date=date(2024, 1, 1), end_date=date(2024, 1, 31))
+        LeaveRequest.objects.create(
+            employee=employee, leave_type='SL', reason='Flu', status='A',
+            start_date=date(2024, 1, 30), end_date=date(2024, 2, 2), total_days=4,
+        )
+        payslip = Payslip(employee=employee, payroll_period=period, basic_salary=Decimal('3000'))
+
+        self.assertEqual(payslip.calculate_leave_deductions(), Decimal('200'))
+
+        with self.assertNumQueries(0):
+            deduction = payslip.calculate_leave_deductions({employee.pk: 5})
+        self.assertEqual(deduction, Decimal('500'))
+
+
+class PayslipPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        for index in range(4):
+            create_employee(index, salary=f'{10000 + index * 1000}.00')
+        for month in (1, 2, 3):
+            period = PayrollPeriod.objects.create(start_date=date(2024, month, 1), end_date=date(2024, month, 28))
+            services.process_payroll(period)
+
+    def test_pages_follow_period_order(self):
+        response = self.client.get('/api/v1/payslips/?page_size=5')
+        first = response.data['results']
+        second = self.client.get(response.data['next']).data['results']
+
+        starts = [row['payroll_period_details']['start_date'] for row in first + second]
+        self.assertEqual(starts, sorted(starts, reverse=True))
+        self.assertEqual(len({row['id'] for row in first + second}), 10)
+
+    def test_client_ordering_is_used_as_key(self):
+        response = self.client.get('/api/v1/payslips/?ordering=net_salary&page_size=7')
+        rest = self.client.get(response.data['next']).data['results']
+
+        salaries = [Decimal(row['net_salary']) for row in response.data['results'] + rest]
+        self.assertEqual(len(salaries), 12)
+        self.assertEqual(salaries, sorted(salaries))
+
+
+class PayslipExportTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        for index in range(5):
+            create_employee(index, salary=f'{10000 + index * 1000}.00')
+        for month in (1, 2):
+            period = PayrollPeriod.objects.create(start_date=date(2024, month, 1), end_date=date(2024, month, 28))
+            services.process_payroll(period)
+        self.period = period
+
+    def export(self, **params):
+        response = self.client.get('/api/v1/payslips/export/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_csv_with_filters_and_columns(self):
+        # payroll period filter validation, payslips
+        with self.assertNumQueries(2):
+            response, content = self.export(
+                payroll_period=self.period.pk, fields='employee_name,net_salary', ordering='net_salary',
+            )
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="payslips.csv"')
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(rows[0], ['employee_name', 'net_salary'])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][0], 'First0 Last0')
+        expected = Payslip.objects.filter(payroll_period=self.period).order_by('net_salary')
+        self.assertEqual([row[1] for row in rows[1:]], [str(payslip.net_salary) for payslip in expected])
+
+    def test_every_column_by_default(self):
+        _, content = self.export()
+        rows = list(csv.reader(io.StringIO(content.decode())))
+        self.assertEqual(len(rows), 11)
+        self.assertEqual(rows[0][:3], ['id', 'employee', 'employee_name'])
+
+    def test_small_chunks(self):
+        from .views import PayslipViewSet
+
+        PayslipViewSet.export_chunk_size, chunk_size = 3, PayslipViewSet.export_chunk_size
+        self.addCleanup(setattr, PayslipViewSet, 'export_chunk_size', chunk_size)
+        response = self.client.get('/api/v1/payslips/export/', {'fields': 'id'})
+        chunks = list(response.streaming_content)
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(len(b''.join(chunks).splitlines()), 11)
+
+    def test_xlsx(self):
+        response, content = self.export(output='xlsx', fields='employee_name,net_salary,is_paid')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="payslips.xlsx"')
+        with zipfile.ZipFile(io.BytesIO(content)) as archive:
+            self.assertIn('[Content_Types].xml', archive.namelist())
+            sheet = archive.read('xl/worksheets/sheet1.xml').decode()
+        self.assertEqual(sheet.count('<row>'), 11)
+        self.assertIn('<t xml:space="preserve">First0 Last0</t>', sheet)
+        self.assertIn('<c t="b"><v>0</v></c>', sheet)
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/v1/payslips/export/', {'fields': 'id,password'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/v1/payslips/export/', {'output': 'pdf'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_employees_export_their_own_payslips(self):
+        employee = Employee.objects.get(first_name='First3')
+        self.client.force_authenticate(employee.user)
+        _, content = self.export(fields='employee')
+        self.assertEqual(content.decode().split(), ['employee', str(employee.pk), str(employee.pk)])
+
+
+class SalaryStatisticsTests(TestCase):
+    def setUp(self):
+        caches['api'].clear()
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        engineering = Department.objects.create(name='Engineering')
+        sales = Department.objects.create(name='Sales')
+        self.period = PayrollPeriod.objects.create(
+            start_date=date(2024, 1, 1), end_date=date(2024, 1, 31), is_processed=True,
+        )
+        other_period = PayrollPeriod.objects.create(start_date=date(2024, 2, 1), end_date=date(2024, 2, 29))
+        for index, (net, department) in enumerate([(100, engineering), (200, engineering), (300, engineering),
+                                                   (400, sales), (1000, sales)]):
+            employee = create_employee(index, department=department)
+            self.create_payslip(employee, self.period, net)
+            self.create_payslip(employee, other_period, 5)
+
+    def create_payslip(self, employee, period, net):
+        return Payslip.objects.create(
+            employee=employee, payroll_period=period, basic_salary=net, hra=0, pf_contribution=0,
+            tax_deduction=0, gross_earnings=net, total_deductions=0, net_salary=net,
+        )
+
+    def test_single_period_statistics(self):
+        with self.assertNumQueries(4):
+            response = self.client.get(f'/api/v1/payslips/salary_statistics/?payroll_period={self.period.pk}')
+
+        self.assertEqual(response.data, {
+            'payslip_count': 5,
+            'total_payroll': Decimal('2000.00'),
+            'average_salary': Decimal('400.00'),
+            'highest_salary': Decimal('1000.00'),
+            'lowest_salary': Decimal('100.00'),
+            'median_salary': Decimal('300.00'),
+            'p90_salary': Decimal('760.00'),
+        })
+
+    def test_processed_period_is_cached_until_a_payslip_changes(self):
+        url = f'/api/v1/payslips/salary_statistics/?payroll_period={self.period.pk}'
+        self.client.get(url)
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+        payslip = Payslip.objects.get(payroll_period=self.period, net_salary=1000)
+        payslip.net_salary = 500
+        payslip.save()
+
+        self.assertEqual(self.client.get(url).data['highest_salary'], Decimal('500.00'))
+
+    def test_cached_in_the_shared_cache_under_a_period_version(self):
+        statistics.salary_statistics(self.period)
+        version = statistics.get_version(caches['api'], self.period.pk)
+        self.assertIsNotNone(caches['api'].get(statistics.cache_key(self.period.pk, None, version)))
+
+        # Another process bumping the version expires the entry here too
+        caches['api'].incr(f'payroll:salary_statistics:version:{self.period.pk}')
+        with self.assertNumQueries(3):
+            statistics.salary_statistics(self.period)
+
+    def test_percentiles_read_only_their_ranks(self):
+        with CaptureQueriesContext(connection) as queries:
+            stats = statistics.salary_statistics(group_by='department')
+
+        # One aggregate, then the two rows around each percentile per department
+        rank_queries = queries[1:]
+        self.assertEqual(len(rank_queries), 4)
+        for query in rank_queries:
+            self.assertIn('LIMIT 2', query['sql'])
+        engineering = Department.objects.get(name='Engineering').pk
+        self.assertEqual(next(row for row in stats if row['department'] == engineering)['median_salary'], Decimal('52.50'))
+
+    def test_grouped_by_department(self):
+        response = self.client.get(
+            f'/api/v1/payslips/salary_statistics/?payroll_period={self.period.pk}&group_by=department'
+        )
+
+        rows = {row['department']: row for row in response.data}
+        engineering = Department.objects.get(name='Engineering').pk
+        self.assertEqual(rows[engineering]['total_payroll'], Decimal('600.00'))
+        self.assertEqual(rows[engineering]['median_salary'], Decimal('200.00'))
+        self.assertEqual(len(rows), 2)
+
+    def test_all_payslips(self):
+        response = self.client.get('/api/v1/payslips/salary_statistics/')
+
+        self.assertEqual(response.data['payslip_count'], 10)
+        self.assertEqual(response.data['lowest_salary'], Decimal('5.00'))
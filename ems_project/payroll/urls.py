@@ -1,9 +1,10 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import SalaryComponentViewSet, PayrollPeriodViewSet, PayslipViewSet
+from .views import SalaryComponentViewSet, TaxSlabViewSet, PayrollPeriodViewSet, PayslipViewSet
 
 router = DefaultRouter()
 router.register(r'salary-components', SalaryComponentViewSet, basename='salary-component')
+router.register(r'tax-slabs', TaxSlabViewSet, basename='tax-slab')
 router.register(r'payroll-periods', PayrollPeriodViewSet, basename='payroll-period')
 router.register(r'payslips', PayslipViewSet, basename='payslip')
 
@@ -0,0 +1,171 @@
+"""
+Vectorized payslip computation for what-if simulations.
+
+A period's salaries, unpaid days and performance scores are loaded once
+into NumPy arrays of integers (salaries in paise, scores in hundredths) and
+every payslip column is computed for all employees at once. Rates are kept
+as exact integer ratios and each rounding step is an integer division
+rounding half up, so the results match payroll.calculator to the paisa.
+
+``dry_run`` recomputes a period with changed salary component, PF or tax
+percentages and reports the totals and their difference from the current
+rates, without writing anything.
+"""
+from collections import namedtuple
+from decimal import Decimal
+
+import numpy as np
+
+from .calculator import AMOUNT_FIELDS, DAYS_PER_MONTH, HUNDRED, MAX_PERFORMANCE_SCORE, from_paise, to_paise
+from .models import SalaryComponent
+from .tax import MONTHS_PER_YEAR, RATE_SCALE
+from . import services
+
+PayrollArrays = namedtuple('PayrollArrays', ['employee_ids', 'salaries', 'leave_days', 'scores'])
+
+
+def round_half_up(numerator, denominator):
+    """
+    numerator / denominator rounded half away from zero, like ROUND_HALF_UP
+    """
+    magnitude = (2 * np.abs(numerator) + denominator) // (2 * denominator)
+    return np.where(numerator < 0, -magnitude, magnitude)
+
+
+def apply_rate(amounts, rate):
+    """
+    ``amounts`` (paise) times a Decimal rate, rounded to the paisa
+    """
+    numerator, denominator = rate.as_integer_ratio()
+    return round_half_up(amounts * numerator, denominator)
+
+
+def slab_tax(tax_table, taxable):
+    """
+    The monthly tax on ``taxable`` paise through a payroll.tax.TaxTable,
+    one searchsorted for all employees
+    """
+    breakpoints = np.array(tax_table.breakpoints, dtype=np.int64)
+    annual = taxable * MONTHS_PER_YEAR
+    index = np.searchsorted(breakpoints, annual, side='right') - 1
+    units = np.array(tax_table.cumulative, dtype=np.int64)[index] + (
+        (annual - breakpoints[index]) * np.array(tax_table.rates, dtype=np.int64)[index]
+    )
+    return np.where(annual > 0, round_half_up(units, RATE_SCALE * MONTHS_PER_YEAR), 0)
+
+
+def load_arrays(payroll_period, leave_days, pending_only=False):
+    """
+    Every eligible employee of the period as integer arrays; scores are -1
+    for employees without a review
+    """
+    rows = services.payroll_employees(payroll_period, pending_only=pending_only).values_list(
+        'pk', 'salary', 'performance_score',
+    )
+    ids, salaries, days, scores = [], [], [], []
+    for employee_id, salary, score in rows.iterator(chunk_size=5000):
+        ids.append(employee_id)
+        salaries.append(to_paise(salary))
+        days.append(leave_days.get(employee_id, 0))
+        scores.append(-1 if score is None else to_paise(score))
+    return PayrollArrays(*(np.array(column, dtype=np.int64) for column in (ids, salaries, days, scores)))
+
+
+def calculate(arrays, rates, pf_rate, tax_rate, tax_table=None):
+    """
+    Every payslip amount column, in paise, for all employees in ``arrays``;
+    ``rates`` as returned by services.load_salary_rates
+    """
+    salaries, scores = arrays.salaries, arrays.scores
+    amounts = {component_type: np.zeros_like(salaries) for component_type in ('BASIC', 'HRA', 'OTHER', 'BONUS')}
+    taxable = np.zeros_like(salaries)
+    has_basic = False
+    has_score = scores >= 0
+
+    for component_type, rate, is_taxable in rates:
+        if component_type == 'BONUS':
+            # Scores are in hundredths, out of MAX_PERFORMANCE_SCORE
+            numerator, denominator = rate.as_integer_ratio()
+            amount = round_half_up(
+                salaries * numerator * np.where(has_score, scores, 0),
+                denominator * 100 * int(MAX_PERFORMANCE_SCORE),
+            )
+        else:
+            amount = apply_rate(salaries, rate)
+            if component_type == 'BASIC':
+                has_basic = True
+            elif component_type == 'DA':
+                component_type = 'OTHER'
+        amounts[component_type] += amount
+        if is_taxable:
+            taxable += amount
+
+    if not has_basic:
+        amounts['BASIC'] = salaries.copy()
+        taxable += salaries
+
+    basic_salary = amounts['BASIC']
+    gross_earnings = basic_salary + amounts['HRA'] + amounts['OTHER'] + amounts['BONUS']
+    pf_contribution = apply_rate(basic_salary, pf_rate)
+    if tax_table is not None:
+        tax_deduction = slab_tax(tax_table, taxable)
+    else:
+        tax_deduction = apply_rate(taxable, tax_rate)
+
+    leave_deductions = round_half_up(basic_salary * arrays.leave_days, DAYS_PER_MONTH)
+    leave_deductions = np.maximum(0, np.minimum(leave_deductions, gross_earnings - pf_contribution - tax_deduction))
+
+    total_deductions = pf_contribution + tax_deduction + leave_deductions
+
+    return dict(zip(AMOUNT_FIELDS, [
+        basic_salary, amounts['HRA'], amounts['OTHER'], amounts['BONUS'], pf_contribution, tax_deduction,
+        leave_deductions, gross_earnings, total_deductions, gross_earnings - total_deductions,
+    ]))
+
+
+def scenario_rates(component_percentages=None):
+    """
+    The salary component rates with some percentages replaced, given as a
+    {component id: percentage} mapping
+    """
+    component_percentages = component_percentages or {}
+    return [
+        (component_type, component_percentages.get(pk, percentage) / HUNDRED, is_taxable)
+        for pk, component_type, percentage, is_taxable in SalaryComponent.objects.values_list(
+            'pk', 'component_type', 'percentage', 'is_taxable'
+        )
+    ]
+
+
+def totals(columns):
+    return {field: from_paise(int(column.sum())) for field, column in columns.items()}
+
+
+def dry_run(payroll_period, component_percentages=None, pf_percentage=None, tax_percentage=None):
+    """
+    Recompute the payslips of every eligible employee of the period (paid
+    or not) with the given percentages; returns the totals, the totals at
+    the current rates and their difference. Nothing is written.
+    """
+    inputs = services.load_inputs(payroll_period)
+    arrays = load_arrays(payroll_period, inputs['leave_days'])
+
+    baseline = calculate(arrays, inputs['rates'], inputs['pf_rate'], inputs['tax_rate'], inputs['tax_table'])
+    # A flat tax percentage replaces the tax slabs
+    scenario = calculate(
+        arrays,
+        scenario_rates(component_percentages),
+        inputs['pf_rate'] if pf_percentage is None else Decimal(pf_percentage) / HUNDRED,
+        inputs['tax_rate'] if tax_percentage is None else Decimal(tax_percentage) / HUNDRED,
+        inputs['tax_table'] if tax_percentage is None else None,
+    )
+
+    scenario_totals = totals(scenario)
+    baseline_totals = totals(baseline)
+    return {
+        'employees': len(arrays.employee_ids),
+        'changed_employees': int(np.count_nonzero(scenario['net_salary'] != baseline['net_salary'])),
+        'totals': scenario_totals,
+        'baseline': baseline_totals,
+        'difference': {field: scenario_totals[field] - baseline_totals[field] for field in AMOUNT_FIELDS},
+    }
@@ -3,11 +3,24 @@ from rest_framework import viewsets, permissions, filters, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django_filters.rest_framework import DjangoFilterBackend
+from django.db.models import Value
+from django.db.models.functions import Concat
 from django.utils import timezone
-from django.db.models import Sum, Avg
 
-from .models import SalaryComponent, PayrollPeriod, Payslip
-from .serializers import SalaryComponentSerializer, PayrollPeriodSerializer, PayslipSerializer
+from authentication.access import get_user_access, has_flag
+from authentication.permissions import CanViewPayroll
+from ems_project.conditional import conditional_response
+from ems_project.exports import ExportMixin
+from ems_project.pagination import PayslipPagination
+from ems_project.response_cache import cache_response
+from ems_project.sparse_fieldsets import SparseFieldsetMixin
+from employees.models import Employee
+from .models import SalaryComponent, TaxSlab, PayrollPeriod, Payslip
+from .serializers import (
+    SalaryComponentSerializer, TaxSlabSerializer, PayrollPeriodSerializer, PayslipSerializer,
+    PayrollDryRunSerializer,
+)
+from . import jobs, services, statistics, vectorized
 
 # Create your views here.
 
@@ -22,7 +35,23 @@ class SalaryComponentViewSet(viewsets.ModelViewSet):
     search_fields = ['name', 'component_type']
     ordering_fields = ['percentage']
 
-class PayrollPeriodViewSet(viewsets.ModelViewSet):
+    @cache_response(SalaryComponent)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
+    @cache_response(SalaryComponent)
+    def retrieve(self, request, *args, **kwargs):
+        return super().retrieve(request, *args, **kwargs)
+
+class TaxSlabViewSet(viewsets.ModelViewSet):
+    """
+    A ViewSet for handling CRUD operations on Tax Slabs
+    """
+    queryset = TaxSlab.objects.all()
+    serializer_class = TaxSlabSerializer
+    permission_classes = [permissions.IsAdminUser]
+
+class PayrollPeriodViewSet(SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Payroll Periods
     """
@@ -36,55 +65,152 @@ class PayrollPeriodViewSet(viewsets.ModelViewSet):
     @action(detail=True, methods=['post'])
     def process_payroll(self, request, pk=None):
         """
-        Process payroll for a specific period
+        Queue (or resume) the payroll run of a specific period; follow its
+        progress at run-status/
         """
         payroll_period = self.get_object()
         
         if payroll_period.is_processed:
             return Response(
-                {"detail": "This payroll period has already been processed."},
+                {"detail": "This payroll period has already been processed; use rerun/ to apply corrections."},
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Logic to generate payslips for all employees
-        # This is a simplified version and would need more complex implementation
-        payroll_period.is_processed = True
-        payroll_period.processed_at = timezone.now()
-        payroll_period.save()
+        run = jobs.queue_payroll_run(payroll_period)
+        run.refresh_from_db()
         
-        return Response({"detail": "Payroll processed successfully."})
+        return Response(
+            {"detail": "Payroll run queued.", **jobs.run_status(run)},
+            status=status.HTTP_202_ACCEPTED
+        )
+
+    @action(detail=True, methods=['get'], url_path='run-status')
+    def run_status(self, request, pk=None):
+        """
+        Progress, throughput and errors of the period's latest payroll run
+        """
+        payroll_period = self.get_object()
+        run = payroll_period.runs.order_by('-created_at').first()
+        if run is None:
+            return Response(
+                {"detail": "This payroll period has not been run."},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(jobs.run_status(run))
+
+    @action(detail=True, methods=['post'])
+    def rerun(self, request, pk=None):
+        """
+        Recompute the period's payslips after a correction, updating only
+        the unpaid payslips that changed
+        """
+        payroll_period = self.get_object()
 
-class PayslipViewSet(viewsets.ModelViewSet):
+        if payroll_period.runs.filter(status__in=['QUEUED', 'RUNNING']).exists():
+            return Response(
+                {"detail": "A payroll run for this period is still in progress."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        return Response(services.rerun_payroll(payroll_period))
+
+    @action(detail=True, methods=['post'], url_path='dry-run')
+    def dry_run(self, request, pk=None):
+        """
+        Recompute the period's payroll with other salary component, PF or
+        (flat) tax percentages and return the totals and their difference from the
+        current rates; nothing is saved
+        """
+        payroll_period = self.get_object()
+        serializer = PayrollDryRunSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        result = vectorized.dry_run(payroll_period, **serializer.validated_data)
+        return Response({'payroll_period': payroll_period.pk, **result})
+
+class PayslipViewSet(ExportMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     """
     A ViewSet for handling CRUD operations on Payslips
+
+    export/ streams the filtered payslips (e.g. ?payroll_period=) as CSV or
+    XLSX.
     """
     queryset = Payslip.objects.all()
     serializer_class = PayslipSerializer
+    sparse_field_sources = {
+        'employee_name': ['employee__first_name', 'employee__last_name'],
+        'payroll_period_details': [
+            'payroll_period__start_date',
+            'payroll_period__end_date',
+            'payroll_period__is_processed',
+            'payroll_period__processed_at',
+        ],
+    }
     permission_classes = [permissions.IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['employee', 'payroll_period', 'is_paid']
     ordering_fields = ['net_salary', 'payroll_period__start_date']
+    pagination_class = PayslipPagination
+    export_filename = 'payslips'
+    export_columns = {
+        'id': 'id',
+        'employee': 'employee_id',
+        'employee_name': Concat('employee__first_name', Value(' '), 'employee__last_name'),
+        'payroll_period': 'payroll_period_id',
+        'period_start': 'payroll_period__start_date',
+        'period_end': 'payroll_period__end_date',
+        'basic_salary': 'basic_salary',
+        'hra': 'hra',
+        'other_allowances': 'other_allowances',
+        'performance_bonus': 'performance_bonus',
+        'pf_contribution': 'pf_contribution',
+        'tax_deduction': 'tax_deduction',
+        'leave_deductions': 'leave_deductions',
+        'gross_earnings': 'gross_earnings',
+        'total_deductions': 'total_deductions',
+        'net_salary': 'net_salary',
+        'payment_mode': 'payment_mode',
+        'payment_date': 'payment_date',
+        'transaction_id': 'transaction_id',
+        'is_paid': 'is_paid',
+    }
 
     def get_queryset(self):
         """
         Customize queryset based on user role
         """
         user = self.request.user
-        if user.is_staff or user.is_superuser:
-            return Payslip.objects.all()
-        return Payslip.objects.filter(employee__user=user)
+        queryset = Payslip.objects.select_related('employee', 'payroll_period')
+        if has_flag(user, 'can_view_payroll'):
+            return queryset
+        return queryset.filter(employee_id=get_user_access(user).employee_id)
 
-    @action(detail=False, methods=['get'])
+    @action(detail=False, methods=['get'], permission_classes=[CanViewPayroll])
     def salary_statistics(self, request):
         """
-        Generate salary statistics
+        Generate salary statistics, optionally for one payroll_period and
+        grouped by department (group_by=department)
         """
-        stats = {
-            'total_payroll': Payslip.objects.aggregate(total=Sum('net_salary'))['total'],
-            'average_salary': Payslip.objects.aggregate(avg=Avg('net_salary'))['avg'],
-            'highest_salary': Payslip.objects.order_by('-net_salary').first().net_salary if Payslip.objects.exists() else 0,
-            'lowest_salary': Payslip.objects.order_by('net_salary').first().net_salary if Payslip.objects.exists() else 0
-        }
+        group_by = request.query_params.get('group_by')
+        if group_by not in (None, 'department'):
+            return Response(
+                {"detail": "group_by must be 'department'."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        payroll_period = None
+        payroll_period_id = request.query_params.get('payroll_period')
+        if payroll_period_id is not None:
+            try:
+                payroll_period = PayrollPeriod.objects.get(pk=payroll_period_id)
+            except (PayrollPeriod.DoesNotExist, ValueError):
+                return Response(
+                    {"detail": "Payroll period not found."},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+        
+        stats = statistics.salary_statistics(payroll_period, group_by=group_by)
         return Response(stats)
 
     @action(detail=True, methods=['post'])
@@ -100,11 +226,15 @@ class PayslipViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(payslip)
         return Response(serializer.data)
 
-    @action(detail=False, methods=['get'])
+    def get_unpaid_queryset(self):
+        return Payslip.objects.select_related('employee', 'payroll_period').filter(is_paid=False)
+
+    @action(detail=False, methods=['get'], permission_classes=[CanViewPayroll])
+    @conditional_response(Employee, PayrollPeriod, queryset=lambda view, request: view.get_unpaid_queryset())
     def unpaid_payslips(self, request):
         """
         Retrieve all unpaid payslips
         """
-        unpaid_payslips = Payslip.objects.filter(is_paid=False)
+        unpaid_payslips = self.get_unpaid_queryset()
         serializer = self.get_serializer(unpaid_payslips, many=True)
         return Response(serializer.data)